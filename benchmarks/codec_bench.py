@@ -0,0 +1,91 @@
+"""
+Сравнение кодировок TCP API на сообщениях телеметрии: время кодирования,
+время разбора потоковым декодером и объем на один сэмпл.
+
+Пример:
+    python benchmarks/codec_bench.py --rate 25 --markers 3 --seconds 60
+"""
+import argparse
+import random
+import time
+
+from devirta_pics.network.codec import CODECS
+from devirta_pics.network.telemetry import Subscription, telemetry_response
+
+
+def telemetry_messages(rate: int, markers: int, seconds: int,
+                       per_message: int) -> list:
+    """
+    Сообщения телеметрии, которые получит клиент за `seconds` секунд при
+    частоте `rate` Гц и `markers` маркерах.
+    """
+    sub = Subscription(rate, maxlen=rate * seconds)
+    start = time.time()
+    for i in range(rate * seconds):
+        now = start + i / rate
+        positions = [[random.uniform(0, 640), random.uniform(0, 480)]
+                     for _ in range(markers)]
+        sub.offer('positions',
+                  {'stream': 'positions', 't': round(now, 3),
+                   'value': positions}, now)
+        sub.offer('lines',
+                  {'stream': 'lines', 't': round(now, 3),
+                   'value': {'time': now - start,
+                             'a': random.uniform(50, 150),
+                             'b': random.uniform(50, 150)}}, now)
+
+    samples = sub.drain()
+    messages = []
+    for i in range(0, len(samples), per_message):
+        for sample in samples[i:i + per_message]:
+            sub.queue.append(sample)
+        messages.append(telemetry_response(sub))
+    return messages
+
+
+def bench(codec, messages: list, runs: int) -> tuple:
+    encode_s = decode_s = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        stream = b''.join(codec.encode(m) for m in messages)
+        encode_s += time.perf_counter() - start
+
+        decoder = codec.decoder()
+        start = time.perf_counter()
+        # Данные приходят кусками, как при чтении из сокета
+        decoded = []
+        for i in range(0, len(stream), 65536):
+            decoded.extend(decoder.feed(stream[i:i + 65536]))
+        decode_s += time.perf_counter() - start
+        assert len(decoded) == len(messages)
+    return encode_s / runs, decode_s / runs, len(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Сравнение кодировок сообщений телеметрии.')
+    parser.add_argument('--rate', type=int, default=25)
+    parser.add_argument('--markers', type=int, default=3)
+    parser.add_argument('--seconds', type=int, default=60)
+    parser.add_argument('--per-message', type=int, default=5,
+                        help='Сэмплов в одном сообщении телеметрии')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    messages = telemetry_messages(args.rate, args.markers, args.seconds,
+                                  args.per_message)
+    samples = sum(len(m['data']['samples']) for m in messages)
+    print(f'{len(messages)} messages, {samples} samples')
+
+    print(f'{"codec":<10}{"encode, ms":>12}{"decode, ms":>12}'
+          f'{"bytes":>10}{"B/sample":>10}')
+    for name, codec in CODECS.items():
+        encode_s, decode_s, size = bench(codec, messages, args.runs)
+        print(f'{name:<10}{encode_s * 1000:>12.2f}{decode_s * 1000:>12.2f}'
+              f'{size:>10}{size / samples:>10.1f}')
+    if 'msgpack' not in CODECS:
+        print('msgpack не установлен: pip install msgpack')
+
+
+if __name__ == '__main__':
+    main()
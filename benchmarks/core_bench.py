@@ -0,0 +1,71 @@
+"""
+Ядро анализа без Qt: сколько записанных сессий в секунду анализируется в
+одном процессе и в пуле процессов. Результаты (счетчики типов дыхания)
+в обоих случаях должны совпадать.
+
+Пример:
+    python benchmarks/core_bench.py --sessions 64 --minutes 2 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from devirta_pics.analysis import analyse_series
+
+SETTINGS = {'time_delta': 10000, 'smooth_c': 10, 'timer_interval': 333}
+
+
+def series(n: int, minutes: float, interval: float) -> np.ndarray:
+    """
+    :return: Ряд как Session.series: время и длины отрезков A и B. Тип
+        дыхания и частота зависят от номера.
+    """
+    rng = np.random.default_rng(n)
+    t = np.arange(interval, minutes * 60, interval)
+    phase = 2 * np.pi * t / rng.uniform(3, 6)
+    a_amp, b_amp = rng.uniform(3, 12, 2)
+    a = 100 + a_amp * np.sin(phase) + rng.normal(0, 0.5, len(t))
+    b = 120 + b_amp * np.sin(phase) + rng.normal(0, 0.5, len(t))
+    return np.column_stack([t, a, b])
+
+
+def counters(data: np.ndarray) -> dict:
+    core = analyse_series(data, SETTINGS)
+    return core.breath_counters
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Анализ записанных сессий ядром без Qt.')
+    parser.add_argument('--sessions', type=int, default=64)
+    parser.add_argument('--minutes', type=float, default=2)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    interval = SETTINGS['timer_interval'] / 1000
+    data = [series(n, args.minutes, interval) for n in range(args.sessions)]
+    samples = sum(len(d) for d in data)
+
+    start = time.perf_counter()
+    expected = [counters(d) for d in data]
+    elapsed = time.perf_counter() - start
+    print(f'1 process: {args.sessions / elapsed:.1f} sessions/s, '
+          f'{elapsed / samples * 1e6:.1f} us/sample')
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        result = list(pool.map(counters, data))
+    elapsed = time.perf_counter() - start
+    print(f'{args.workers} workers: {args.sessions / elapsed:.1f} '
+          f'sessions/s')
+
+    assert result == expected
+    breaths = sum(sum(c.values()) for c in expected)
+    print(f'breaths: {breaths} ({breaths / args.sessions:.1f} per session)')
+
+
+if __name__ == '__main__':
+    main()
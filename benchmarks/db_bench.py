@@ -0,0 +1,98 @@
+"""
+База данных сессий: скорость записи фоновым потоком и время запросов
+распределения типов дыхания по пациенту за период.
+
+Пример:
+    python benchmarks/db_bench.py --patients 100 --sessions 5000 --events 60
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime as dt
+from datetime import timedelta
+
+import numpy as np
+
+from devirta_pics.database import SessionDB
+from devirta_pics.events import BREATH_TYPES, EVENT_DTYPE, EventStore
+from devirta_pics.sessions import Session
+
+
+def session(n: int, started: dt, events: int) -> Session:
+    store = EventStore(f'bench-{n}', capacity=max(events, 1), directory=None)
+    data = np.zeros(events, dtype=EVENT_DTYPE)
+    data['wall'] = started.timestamp() + np.arange(events) * 3
+    data['t1'] = data['t2'] = np.arange(events) * 3.0
+    data['type'] = np.random.randint(0, len(BREATH_TYPES), events)
+    for i, tp in enumerate(BREATH_TYPES):
+        data[tp] = np.cumsum(data['type'] == i)
+    store._data[:events], store.total = data, events
+    return Session(f'{started:%Y%m%d-%H%M%S}-{n}', random.choice(
+        ('test', 'rehab')), None, store, started,
+        started + timedelta(seconds=events * 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Запись и запросы базы данных сессий.')
+    parser.add_argument('--patients', type=int, default=100)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=60,
+                        help='Событий дыхания в одной сессии')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = SessionDB(os.path.join(directory, 'sessions.db'))
+        patients = [f'P-{i:04d}' for i in range(args.patients)]
+        start = dt.now() - timedelta(days=365)
+        sessions = [(session(n, start + timedelta(
+                        minutes=random.uniform(0, 365 * 24 * 60)),
+                        args.events), random.choice(patients))
+                    for n in range(args.sessions)]
+
+        begin = time.perf_counter()
+        for s, patient in sessions:
+            db.add(s, patient)
+        queued = time.perf_counter() - begin
+        db.flush()
+        written = time.perf_counter() - begin
+        total_events = args.sessions * args.events
+        print(f'add: {queued / args.sessions * 1e6:.1f} us/session, '
+              f'write: {written:.2f} s '
+              f'({total_events / written:.0f} events/s)')
+
+        # Проверка: распределение из базы совпадает с данными сессий
+        patient = patients[0]
+        expected = dict.fromkeys(BREATH_TYPES, 0)
+        for s, p in sessions:
+            if p == patient:
+                for tp in BREATH_TYPES:
+                    expected[tp] += int(s.events.array()[-1][tp])
+        assert db.breath_distribution(patient) == expected
+
+        begin = time.perf_counter()
+        for _ in range(args.queries):
+            since = start + timedelta(days=random.uniform(0, 300))
+            db.breath_distribution(random.choice(patients), since,
+                                   since + timedelta(days=30))
+        elapsed = time.perf_counter() - begin
+        print(f'breath_distribution (patient, 30 days): '
+              f'{elapsed / args.queries * 1e3:.2f} ms/query')
+
+        begin = time.perf_counter()
+        for _ in range(args.queries):
+            db.sessions(random.choice(patients), limit=20)
+        elapsed = time.perf_counter() - begin
+        print(f'sessions (patient, last 20): '
+              f'{elapsed / args.queries * 1e3:.2f} ms/query')
+
+        sid = sessions[0][0].id
+        assert len(db.events(sid)) == args.events
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
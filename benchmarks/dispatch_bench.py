@@ -0,0 +1,161 @@
+"""
+Накладные расходы сервера на одно сообщение: разбор, проверка команды и
+выбор обработчика. Сравнивается проверка моделями pydantic и быстрая
+проверка по таблице полей.
+
+Перед замером проверяется, что ответы на все сообщения из набора (в том
+числе с ошибками) совпадают с ответами при проверке только моделями.
+
+Пример:
+    python benchmarks/dispatch_bench.py --runs 20000
+"""
+import argparse
+import time
+from typing import Mapping
+
+from pydantic import ValidationError
+
+from devirta_pics.network.codec import JsonCodec
+from devirta_pics.network.schema import AuthReq, CommandsReq
+from devirta_pics.network.server import NetServer
+
+VALID = [
+    {'type': 'stats', 'id': 1},
+    {'type': 'status', 'id': 'a2'},
+    {'type': 'mode', 'mode': 'test', 'time': 2, 'id': 3},
+    {'type': 'mode', 'mode': 'rehab'},
+    {'type': 'stop'},
+    {'type': 'subscribe', 'rate': 25, 'streams': ['positions', 'lines']},
+    {'type': 'unsubscribe'},
+    {'type': 'export', 'session': '20221019-153000-1', 'stream': 'events',
+     'offset': 1000, 'limit': 500},
+    {'type': 'close'},
+]
+# Сообщения, которые не проходят быструю проверку: ошибки и значения,
+# которые модели приводят к нужному типу
+OTHER = [
+    None, [], 'stats', {}, {'type': None}, {'type': 'unknown'},
+    {'type': 5}, {'type': 'mode'}, {'type': 'mode', 'mode': 'sleep'},
+    {'type': 'mode', 'mode': 'test'}, {'type': 'mode', 'mode': 'test',
+                                       'time': -1},
+    {'type': 'mode', 'mode': 'test', 'time': '5'},
+    {'type': 'mode', 'mode': 'test', 'time': 2.0},
+    {'type': 'mode', 'mode': 'test', 'time': True},
+    {'type': 'auth', 'token': '123456'},
+    {'type': 'subscribe', 'rate': 1000}, {'type': 'subscribe', 'rate': 0},
+    {'type': 'subscribe', 'rate': True}, {'type': 'subscribe', 'rate': '5'},
+    {'type': 'subscribe', 'streams': []},
+    {'type': 'subscribe', 'streams': ['video']},
+    {'type': 'subscribe', 'streams': 'lines'},
+    {'type': 'export', 'limit': 10 ** 6}, {'type': 'export', 'offset': -1},
+    {'type': 'export', 'stream': 'video'}, {'type': 'export', 'session': 1},
+    {'type': 'stats', 'id': 1.5}, {'type': 'stats', 'id': [1]},
+    {'type': 'stats', 'id': True},
+]
+AUTH = [
+    {'type': 'auth', 'token': 'ABC123'}, {'type': 'auth', 'token': 'XXXXXX'},
+    {'type': 'auth', 'token': 'ABC123', 'encoding': 'msgpack', 'id': 1},
+    {'type': 'auth', 'token': 'ABC123', 'encoding': 'xml'},
+    {'type': 'auth', 'token': 123456}, {'type': 'auth'}, {'token': 'ABC123'},
+    {'type': 'stats', 'token': 'ABC123'}, None, [], {'type': 'auth',
+                                                     'token': None},
+]
+
+
+def server() -> NetServer:
+    # Сервер без сокета и потока: нужны только проверки
+    srv = object.__new__(NetServer)
+    srv.auth_token = 'ABC123'
+    srv.handlers = srv.command_handlers()
+    return srv
+
+
+def model_check_comm(data):
+    # Проверка только моделью (как до быстрой проверки)
+    try:
+        if not isinstance(data, Mapping):
+            raise ValueError()
+        CommandsReq(**(data if data is not None else {}))
+    except (ValidationError, ValueError) as e:
+        err = 'Invalid command.'
+        if isinstance(e, ValidationError):
+            err = e.json()
+        return {'code': 400, 'msg': err}
+    return None
+
+
+def model_check_auth(srv, data):
+    try:
+        if not isinstance(data, Mapping):
+            raise ValueError()
+        AuthReq(**(data if data is not None else {}))
+    except (ValidationError, ValueError) as e:
+        err = 'Invalid command.'
+        if isinstance(e, ValidationError):
+            err = e.json()
+        return {'code': 400, 'msg': err}
+    if data.get('token') != srv.auth_token:
+        return {'code': 404, 'msg': 'Your auth-token not found.'}
+    return None
+
+
+def check_equal(srv: NetServer) -> None:
+    for data in VALID + OTHER:
+        assert srv.check_comm_data(data) == model_check_comm(data), data
+    for data in AUTH:
+        response = srv.check_auth_data(data)
+        expected = model_check_auth(srv, data)
+        assert (response if response['code'] != 200 else None) == \
+            expected, data
+
+
+def bench(func, messages: list, runs: int) -> float:
+    """
+    :return: Среднее время на сообщение в мкс.
+    """
+    start = time.perf_counter()
+    for _ in range(runs):
+        for data in messages:
+            func(data)
+    return (time.perf_counter() - start) / (runs * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Накладные расходы сервера на одно сообщение.')
+    parser.add_argument('--runs', type=int, default=5000)
+    args = parser.parse_args()
+
+    srv = server()
+    check_equal(srv)
+    print('Responses are identical to model-only validation.')
+
+    stream = b''.join(JsonCodec.encode(m) for m in VALID)
+
+    def pipeline(check):
+        # Разбор потока, проверка и выбор обработчика
+        decoder = JsonCodec.decoder()
+
+        def run(_):
+            for data in decoder.feed(stream):
+                if check(data) is None:
+                    srv.handlers.get(data['type'], srv.run_commands)
+        return run
+
+    rows = [
+        ('valid, model', bench(model_check_comm, VALID, args.runs)),
+        ('valid, fast', bench(srv.check_comm_data, VALID, args.runs)),
+        ('other, model', bench(model_check_comm, OTHER, args.runs // 10)),
+        ('other, fast', bench(srv.check_comm_data, OTHER, args.runs // 10)),
+        ('pipeline, model', bench(pipeline(model_check_comm), [None],
+                                  args.runs) / len(VALID)),
+        ('pipeline, fast', bench(pipeline(srv.check_comm_data), [None],
+                                 args.runs) / len(VALID)),
+    ]
+    print(f'{"case":<18}{"us/msg":>10}{"msg/s":>12}')
+    for name, us in rows:
+        print(f'{name:<18}{us:>10.2f}{1e6 / us:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
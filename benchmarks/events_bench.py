@@ -0,0 +1,102 @@
+"""
+Память и время добавления событий дыхания: словарь логов с ключами datetime
+(как хранил анализатор раньше) и столбцовое хранилище EventStore.
+
+Пример:
+    python benchmarks/events_bench.py --events 10000
+"""
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime as dt
+
+import numpy as np
+
+from devirta_pics.events import BREATH_TYPES, EventStore
+
+
+def events(count: int) -> list:
+    # Такие же значения, какие получает анализатор из массивов NumPy
+    counters = dict.fromkeys(BREATH_TYPES, 0)
+    result = []
+    for i in range(count):
+        tp = random.choice(BREATH_TYPES)
+        counters[tp] += 1
+        a_max, b_max = np.float64(random.uniform(80, 120)), \
+            np.float64(random.uniform(80, 120))
+        result.append({
+            'times': [np.float64(i * 3.1), np.float64(i * 3.1 + 0.1)],
+            'deltas': [np.float64(random.uniform(0, 30)),
+                       np.float64(random.uniform(0, 30))],
+            'peaks_val': [[a_max, (a_max - 10, a_max - 12)],
+                          [b_max, (b_max - 8, b_max - 9)]],
+            'type_breathing': tp,
+            'breath_counters': counters.copy(),
+        })
+    return result
+
+
+def measure(fill) -> tuple:
+    """
+    :return: Байт памяти и время в мкс.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = fill()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, size, elapsed * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Память и время добавления событий дыхания.')
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--capacity', type=int, default=None,
+                        help='Емкость EventStore, по умолчанию - все события')
+    args = parser.parse_args()
+    capacity = args.capacity or args.events
+
+    # Каждый вариант получает свои копии списков, как при записи логов
+    # анализатором
+    source = events(args.events)
+
+    def events_copy():
+        return ({**d, 'times': list(d['times']), 'deltas': list(d['deltas']),
+                 'peaks_val': [[v[0], tuple(v[1])] for v in d['peaks_val']]}
+                for d in source)
+
+    def fill_dict():
+        logs = {}
+        for data in events_copy():
+            logs.update({dt.now(): {**data, 'breath_counters':
+                                    data['breath_counters'].copy()}})
+        return logs
+
+    with tempfile.TemporaryDirectory() as directory:
+        def fill_store():
+            store = EventStore('bench', capacity=capacity,
+                               directory=directory)
+            for data in events_copy():
+                store.append(data)
+            return store
+
+        rows = []
+        for name, fill in (('dict', fill_dict), ('EventStore', fill_store)):
+            store, size, us = measure(fill)
+            rows.append((name, size, us))
+            if isinstance(store, EventStore):
+                store.close()
+                assert len(store.rows(0, args.events)) == args.events
+
+    print(f'{"store":<12}{"bytes/event":>14}{"us/event":>10}')
+    for name, size, us in rows:
+        print(f'{name:<12}{size / args.events:>14.1f}'
+              f'{us / args.events:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Фильтры сглаживания анализатора на синтетическом дыхании: время одного
+шага сглаживания, задержка обнаружения вершин вдохов и точность событий
+дыхания, которые находит AnalysisCore с каждым фильтром.
+
+Задержка - время от настоящей вершины до шага, на котором в сглаженном окне
+появляется максимум рядом с ней (как в AnalysisCore.find_peaks, с поправкой
+на задержку фильтра). Ложные вершины - максимумы, которые появлялись в окне,
+но не соответствуют вдохам.
+
+Точность - по событиям analyse_series: доля найденных вдохов, ошибка
+времени вершины, ошибка дельт отрезков A и B и доля вдохов с верным типом
+дыхания. Вдохи грудью и животом чередуются случайно. По умолчанию окно
+анализа, размер фильтра и период сэмплов - из настроек приложения
+(config.py).
+
+Пример:
+    python benchmarks/filters_bench.py --period 4 --noise 1
+"""
+import argparse
+import time
+
+import numpy as np
+
+from devirta_pics.analysis import analyse_series
+from devirta_pics.config import A_SMOOTH_C, A_TM_DELTA, G_UPD_FREQ
+from devirta_pics.filters import FILTERS, create_stage
+
+# Амплитуды отрезков A и B (пикс) для вдохов грудью и животом
+AMPLITUDES = {'chest': (10, 6), 'stomach': (5, 9)}
+
+
+def signal(seconds: float, interval: float, period: float, noise: float,
+           seed=0) -> tuple:
+    """
+    :return: Массив (N, 3): время, отрезок A, отрезок B, и для каждого вдоха
+             время вершины, тип дыхания и дельты A и B без шума.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, seconds, interval)
+    breaths = rng.choice(list(AMPLITUDES), int(seconds // period) + 1)
+    amp = np.array([AMPLITUDES[tp] for tp in breaths])
+    # Амплитуда меняется в нулях синусоиды, поэтому кривые непрерывны
+    cycle = (t // period).astype(int)
+    wave = np.sin(2 * np.pi * t / period)
+    clean = np.column_stack([100 + amp[cycle, 0] * wave,
+                             120 + amp[cycle, 1] * wave])
+    data = np.column_stack([t, clean + rng.normal(0, noise, clean.shape)])
+
+    # Дельта вдоха - от вершины до среднего соседних минимумов
+    peaks = np.arange(period / 4, t[-1] - period, period)
+    k = np.arange(len(peaks))
+    prev = np.vstack([amp[0], amp[:-1]])
+    deltas = amp[k] + (prev[k] + amp[k]) / 2
+    return data, peaks, breaths[:len(peaks)], deltas
+
+
+def box(window: np.ndarray, size: int) -> np.ndarray:
+    # Как AnalysisCore.smooth_line
+    kernel = np.ones(size, dtype=float) / size
+    return np.column_stack([np.convolve(window[:, 1], kernel, 'same'),
+                            np.convolve(window[:, 2], kernel, 'same')])
+
+
+def maxima(line: np.ndarray) -> np.ndarray:
+    # Как AnalysisCore.find_peaks
+    return (np.diff(np.sign(np.diff(line))) < 0).nonzero()[0] + 1
+
+
+def run(name: str, data: np.ndarray, peaks: np.ndarray, window: int,
+        size: int, period: float) -> dict:
+    stage = create_stage(name, size, window)
+    delay = stage.delay if stage is not None else 0
+    detected = {}
+    spurious = set()
+    cost = 0.0
+    for i in range(1, len(data) + 1):
+        chunk = data[max(i - window, 0):i]
+        start = time.perf_counter()
+        # Как в AnalysisCore.analyse: фильтр получает каждый сэмпл, а анализ
+        # начинается с заполненного окна
+        if stage is not None:
+            smooth = stage.feed(chunk)
+        elif len(chunk) == window:
+            smooth = box(chunk, size)
+        cost += time.perf_counter() - start
+        if len(chunk) < window:
+            continue
+
+        now = chunk[-1, 0]
+        for idx in maxima(smooth[:, 0]):
+            tm = chunk[max(idx - delay, 0), 0]
+            nearest = np.abs(peaks - tm).argmin()
+            if abs(peaks[nearest] - tm) > period / 4:
+                spurious.add(round(tm, 3))
+            elif nearest not in detected:
+                detected[nearest] = now - peaks[nearest]
+
+    latency = np.array(list(detected.values()))
+    return {'us': cost / len(data) * 1e6,
+            'detected': len(detected) / len(peaks),
+            'latency': latency.mean() if len(latency) else float('nan'),
+            'spurious': len(spurious)}
+
+
+def accuracy(name: str, data: np.ndarray, peaks: np.ndarray,
+             breaths: np.ndarray, deltas: np.ndarray, window: int,
+             size: int, interval: float, period: float) -> dict:
+    settings = {'filter': name, 'time_delta': window * interval,
+                'smooth_c': size, 'timer_interval': interval}
+    events = analyse_series(data, settings, upd_freq=interval).logs.array()
+
+    nearest = np.abs(peaks[None, :] - events['t1'][:, None]).argmin(axis=1)
+    error = events['t1'] - peaks[nearest]
+    # События дальше четверти периода от вершины - ложные
+    ok = np.abs(error) <= period / 4
+    nearest, error, events = nearest[ok], error[ok], events[ok]
+    delta = np.abs(np.column_stack([events['delta_a'], events['delta_b']]) -
+                   deltas[nearest])
+    types = np.array(['stomach', 'chest', 'mix'])[events['type']]
+    nan = float('nan')
+    return {
+        'found': len(set(nearest.tolist())) / len(peaks),
+        'false': int((~ok).sum()),
+        'time': np.abs(error).mean() if len(error) else nan,
+        'delta': delta.mean(axis=0) if len(delta) else (nan, nan),
+        'type': (types == breaths[nearest]).mean() if len(types) else nan,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Фильтры сглаживания анализатора.')
+    parser.add_argument('--seconds', type=float, default=600)
+    parser.add_argument('--interval', type=int, default=G_UPD_FREQ,
+                        help='Период обновления графика (мс)')
+    parser.add_argument('--window', type=int,
+                        default=A_TM_DELTA // G_UPD_FREQ,
+                        help='Окно анализа в сэмплах')
+    parser.add_argument('--size', type=int, default=A_SMOOTH_C,
+                        help='Размер окна фильтра (smooth_c)')
+    parser.add_argument('--period', type=float, default=4,
+                        help='Период дыхания (с)')
+    parser.add_argument('--noise', type=float, default=1)
+    args = parser.parse_args()
+
+    data, peaks, breaths, deltas = signal(
+        args.seconds, args.interval / 1000, args.period, args.noise)
+    print(f'{"filter":<16}{"us/step":>10}{"detected":>10}'
+          f'{"latency, s":>12}{"spurious":>10}')
+    for name in FILTERS:
+        r = run(name, data, peaks, args.window, args.size, args.period)
+        print(f'{name:<16}{r["us"]:>10.1f}{r["detected"]:>10.0%}'
+              f'{r["latency"]:>12.2f}{r["spurious"]:>10}')
+
+    print(f'\n{"filter":<16}{"found":>8}{"false":>8}{"time, s":>10}'
+          f'{"delta A":>10}{"delta B":>10}{"type":>8}')
+    for name in FILTERS:
+        r = accuracy(name, data, peaks, breaths, deltas, args.window,
+                     args.size, args.interval, args.period)
+        print(f'{name:<16}{r["found"]:>8.0%}{r["false"]:>8}'
+              f'{r["time"]:>10.2f}{r["delta"][0]:>10.1f}'
+              f'{r["delta"][1]:>10.1f}{r["type"]:>8.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Замер времени импорта модулей приложения.
+
+Каждый замер выполняется в отдельном процессе, чтобы не учитывать уже
+загруженные модули. Помимо общего времени выводятся самые тяжелые модули
+по данным `python -X importtime`.
+
+Пример:
+    python benchmarks/import_time.py --runs 5 --max-ms 1500
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = (
+    'devirta_pics.views.main_window',
+    'devirta_pics.views.mode_windows',
+    'devirta_pics.service.service',
+)
+
+
+def measure(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def heaviest(module: str, top: int) -> list:
+    # Формат строк: "import time: self [us] | cumulative | imported package"
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           f'import {module}'],
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # Вложенность импорта задается отступом (по 2 пробела на уровень).
+        # Учитываем модули верхнего и первого уровней.
+        if len(parts[2]) - len(parts[2].lstrip()) <= 3:
+            rows.append((parts[2].strip(), int(parts[1]) / 1000))
+    return sorted(rows, key=lambda x: -x[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Замер времени импорта модулей приложения.')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Завершиться с ошибкой, если медиана импорта '
+                             'превышает значение.')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    # Пустой интерпретатор, чтобы вычесть время его запуска
+    baseline = statistics.median(measure('sys') for _ in range(args.runs))
+
+    results, failed = {}, False
+    for module in args.modules:
+        runs = [measure(module) - baseline for _ in range(args.runs)]
+        results[module] = {
+            'median_ms': round(statistics.median(runs), 1),
+            'min_ms': round(min(runs), 1),
+            'heaviest': heaviest(module, args.top),
+        }
+        if args.max_ms is not None and \
+                results[module]['median_ms'] > args.max_ms:
+            failed = True
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, res in results.items():
+            print(f'{module}: median {res["median_ms"]} ms, '
+                  f'min {res["min_ms"]} ms')
+            for name, ms in res['heaviest']:
+                print(f'    {ms:9.1f} ms  {name}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Оценка частоты дыхания на синтетических длинах отрезков: ошибка оценки
+для разных частот дыхания и время обработки одного сэмпла.
+
+Пример:
+    python benchmarks/respiration_bench.py --interval 333 --noise 2
+"""
+import argparse
+import time
+
+import numpy as np
+
+from devirta_pics.respiration import RespirationEstimator
+
+
+def signal(seconds: float, interval: float, rate: float, noise: float,
+           seed=0) -> np.ndarray:
+    """
+    :return: Массив (N, 2): отрезки A и B, частота дыхания `rate` в минуту.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, seconds, interval)
+    # Частота дыхания немного плавает, как у настоящего пациента
+    phase = 2 * np.pi * np.cumsum(
+        rate / 60 * (1 + 0.05 * np.sin(t / 20))) * interval
+    a = 100 + 10 * np.sin(phase) + rng.normal(0, noise, len(t))
+    b = 120 + 6 * np.sin(phase + 0.5) + rng.normal(0, noise, len(t))
+    return np.column_stack([a, b])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Оценка частоты дыхания по спектру.')
+    parser.add_argument('--seconds', type=float, default=300)
+    parser.add_argument('--interval', type=float, default=333,
+                        help='Период обновления графика (мс)')
+    parser.add_argument('--noise', type=float, default=2)
+    parser.add_argument('--rates', type=float, nargs='+',
+                        default=[8, 12, 15, 20, 25, 30],
+                        help='Частоты дыхания (в минуту)')
+    args = parser.parse_args()
+
+    print(f'{"rate":>6}{"estimate":>10}{"error":>8}{"quality":>9}'
+          f'{"us/sample":>11}')
+    for rate in args.rates:
+        data = signal(args.seconds, args.interval / 1000, rate, args.noise)
+        est = RespirationEstimator(1000 / args.interval)
+        estimates = []
+        start = time.perf_counter()
+        for sample in data:
+            if est.add(sample) and est.rate is not None:
+                estimates.append(est.rate)
+        cost = (time.perf_counter() - start) / len(data) * 1e6
+        # Первые оценки по неполному окну не учитываем
+        tail = np.array(estimates[len(estimates) // 2:])
+        error = np.abs(tail - rate).mean()
+        print(f'{rate:>6.1f}{tail.mean():>10.1f}{error:>8.2f}'
+              f'{est.quality:>9.2f}{cost:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Замеры этапов и профилировщик: накладные расходы METRICS.timed (выключено
+и включено) и замедление ядра анализа при работающем профилировщике.
+
+Пример:
+    python benchmarks/stages_bench.py --calls 200000 --samples 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from devirta_pics.analysis import AnalysisCore
+from devirta_pics.utils.metrics import Metrics
+
+
+def overhead(metrics: Metrics, calls: int) -> tuple:
+    @metrics.timed('decorated')
+    def work():
+        pass
+
+    def plain():
+        pass
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        plain()
+    base = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        work()
+    decorated = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        with metrics.timed('context'):
+            pass
+    context = time.perf_counter() - start
+    return ((decorated - base) / calls * 1e9, context / calls * 1e9)
+
+
+def analyse(samples: int) -> float:
+    core = AnalysisCore()
+    core.configure({'time_delta': 10000, 'smooth_c': 10,
+                    'timer_interval': 333})
+    t = np.arange(1, samples + 1) * 0.333
+    a = 100 + 8 * np.sin(2 * np.pi * t / 4)
+    b = 120 + 5 * np.sin(2 * np.pi * t / 4)
+    start = time.perf_counter()
+    for row in zip(t.tolist(), a.tolist(), b.tolist()):
+        core.add(*row)
+    return (time.perf_counter() - start) / samples * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Накладные расходы замеров этапов и профилировщика.')
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--samples', type=int, default=20000,
+                        help='Сэмплов ядра анализа')
+    args = parser.parse_args()
+
+    metrics = Metrics(log_interval=0)
+    for stages in (False, True):
+        metrics.configure(stages=stages)
+        decorated, context = overhead(metrics, args.calls)
+        print(f'stages={stages}: decorator +{decorated:.0f} ns, '
+              f'context manager {context:.0f} ns')
+
+    base = analyse(args.samples)
+    metrics.configure(profile=True)
+    profiled = analyse(args.samples)
+    metrics.configure(profile=False)
+    profile = metrics.profiler.summary()
+    print(f'analysis: {base:.1f} us/sample, with profiler '
+          f'{profiled:.1f} us/sample '
+          f'({sum(profile["samples"].values())} stacks)')
+    for f in profile['top'][:5]:
+        print(f'  {f["own"]:>6.1%} {f["total"]:>6.1%}  {f["function"]} '
+              f'[{f["thread"]}]')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Разделение маркеров между людьми в кадре: доля кадров, в которых маркеры
+всех людей найдены верно, и время разделения на один кадр.
+
+Люди стоят рядом с шагом --spacing пикселей, их маркеры расположены друг
+под другом с разбросом --jitter. Детектор может пропустить маркер
+(--miss) и найти лишний (--spurious).
+
+Пример:
+    python benchmarks/subjects_bench.py --subjects 1 2 3 4 --frames 5000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from devirta_pics.config import FRAME_HEIGHT, FRAME_WIDTH, OBJECT_COUNT
+from devirta_pics.subjects import group_markers
+
+
+def frame(rng, subjects: int, spacing: float, jitter: float, miss: float,
+          spurious: float):
+    """
+    :return: Центры маркеров по убыванию уверенности и номер человека для
+        каждого маркера (-1 - ложный маркер).
+    """
+    left = (FRAME_WIDTH - spacing * (subjects - 1)) / 2
+    centers, owners = [], []
+    for s in range(subjects):
+        x = left + s * spacing + rng.normal(0, jitter)
+        for k in range(OBJECT_COUNT):
+            if rng.random() < miss:
+                continue
+            y = 40 + k * (FRAME_HEIGHT - 80) / (OBJECT_COUNT - 1)
+            centers.append((x + rng.normal(0, jitter),
+                            y + rng.normal(0, jitter)))
+            owners.append(s)
+    if rng.random() < spurious:
+        # Ложный маркер с наименьшей уверенностью
+        centers.append((rng.uniform(0, FRAME_WIDTH),
+                        rng.uniform(0, FRAME_HEIGHT)))
+        owners.append(-1)
+    return np.array(centers, dtype=int).reshape(-1, 2), np.array(owners)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Разделение маркеров между людьми в кадре.')
+    parser.add_argument('--subjects', type=int, nargs='+',
+                        default=[1, 2, 3, 4])
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--spacing', type=float, default=80,
+                        help='Расстояние между людьми по X (пикс)')
+    parser.add_argument('--jitter', type=float, default=6)
+    parser.add_argument('--miss', type=float, default=0.0,
+                        help='Вероятность пропуска маркера')
+    parser.add_argument('--spurious', type=float, default=0.0,
+                        help='Вероятность ложного маркера на кадре')
+    args = parser.parse_args()
+
+    print(f'{"subjects":>8}{"correct":>10}{"us/frame":>10}')
+    for subjects in args.subjects:
+        rng = np.random.default_rng(0)
+        spacing = min(args.spacing, FRAME_WIDTH / subjects)
+        frames = [frame(rng, subjects, spacing, args.jitter, args.miss,
+                        args.spurious) for _ in range(args.frames)]
+        correct, cost = 0, 0.0
+        for centers, owners in frames:
+            start = time.perf_counter()
+            groups = group_markers(centers, subjects, OBJECT_COUNT)
+            cost += time.perf_counter() - start
+            # Люди, которые есть на кадре, слева направо
+            present = sorted(set(owners[owners >= 0].tolist()))
+            correct += all(
+                len(idx) == (owners == s).sum() and (owners[idx] == s).all()
+                for s, idx in zip(present, groups))
+        print(f'{subjects:>8}{correct / args.frames:>10.1%}'
+              f'{cost / args.frames * 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
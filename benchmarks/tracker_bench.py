@@ -0,0 +1,104 @@
+"""
+Сопоставление маркеров между кадрами: доля кадров, на которых номер
+маркера перешел к другому маркеру, и количество скачков длин отрезков при
+сортировке маркеров по Y (group_markers) и при трекинге (MarkerTracker).
+
+Два верхних маркера находятся почти на одной высоте (--offset пикселей),
+человек покачивается, детектор добавляет шум (--jitter) и пропускает
+маркеры (--miss).
+
+Пример:
+    python benchmarks/tracker_bench.py --frames 5000 --offset 6 --miss 0.05
+"""
+import argparse
+import time
+
+import numpy as np
+
+from devirta_pics.subjects import group_markers
+from devirta_pics.tracker import MarkerTracker
+
+
+def scene(frames: int, offset: float, jitter: float, miss: float, seed=0):
+    """
+    :return: Истинные центры маркеров (frames, 3, 2) и маска найденных
+        детектором маркеров (frames, 3).
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames)[:, None]
+    base = np.array([[140, 100], [190, 100 + offset], [165, 180]], float)
+    # Покачивание человека и дыхание (у нижнего маркера сильнее)
+    sway = np.column_stack([15 * np.sin(t[:, 0] / 40),
+                            5 * np.sin(t[:, 0] / 55)])
+    breath = np.sin(2 * np.pi * t / 12) * np.array([2, 2, 6])
+    truth = base[None] + sway[:, None, :]
+    truth[:, :, 1] += breath
+    truth += rng.normal(0, jitter, truth.shape)
+    found = rng.random(truth.shape[:2]) >= miss
+    return truth, found
+
+
+def lines(pos: np.ndarray) -> np.ndarray:
+    # Как analysis.line_lengths
+    return np.stack([np.linalg.norm(pos[:, 0] - pos[:, 1], axis=1),
+                     np.linalg.norm(pos[:, 1] - pos[:, 2], axis=1)], axis=1)
+
+
+def run(method: str, truth: np.ndarray, found: np.ndarray) -> dict:
+    tracker = MarkerTracker(1, 3)
+    positions = np.zeros((3, 2))
+    result = np.zeros_like(truth)
+    # Какой настоящий маркер последним получил каждый номер
+    owner = np.full(3, -1)
+    swaps, cost = 0, 0.0
+    for n in range(len(truth)):
+        ids = found[n].nonzero()[0]
+        # Детектор возвращает маркеры в произвольном порядке
+        ids = ids[np.random.default_rng(n).permutation(len(ids))]
+        centers = truth[n, ids].round()
+        start = time.perf_counter()
+        if method == 'sort':
+            idx = group_markers(centers, 1, 3)[0]
+            match = np.full(3, -1)
+            match[:len(idx)] = idx
+            positions[match >= 0] = centers[match[match >= 0]]
+        else:
+            match = tracker.update(centers)
+            positions = tracker.pos
+        cost += time.perf_counter() - start
+        current = np.full(3, -1)
+        current[match >= 0] = ids[match[match >= 0]]
+        changed = (current >= 0) & (owner >= 0) & (current != owner)
+        swaps += changed.any()
+        owner = np.where(current >= 0, current, owner)
+        result[n] = positions
+
+    # Скачок - изменение длины отрезка больше, чем у настоящих маркеров
+    true_step = np.abs(np.diff(lines(truth), axis=0))
+    step = np.abs(np.diff(lines(result), axis=0))
+    return {'swaps': swaps / len(truth),
+            'spikes': int((step > true_step.max() * 1.5).sum()),
+            'us': cost / len(truth) * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Сортировка по Y и трекинг маркеров.')
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--offset', type=float, default=6,
+                        help='Разница высот двух верхних маркеров (пикс)')
+    parser.add_argument('--jitter', type=float, default=3)
+    parser.add_argument('--miss', type=float, default=0.05,
+                        help='Вероятность пропуска маркера')
+    args = parser.parse_args()
+
+    truth, found = scene(args.frames, args.offset, args.jitter, args.miss)
+    print(f'{"method":<8}{"swapped":>10}{"spikes":>8}{"us/frame":>10}')
+    for method in ('sort', 'track'):
+        r = run(method, truth, found)
+        print(f'{method:<8}{r["swaps"]:>10.1%}{r["spikes"]:>8}'
+              f'{r["us"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Сравнение времени создания окон через uic.loadUi и через заранее
+скомпилированные модули интерфейсов.
+
+Пример:
+    QT_QPA_PLATFORM=offscreen python benchmarks/ui_load.py --runs 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from PyQt5 import QtWidgets, uic
+from PyQt5.QtWidgets import QApplication
+
+from devirta_pics.views import ui_loader
+
+DEFAULT_UIS = ('started_w', 'mn_w', 'mode_w', 'graph_sw', 'analyser_sw',
+               'camera_check')
+
+
+def base_class(name: str) -> type:
+    # Класс корневого виджета, на котором создается интерфейс
+    root = ET.parse(ui_loader.ui_path(name)).getroot().find('widget')
+    return getattr(QtWidgets, root.get('class'))
+
+
+def bench(name: str, runs: int, loader) -> list:
+    cls, times = base_class(name), []
+    for _ in range(runs):
+        widget = cls()
+        start = time.perf_counter()
+        loader(name, widget)
+        times.append((time.perf_counter() - start) * 1000)
+        widget.deleteLater()
+    QApplication.processEvents()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Сравнение uic.loadUi и скомпилированных интерфейсов.')
+    parser.add_argument('names', nargs='*', default=DEFAULT_UIS)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication(sys.argv)  # noqa: F841
+
+    print(f'{"ui":<14}{"loadUi, ms":>12}{"compiled, ms":>14}{"speedup":>9}')
+    for name in args.names:
+        # Первая загрузка включает компиляцию в кеш, ее не учитываем
+        ui_loader.load_ui(name, base_class(name)())
+
+        parsed = statistics.median(bench(
+            name, args.runs,
+            lambda n, w: uic.loadUi(ui_loader.ui_path(n), w)))
+        compiled = statistics.median(bench(name, args.runs,
+                                           ui_loader.load_ui))
+        print(f'{name:<14}{parsed:>12.2f}{compiled:>14.2f}'
+              f'{parsed / compiled:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""
+Ядро анализа дыхания без Qt: буфер длин отрезков, сглаживание, поиск
+вершин вдохов, определение типа дыхания и оценка частоты дыхания. Сэмплы
+подаются вызовом add, а результаты получают подписчики. Ядро не обращается
+к детектору, таймерам и окнам, поэтому в одном процессе или в пуле
+процессов можно анализировать сколько угодно сессий одновременно.
+"""
+import logging
+from math import sqrt
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from devirta_pics.config import (A_DELTA_BOT, A_DELTA_TOP, A_FILTER,
+                                 A_SMOOTH_C, A_TM_DELTA, ANALYSER_LOGS,
+                                 G_MAX_CHUNKS, G_SAVE_FD, G_UPD_FREQ)
+from devirta_pics.events import BREATH_TYPES, EventStore
+from devirta_pics.filters import create_stage
+from devirta_pics.respiration import RespirationEstimator
+
+logger = logging.getLogger(__name__)
+
+# События ядра, которые получают подписчики (callback(event, value)):
+# sample - новый сэмпл (время, отрезок A, отрезок B);
+# trim - буфер обрезан, value - количество оставшихся сэмплов;
+# smooth - сглаженное окно анализа (время, отрезок A, отрезок B);
+# extremes - окно анализа и индексы экстремумов A и B обнаруженного вдоха;
+# breath - событие вдоха в формате логов анализатора;
+# respiration - оценка частоты дыхания.
+EVENTS = ('sample', 'trim', 'smooth', 'extremes', 'breath', 'respiration')
+
+
+def line_lengths(pos: Dict[int, Tuple[int, int]]) -> Tuple:
+    """
+    Конвертирует координаты 3 датчиков ABC в длины лин AB и BC
+    :param pos: Координаты точек.
+    :return: Длины 2 отрезков между 3 точками.
+    """
+    if len(pos) == 3:
+        len_line_a = sqrt(abs(pos[0][0] - pos[1][0]) ** 2 +
+                          abs(pos[0][1] - pos[1][1]) ** 2)
+        len_line_b = sqrt(abs(pos[1][0] - pos[2][0]) ** 2 +
+                          abs(pos[1][1] - pos[2][1]) ** 2)
+        return len_line_a, len_line_b
+    return 0, 0
+
+
+class AnalysisCore:
+    def __init__(self, logs: Optional[EventStore] = None,
+                 tm_delta=A_TM_DELTA, smooth_c=A_SMOOTH_C,
+                 max_chunks=G_MAX_CHUNKS, save_fd=G_SAVE_FD,
+                 upd_freq=G_UPD_FREQ):
+        """
+        :param logs: Хранилище событий дыхания. По умолчанию - только в
+            памяти.
+        :param tm_delta: Окно анализа (мс).
+        :param smooth_c: Коэффециент сглаживания кривой.
+        :param max_chunks: Начальный размер буфера сэмплов.
+        :param save_fd: Хранить все сэмплы, иначе буфер обрезается.
+        :param upd_freq: Период сэмплов (мс).
+        """
+        self.logs = logs if logs is not None else EventStore(
+            'analysis', directory=None)
+
+        self.max_chunks = max_chunks
+        self.save_fd = save_fd
+        self.upd_freq = upd_freq
+        self.tm_delta = tm_delta // upd_freq  # Окно анализа в сэмплах
+        self.smooth_c = min(smooth_c, self.tm_delta)
+        self.filter = A_FILTER
+        self.a_delta, self.b_delta = A_DELTA_TOP, A_DELTA_BOT
+
+        self.detected_peaks = []
+        self.breath_counters = dict.fromkeys(BREATH_TYPES, 0)
+
+        self.data = np.zeros((self.max_chunks, 3))
+        self.ptr = 0  # Указатель на последние добавленные данные
+        # Первая записанная строка data: строка 0 пустая до обрезки буфера
+        self.first = 1
+
+        self.filter_stage = None
+        self.respiration: Optional[RespirationEstimator] = None
+        self._listeners: List[Callable[[str, object], None]] = []
+        self.configure({})
+
+    def configure(self, settings: dict) -> None:
+        """
+        Применяет настройки анализатора и графика (FileManager). Фильтр
+        заново сглаживает текущее окно при следующем сэмпле.
+        """
+        self.save_fd = settings.get('save_full_data', self.save_fd)
+        self.max_chunks = settings.get('max_chunks', self.max_chunks)
+        self.upd_freq = settings.get('timer_interval', self.upd_freq)
+
+        if 'time_delta' in settings:
+            self.tm_delta = settings['time_delta'] // self.upd_freq
+        self.smooth_c = settings.get('smooth_c', self.smooth_c)
+        if self.smooth_c > self.tm_delta:
+            self.smooth_c = self.tm_delta
+        self.filter = settings.get('filter', self.filter)
+
+        self.a_delta = [settings.get('min_delta_top', self.a_delta[0]),
+                        settings.get('max_delta_top', self.a_delta[1])]
+        self.b_delta = [settings.get('min_delta_bot', self.b_delta[0]),
+                        settings.get('max_delta_bot', self.b_delta[1])]
+
+        self.filter_stage = create_stage(self.filter, self.smooth_c,
+                                         self.tm_delta)
+        fs = 1000 / self.upd_freq
+        if self.respiration is None or self.respiration.fs != fs:
+            self.respiration = RespirationEstimator(fs)
+
+    def subscribe(self, callback: Callable[[str, object], None]) -> None:
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, object], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, event: str, value) -> None:
+        for callback in self._listeners:
+            callback(event, value)
+
+    def add(self, time: float, len_a: float, len_b: float) -> None:
+        """
+        Добавляет сэмпл длин отрезков и анализирует окно.
+        :param time: Время сэмпла от начала сессии (с).
+        """
+        # Увеличиваем указатель
+        self.ptr += 1
+
+        # Увеличиваем размерность массива данных при переполнении
+        if self.ptr >= self.data.shape[0]:
+            self._grow()
+
+        self.data[self.ptr] = time, len_a, len_b
+        self._notify('sample', self.data[self.ptr])
+        self.analyse()
+
+    def _grow(self) -> None:
+        tmp = self.data
+
+        # Если не сохраняем весь массив
+        if not self.save_fd:
+            # Обвноялвяем массив
+            self.data = np.zeros((self.max_chunks, 3))
+
+            # Перемащаем в него копию последних 1/4 значений
+            self.data[:tmp.shape[0] // 4] = tmp[-tmp.shape[0] // 4:]
+
+            # Перемещаем счетчик
+            self.ptr = tmp.shape[0] // 4
+            self.first = 0
+            self._notify('trim', self.ptr)
+        else:
+            # Увеличиваем массив вдвое
+            self.data = np.zeros((self.data.shape[0] * 2, 3))
+            self.data[:tmp.shape[0]] = tmp
+
+    def series(self) -> np.ndarray:
+        """
+        Копия собранных данных: время и длины отрезков A и B.
+        """
+        return self.data[self.first:self.ptr + 1].copy()
+
+    def analyse(self):
+        self.update_respiration()
+        data = self.get_analyse_data()
+        # Причинный фильтр обрабатывает каждый новый сэмпл, даже если данных
+        # для анализа пока недостаточно
+        if self.filter_stage is not None:
+            smooth = self.filter_stage.feed(data)
+
+        # Прерываем, если данных недостаточно или обе координаты нулевые
+        if data.shape[0] < self.tm_delta or \
+                all(map(lambda x: x[1] == 0 and x[2] == 0, data)):
+            return
+
+        time, a_line, b_line = data[:, 0], data[:, 1], data[:, 2]
+
+        # Сглаживаем прямые
+        if self.filter_stage is not None:
+            a_smooth, b_smooth = smooth[:, 0], smooth[:, 1]
+        else:
+            a_smooth, b_smooth = self.smooth_line(a_line), \
+                self.smooth_line(b_line)
+        self._notify('smooth', (time, a_smooth, b_smooth))
+
+        if self.filter_stage is not None and self.filter_stage.delay:
+            # Экстремумы кривой после причинного фильтра запаздывают на его
+            # задержку, поэтому время и значения берем из окна сэмплов,
+            # сдвинутого на столько же назад
+            data = self.get_analyse_data(self.filter_stage.delay)
+            if data.shape[0] < a_smooth.shape[0]:
+                return
+        self.analyse_peaks(self.find_peaks(a_smooth),
+                           self.find_peaks(b_smooth), data)
+
+    def update_respiration(self) -> None:
+        # Последний сэмпл длин отрезков
+        if self.respiration.add(self.data[self.ptr, 1:]):
+            self._notify('respiration', self.respiration.result())
+
+    def analyse_peaks(self, a_p, b_p, data):
+        if len(a_p[0]) < 3 or len(b_p[0]) < 3:
+            return
+
+        a_max_p, a_min_p = a_p[1:]
+        b_max_p, b_min_p = b_p[1:]
+
+        if len(a_max_p) > 1 and len(a_min_p) > 2:
+            a_max_p, a_min_p = self.find_last_peak(a_max_p, a_min_p)
+        if len(b_max_p) > 1 and len(b_min_p) > 2:
+            b_max_p, b_min_p = self.find_last_peak(b_max_p, b_min_p)
+
+        if (len(a_max_p) == 1 and len(a_min_p) == 2) and \
+           (len(b_max_p) == 1 and len(b_min_p) == 2):
+            # Время верхних точек всплесков
+            p1_tm, p2_tm = data[a_max_p[0]][0], data[b_max_p[0]][0]
+
+            a_max_val = data[a_max_p[0], 1]
+            a_min_val = (data[a_min_p[0], 1], data[a_min_p[1], 1])
+
+            b_max_val = data[b_max_p[0], 2]
+            b_min_val = (data[b_min_p[0], 2], data[b_min_p[1], 2])
+
+            a_delta = abs(sum(a_min_val) // 2 - a_max_val)
+            b_delta = abs(sum(b_min_val) // 2 - b_max_val)
+
+            if self.a_delta[0] <= a_delta <= self.a_delta[1] and \
+                self.b_delta[0] <= b_delta <= self.b_delta[1] and \
+                p1_tm not in self.detected_peaks and \
+                    p2_tm not in self.detected_peaks:
+
+                self._notify('extremes', (data, a_max_p + a_min_p,
+                                          b_max_p + b_min_p))
+
+                self.detected_peaks.extend([p1_tm, p2_tm])
+
+                tp_br = self.determine_breathing(a_delta, b_delta)
+                self.update_logs(
+                    times=[p1_tm, p2_tm],
+                    type_breathing=tp_br,
+                    deltas=[a_delta, b_delta],
+                    peaks_val=[[a_max_val, a_min_val], [b_max_val, b_min_val]]
+                )
+
+    def determine_breathing(self, a_delta, b_delta) -> str:
+        """
+        Определяет тип дыхания по переданным дельтам
+        """
+        if a_delta > b_delta:
+            type_br = 'chest'
+            self.breath_counters['chest'] += 1
+        elif a_delta < b_delta:
+            type_br = 'stomach'
+            self.breath_counters['stomach'] += 1
+        else:
+            type_br = 'mix'
+            self.breath_counters['mix'] += 1
+        return type_br
+
+    def dominant_breath(self) -> Optional[str]:
+        """
+        Возвращает преобладающий тип дыхания или None, если его не удалось
+        определить (все счетчики равны).
+        """
+        counters = self.breath_counters
+        if len(set(counters.values())) == 1:
+            return None
+        return max(counters, key=counters.get)
+
+    @classmethod
+    def find_last_peak(cls, max_p, min_p):
+        right = max(min_p)
+        mid = sorted(filter(lambda x: x < right, max_p))[-1]
+        left = sorted(filter(lambda x: x < mid, min_p))[-1]
+        return [mid], [left, right]
+
+    def get_analyse_data(self, shift=0) -> np.ndarray:
+        # Возвращает срех данных для анализа, сдвинутый на `shift` сэмплов
+        # назад
+        end = self.ptr - shift
+        return self.data[end - self.tm_delta
+                         if end > self.tm_delta else 0: max(end, 0)]
+
+    def smooth_line(self, array: np.ndarray) -> np.ndarray:
+        kernel = np.ones(self.smooth_c, dtype=float) / self.smooth_c
+        return np.convolve(array, kernel, 'same')
+
+    @staticmethod
+    def find_peaks(array: np.ndarray) -> List[List[int]]:
+        """
+        Находит экстремумы кривой.
+        :param array: Набор данных со значениями. Линейный массив.
+        :return: Набор индексов экстремумов из переданного массива.
+        """
+        row_peaks = np.diff(np.sign(np.diff(array)))
+
+        peaks: List[int] = row_peaks.nonzero()[0] + 1
+        peaks_min: List[int] = (row_peaks > 0).nonzero()[0] + 1
+        peaks_max: List[int] = (row_peaks < 0).nonzero()[0] + 1
+        return [peaks, peaks_max, peaks_min]
+
+    def update_logs(self, **kwargs) -> None:
+        data = {
+            'times': kwargs.get('times', None),
+            'deltas': kwargs.get('deltas', None),
+            'peaks_val': kwargs.get('peaks_val', None),
+            'type_breathing': kwargs.get('type_breathing', None),
+            'breath_counters': self.breath_counters.copy(),
+        }
+        self.logs.append(data)
+
+        if ANALYSER_LOGS:
+            logger.info(f'ANALYSER: {data}')
+        self._notify('breath', data)
+
+
+def analyse_series(series: np.ndarray, settings: Optional[dict] = None,
+                   **kwargs) -> AnalysisCore:
+    """
+    Анализирует записанный временной ряд (Session.series) целиком.
+    Функция не зависит от Qt и подходит для пула процессов.
+    :param settings: Настройки анализатора и графика.
+    :param kwargs: Параметры AnalysisCore.
+    """
+    core = AnalysisCore(**kwargs)
+    core.configure(settings or {})
+    for time, len_a, len_b in series.tolist():
+        core.add(time, len_a, len_b)
+    return core
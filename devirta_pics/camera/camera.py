@@ -1,9 +1,11 @@
 import logging
 import threading
+import time
 
 import cv2
 
 from devirta_pics.config import FPS, FRAME_HEIGHT, FRAME_WIDTH
+from devirta_pics.utils.metrics import METRICS
 from devirta_pics.utils.singleton import Singleton
 
 logger = logging.getLogger(__name__)
@@ -21,6 +23,9 @@ class Camera(metaclass=Singleton):
         self.frame_width, self.frame_height = fr_width, fr_height
 
         self.cap = self.last_frame = self.ret = None
+        # Порядковый номер и время захвата последнего кадра
+        self.frame_id, self.frame_time = 0, 0.0
+        self._info = (None, None, 0, 0.0)
         self.is_restarted = False
 
         self._thread = None
@@ -47,7 +52,14 @@ class Camera(metaclass=Singleton):
 
     def _run(self):
         while getattr(self._thread, "do_run", True) and self.alive():
-            self.ret, self.last_frame = self.cap.read()
+            with METRICS.timed('capture'):
+                ret, frame = self.cap.read()
+            if ret:
+                METRICS.tick('camera_read')
+                self._info = (ret, frame, self.frame_id + 1,
+                              time.perf_counter())
+                self.frame_id, self.frame_time = self._info[2:]
+            self.ret, self.last_frame = ret, frame
             if not self.ret:
                 logger.warning('Cant read camera device. Check that the camera'
                                ' is not being used by another application. \n')
@@ -77,5 +89,11 @@ class Camera(metaclass=Singleton):
     def read(self):
         return self.ret, self.last_frame
 
+    def read_info(self):
+        """
+        Возвращает кадр вместе с его номером и временем захвата.
+        """
+        return self._info
+
     def alive(self):
         return self.cap.isOpened() or self.is_restarted
@@ -6,6 +6,7 @@
 # Пожалуйсте, не редактируйте этот файл, если не обладаете достаточными
 # знаниями об устройстве приложения.
 ##############################################################################
+import os
 
 # --- Общие настройки ---
 LANG = 'ru'
@@ -26,13 +27,41 @@ FRAME_HEIGHT = 240
 
 # --- Найстройки детектора ---
 DETECTOR = 'NeuronDetector'
-OBJECT_COUNT = 3
+OBJECT_COUNT = 3  # Количество маркеров у одного человека
+# Количество людей в кадре. Маркеры делятся между ними по положению по X,
+# данные каждого человека обрабатывает отдельный анализатор
+SUBJECT_COUNT = 1
+SUBJECT_MIN_GAP = 30  # Минимальный промежуток по X между людьми (пикс)
+# Сопоставление маркеров между кадрами (devirta_pics.tracker)
+TRACK_MAX_DISTANCE = 40  # Максимальное смещение маркера за кадр (пикс)
+TRACK_MAX_MISSED = 5  # Кадров без маркера, после которых трек теряется
+TRACK_VELOCITY_ALPHA = 0.5  # Сглаживание скорости маркера
 DETECTOR_FPS = 3
 PRINT_DETECTOR_FPS = False
 
+# --- Метрики конвейера захвата ---
+METRICS_WINDOW = 500  # Количество последних измерений в гистограмме
+METRICS_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+METRICS_LOG_INTERVAL = 60  # Период записи метрик в лог (сек). 0 - отключено
+# Замеры времени этапов (METRICS.timed) с запуска приложения. Включаются и
+# выключаются на ходу командой stats
+METRICS_STAGES = False
+PROFILER_INTERVAL_MS = 10  # Период снятия стеков профилировщиком (мс)
+PROFILER_TOP = 15  # Количество функций в отчете профилировщика
+
 # --- Дефолтные настройки анализатора и графа ---
 A_TM_DELTA = 5000
 A_SMOOTH_C = 20
+# Фильтр сглаживания: box - свёртка по всему окну анализа на каждом шаге,
+# moving_average, ema, savgol - причинные фильтры (devirta_pics.filters)
+A_FILTER = 'box'
+# Оценка частоты дыхания по спектру (devirta_pics.respiration)
+RR_WINDOW = 32  # Окно оценки (с)
+RR_SEGMENT = 16  # Длина сегмента спектра (с)
+RR_STEP = 4  # Период обновления оценки (с)
+RR_BAND = (6, 40)  # Диапазон частоты дыхания (вдохов в минуту)
+RR_NFFT = 256  # Длина БПФ сегмента с дополнением нулями
+RR_PEAK_WIDTH = 2  # Полуширина пика для оценки качества (вдохов в минуту)
 A_DELTA_TOP = [0, 100]  # Min и Max дельта длины верхнего отрезка
 A_DELTA_BOT = [0, 100]  # Min и Max дельта длины нижнего отрезка
 ANALYSER_LOGS = True
@@ -42,6 +71,30 @@ G_MAX_CHUNKS = 300
 G_UPD_FREQ = 100
 G_SHOW_SMOOTH = (True, False)  # Для первой и второй линии
 G_SHOW_EXT = (True, True)  # Для первой и второй линии
+# Количество последних завершенных сессий, данные которых хранятся в памяти
+# для выгрузки командой export
+SESSIONS_KEEP = 10
+# События дыхания анализатора (devirta_pics.events)
+EVENTS_CAPACITY = 4096  # Максимум событий сессии в памяти
+EVENTS_FLUSH_EVERY = 100  # Дописывать на диск каждые N событий
+# Каталог данных приложения пользователя: файлы событий и база сессий
+DATA_DIR = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_DATA_HOME') or
+    os.path.join(os.path.expanduser('~'), '.local', 'share'), 'devirta_pics')
+# Каталог для событий (относительный путь - от каталога пакета). None - не
+# записывать: вытесненные из памяти события теряются, а при сбое теряются
+# все события сессии. Части на диске удаляются, когда сессия записана в
+# базу, а без базы - когда ее данные вытеснены из памяти новыми сессиями.
+EVENTS_DIR = os.path.join(DATA_DIR, 'events')
+# База данных сессий (devirta_pics.database). None - не сохранять сессии
+DB_PATH = os.path.join(DATA_DIR, 'sessions.db')
+DB_BATCH = 50  # Максимум сессий в одной транзакции записи
+
+# --- Настройки интерфейса ---
+UI_REFRESH_MS = 200  # Период обновления координат и логов в окне режима
+UI_LOGS_CAPACITY = 1000  # Максимальное количество строк логов в окне
+# Период проверки файлов настроек на изменения извне во время режима
+SETTINGS_CHECK_MS = 1000
 
 # --- Сетевые настройки ---
 # Можно использовать "127.0.0.1", тогда будет возможность подключиться по
@@ -51,3 +104,25 @@ PORT = 0  # 0 задает сокету автоматически выбрат
 # Дефолтные настройки, если используется статичный адоес (также и токен)
 STATIC_PORT = 8080
 STATIC_AUTH_TOKEN = '123456'
+# NetServer - один клиент за раз, AsyncNetServer - множество клиентов
+NET_SERVER = 'AsyncNetServer'
+NET_RECV_SIZE = 65536  # Размер буфера одного чтения из сокета
+# Таймаут подключения, отправки и ожидания авторизации (с). Ожидание команд
+# таймаута не имеет: поток сети спит, пока не придут данные или его не
+# разбудят при закрытии.
+NET_TIMEOUT = 2.0
+NET_COMMAND_QUEUE = 64  # Максимум команд клиентов, ожидающих выполнения
+NET_MAX_MESSAGE_SIZE = 16 * 1024 * 1024  # Максимальный размер сообщения
+# Телеметрия по подписке (команда subscribe)
+TELEMETRY_RATE = 10  # Частота отправки по умолчанию (Гц)
+TELEMETRY_MAX_RATE = 50  # Максимальная частота, которую может запросить клиент
+TELEMETRY_QUEUE = 256  # Размер очереди сэмплов одного клиента
+# Выгрузка данных сессий (команда export)
+EXPORT_CHUNK = 1000  # Строк в одном сообщении по умолчанию
+EXPORT_MAX_CHUNK = 10000  # Максимум строк в сообщении, который можно запросить
+
+# --- Агрегатор результатов нескольких станций (devirta_pics.fleet) ---
+FLEET_RECONNECT_MIN = 1  # Пауза перед повторным подключением (с)
+FLEET_RECONNECT_MAX = 30  # Максимальная пауза, она растет вдвое при ошибках
+FLEET_STATUS_INTERVAL = 5  # Период опроса состояния станций (с)
+FLEET_SESSIONS_KEEP = 1000  # Сколько последних сессий хранить в индексе
@@ -0,0 +1,250 @@
+"""
+Локальная база данных сессий (SQLite в режиме WAL): пациенты, режимы,
+сессии и события дыхания. Сессии записываются фоновым потоком пачками,
+поэтому сохранение не задерживает интерфейс. Чтение идет в отдельных
+соединениях и не блокируется записью.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime as dt
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from devirta_pics.config import DB_BATCH, DB_PATH
+from devirta_pics.events import BREATH_TYPES, EVENT_DTYPE, EventStore
+from devirta_pics.utils.singleton import Singleton
+from devirta_pics.utils.tools import load_rsc
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS modes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    patient TEXT,
+    subject INTEGER NOT NULL DEFAULT 0,
+    mode_id INTEGER REFERENCES modes (id),
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    events INTEGER NOT NULL,
+    dominant TEXT,
+    {', '.join(f'{tp} INTEGER NOT NULL' for tp in BREATH_TYPES)}
+);
+CREATE INDEX IF NOT EXISTS sessions_patient ON sessions (patient, started);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started);
+CREATE TABLE IF NOT EXISTS events (
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    {', '.join(f'{name} {"INTEGER" if dtype.kind == "u" else "REAL"}'
+               for name, (dtype, _) in EVENT_DTYPE.fields.items())},
+    PRIMARY KEY (session_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_wall ON events (wall);
+"""
+EVENT_COLUMNS = ('session_id', 'idx', *EVENT_DTYPE.names)
+SESSION_COLUMNS = ('id', 'patient', 'subject', 'mode_id', 'started',
+                   'finished', 'events', 'dominant', *BREATH_TYPES)
+
+
+class SessionDB(metaclass=Singleton):
+    def __init__(self, path=DB_PATH, batch=DB_BATCH):
+        """
+        :param path: Файл базы, относительный путь - от каталога пакета.
+        :param batch: Максимум сессий в одной транзакции записи.
+        """
+        self.path = path if os.path.isabs(path) else load_rsc(path)
+        self.batch = batch
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+        self._queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _migrate(cls, conn: sqlite3.Connection) -> None:
+        # Базы, созданные до появления номера человека в кадре: все их
+        # сессии - первого человека
+        columns = {row[1] for row in
+                   conn.execute('PRAGMA table_info(sessions)')}
+        if 'subject' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE sessions ADD COLUMN '
+                             'subject INTEGER NOT NULL DEFAULT 0')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys=ON')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    # --- Запись ---
+
+    def add(self, session, patient: Optional[str] = None) -> None:
+        """
+        Ставит сессию (sessions.Session) в очередь на запись.
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop,
+                                                daemon=True)
+                self._writer.start()
+        self._queue.put((session, patient))
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        closed = False
+        while not closed:
+            items = [self._queue.get()]
+            # Забираем накопившиеся сессии в одну транзакцию
+            while len(items) < self.batch and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            # None ставится в очередь при закрытии, после него сессий нет
+            closed = items[-1] is None
+            try:
+                with conn:
+                    for session, patient in filter(None, items):
+                        self._insert(conn, session, patient)
+            except sqlite3.Error as e:
+                logger.error(f'DB: failed to write sessions: {e}')
+            else:
+                for session, _ in filter(None, items):
+                    session.stored(self)
+            for _ in items:
+                self._queue.task_done()
+        conn.close()
+
+    @classmethod
+    def _insert(cls, conn: sqlite3.Connection, session,
+                patient: Optional[str]) -> None:
+        events: np.ndarray = session.events.array()
+        counters = dict.fromkeys(BREATH_TYPES, 0)
+        if len(events):
+            counters = EventStore.counters(events[-1])
+        dominant = None
+        if len(set(counters.values())) > 1:
+            dominant = max(counters, key=counters.get)
+
+        mode_id = None
+        if session.mode is not None:
+            conn.execute('INSERT OR IGNORE INTO modes (name) VALUES (?)',
+                         (session.mode,))
+            mode_id = conn.execute('SELECT id FROM modes WHERE name = ?',
+                                   (session.mode,)).fetchone()[0]
+        conn.execute(
+            f'INSERT OR REPLACE INTO sessions ({", ".join(SESSION_COLUMNS)}) '
+            f'VALUES ({", ".join("?" * len(SESSION_COLUMNS))})',
+            (session.id, patient, session.subject, mode_id,
+             session.started.timestamp(), session.finished.timestamp(),
+             len(events), dominant, *(counters[tp] for tp in BREATH_TYPES)))
+        conn.executemany(
+            f'INSERT OR REPLACE INTO events ({", ".join(EVENT_COLUMNS)}) '
+            f'VALUES ({", ".join("?" * len(EVENT_COLUMNS))})',
+            ((session.id, i, *row) for i, row in enumerate(events.tolist())))
+
+    def flush(self) -> None:
+        """
+        Ожидает записи всех сессий из очереди.
+        """
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                return
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    # --- Чтение ---
+
+    def sessions(self, patient: Optional[str] = None,
+                 since: Optional[dt] = None, until: Optional[dt] = None,
+                 limit=100, subject: Optional[int] = None) -> List[dict]:
+        """
+        Сессии без событий, последние первыми.
+        :param subject: Номер человека в кадре, None - все.
+        """
+        where, params = self._where(patient, since, until, subject)
+        rows = self._query(
+            f'SELECT s.*, m.name AS mode FROM sessions s '
+            f'LEFT JOIN modes m ON m.id = s.mode_id {where} '
+            f'ORDER BY s.started DESC LIMIT ?', (*params, limit))
+        return [{**dict(row),
+                 'started': dt.fromtimestamp(row['started']).isoformat(),
+                 'finished': dt.fromtimestamp(row['finished']).isoformat()}
+                for row in rows]
+
+    def events(self, session_id: str, offset=0, limit=-1) -> List[dict]:
+        """
+        События сессии в формате логов анализатора.
+        """
+        rows = self._query(
+            f'SELECT {", ".join(EVENT_DTYPE.names)} FROM events '
+            f'WHERE session_id = ? ORDER BY idx LIMIT ? OFFSET ?',
+            (session_id, limit, offset))
+        events = np.array([tuple(row) for row in rows], dtype=EVENT_DTYPE)
+        return [EventStore.to_dict(e) for e in events]
+
+    def breath_distribution(self, patient: Optional[str] = None,
+                            since: Optional[dt] = None,
+                            until: Optional[dt] = None,
+                            subject: Optional[int] = None) -> Dict[str, int]:
+        """
+        Количество вдохов каждого типа у пациента за период.
+        """
+        where, params = self._where(patient, since, until, subject)
+        row = self._query(
+            f'SELECT {", ".join(f"SUM(s.{tp})" for tp in BREATH_TYPES)} '
+            f'FROM sessions s {where}', params)[0]
+        return {tp: row[i] or 0 for i, tp in enumerate(BREATH_TYPES)}
+
+    def dominant_distribution(self, patient: Optional[str] = None,
+                              since: Optional[dt] = None,
+                              until: Optional[dt] = None,
+                              subject: Optional[int] = None
+                              ) -> Dict[str, int]:
+        """
+        Количество сессий с каждым преобладающим типом дыхания за период.
+        """
+        where, params = self._where(patient, since, until, subject)
+        rows = self._query(f'SELECT s.dominant, COUNT(*) FROM sessions s '
+                           f'{where} GROUP BY s.dominant', params)
+        return {row[0]: row[1] for row in rows}
+
+    @classmethod
+    def _where(cls, patient: Optional[str], since: Optional[dt],
+               until: Optional[dt], subject: Optional[int] = None) -> tuple:
+        conditions, params = [], []
+        if patient is not None:
+            conditions.append('s.patient = ?')
+            params.append(patient)
+        if subject is not None:
+            conditions.append('s.subject = ?')
+            params.append(subject)
+        if since is not None:
+            conditions.append('s.started >= ?')
+            params.append(since.timestamp())
+        if until is not None:
+            conditions.append('s.started < ?')
+            params.append(until.timestamp())
+        if not conditions:
+            return '', params
+        return f'WHERE {" AND ".join(conditions)}', params
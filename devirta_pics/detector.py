@@ -6,13 +6,14 @@ import time
 
 import cv2
 import numpy as np
-import torch
-from PIL import Image
 
 from devirta_pics.camera.camera import Camera
 from devirta_pics.config import (DETECTOR, DETECTOR_FPS, FPS, OBJECT_COUNT,
-                                 PRINT_DETECTOR_FPS)
+                                 PRINT_DETECTOR_FPS, SUBJECT_COUNT)
+from devirta_pics.network.telemetry import TELEMETRY
+from devirta_pics.tracker import MarkerTracker
 from devirta_pics.utils.colors import Color
+from devirta_pics.utils.metrics import METRICS
 from devirta_pics.utils.singleton import Singleton
 from devirta_pics.utils.tools import load_rsc
 
@@ -24,17 +25,24 @@ logger = logging.getLogger(__name__)
 
 
 class BaseDetector:
-    def __init__(self, fps=FPS, obj_count=OBJECT_COUNT):
+    def __init__(self, fps=FPS, obj_count=OBJECT_COUNT,
+                 subject_count=SUBJECT_COUNT):
         self.cam: Camera = Camera()
-        self.obj_count = obj_count  # Количество распознаваемых объектов
+        self.obj_count = obj_count  # Количество маркеров у одного человека
+        self.subject_count = subject_count  # Количество людей в кадре
 
-        self.positions = {i: (0, 0) for i in range(obj_count)}  # {num: (x, y)}
+        # Координаты маркеров каждого человека слева направо {num: (x, y)}
+        self.subjects = [{i: (0, 0) for i in range(obj_count)}
+                         for _ in range(subject_count)]
+        self.positions = self.subjects[0]  # Маркеры первого человека
+        self.tracker = MarkerTracker(subject_count, obj_count)
 
         self.frame = None  # Кадр с отрисованными координатам
         self.fps, self.fps_count = fps, 0
 
         self.start_time = time.time()  # Время запуска таймера
         self.one_second_timer = time.time()
+        self.last_frame_id = 0  # Номер последнего обработанного кадра камеры
 
         self._thread, self.is_run = None, True
 
@@ -54,6 +62,7 @@ class BaseDetector:
             if not self.cam.alive():
                 self.cam.restart()
             logger.info('STARTING DETECTOR...')
+            METRICS.start_reporting()
             self._thread = threading.Thread(
                 target=self._run, name='NeuronDetector')
             self._thread.start()
@@ -86,12 +95,17 @@ class BaseDetector:
 
 
 class NeuronDetector(BaseDetector, metaclass=Singleton):
-    def __init__(self, fps=DETECTOR_FPS, obj_count=OBJECT_COUNT):
+    def __init__(self, fps=DETECTOR_FPS, obj_count=OBJECT_COUNT,
+                 subject_count=SUBJECT_COUNT):
+        # torch загружается только при создании детектора, так как его
+        # импорт занимает больше всего времени при старте приложения
+        import torch
+
         # Загрузка сетки из корня проекта, а модели из data/neuron
         self.model = torch.hub.load('ultralytics/yolov5', 'custom',
                                     path=load_rsc('data/neuron/best.pt'),
                                     force_reload=True)
-        super().__init__(fps, obj_count)
+        super().__init__(fps, obj_count, subject_count)
 
     def _run(self) -> None:
         # Пока камера работает получаем изображение и модифицируем его
@@ -99,16 +113,20 @@ class NeuronDetector(BaseDetector, metaclass=Singleton):
             # Считываем кадры с устаовленным fps
             if time.time() - self.start_time >= 1 / self.fps:
                 # Считывание изображения
-                ret, img = self.cam.read()
+                ret, img, frame_id, frame_time = self.cam.read_info()
 
                 if not ret:
                     continue
 
                 self.start_time = time.time()
                 self.fps_count += 1
+                self._count_frames(frame_id)
 
                 # Получаем картикну с отмеченными распознанными объектами
                 self.frame = self._get_img_with_objects(img)
+                METRICS.observe('capture_to_position',
+                                (time.perf_counter() - frame_time) * 1000)
+                METRICS.tick('detector')
                 self.call_listeners(self.frame)
 
             # Каждую секунду обновляем счетчик кадров
@@ -118,47 +136,72 @@ class NeuronDetector(BaseDetector, metaclass=Singleton):
                 self.one_second_timer = time.time()
                 self.fps_count = 0
 
+    def _count_frames(self, frame_id: int) -> None:
+        """
+        Считает кадры камеры, пропущенные детектором, и повторно
+        обработанные кадры.
+        """
+        if frame_id == self.last_frame_id:
+            METRICS.incr('duplicate_frames')
+        elif frame_id > self.last_frame_id + 1 and self.last_frame_id:
+            METRICS.incr('dropped_frames', frame_id - self.last_frame_id - 1)
+        self.last_frame_id = frame_id
+
     def _get_img_with_objects(self, img):
         """
-        Находит кубы на картинке и отрисовывает их на изображении.
+        Находит кубы на картинке, назначает их маркерам людей и отрисовывает
+        на изображении. Один проход сети на кадр для всех людей.
         :param img: Image from camera device
         :return: Image with recognized objects
         """
+        inference_start = time.perf_counter()
         output = self._search(img)
-        cubes_count = len(output.pandas().xyxy[0])
-        positions = []
-        for i in range(self.obj_count if cubes_count >= self.obj_count
-                       else cubes_count):
-            x_min = int(output.pandas().xyxy[0]['xmin'][i])
-            x_max = int(output.pandas().xyxy[0]['xmax'][i])
-            y_min = int(output.pandas().xyxy[0]['ymin'][i])
-            y_max = int(output.pandas().xyxy[0]['ymax'][i])
-
-            x = x_min + (abs(x_max - x_min) // 2)
-            y = y_min + (abs(y_max - y_min) // 2)
-
-            cv2.rectangle(img=img, pt1=(int(x_min), int(y_max)),
-                          pt2=(int(x_max), int(y_min)),
+        post_start = time.perf_counter()
+        METRICS.observe('inference', (post_start - inference_start) * 1000)
+
+        # Рамки xmin, ymin, xmax, ymax по убыванию уверенности
+        boxes = output.xyxy[0][:, :4].cpu().numpy().astype(int)
+        centers = np.column_stack([
+            boxes[:, 0] + np.abs(boxes[:, 2] - boxes[:, 0]) // 2,
+            boxes[:, 1] + np.abs(boxes[:, 3] - boxes[:, 1]) // 2])
+
+        # Номера маркеров не зависят от их порядка на кадре
+        with METRICS.timed('tracking'):
+            match = self.tracker.update(centers)
+        for track, i in enumerate(match.tolist()):
+            subject, k = divmod(track, self.obj_count)
+            x, y = map(int, self.tracker.pos[track])
+            self.subjects[subject][k] = (x, y)
+            if i < 0:
+                continue
+
+            x_min, y_min, x_max, y_max = boxes[i].tolist()
+            cv2.rectangle(img=img, pt1=(x_min, y_max), pt2=(x_max, y_min),
                           color=(255, 0, 0), thickness=2)
 
             cv2.circle(img, (x, y), CIRCLE_RADIUS, Color.c('yellow'), 2)
-            cv2.putText(img, f"{x}-{y}", (x + 10, y - 10),
+            label = f"{x}-{y}"
+            if self.subject_count > 1:
+                label = f"{subject + 1}: {label}"
+            cv2.putText(img, label, (x + 10, y - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, TEXT_SCALE,
                         Color.c('yellow'), 2)
 
-            # Создаем новый список координат
-            positions.append((x, y))
-
-        # Сортируем координаты по Y и сохраняем их в словрь
-        self.positions.update({k: v for k, v in enumerate(
-            sorted(positions, key=lambda x: x[1]))})
+        TELEMETRY.publish('positions', list(self.positions.values()))
+        if self.subject_count > 1:
+            TELEMETRY.publish('subjects', [list(positions.values())
+                                           for positions in self.subjects])
 
+        METRICS.observe('postprocess',
+                        (time.perf_counter() - post_start) * 1000)
         return img
 
     def _search(self, image_matrix):
         """
         Находит кубы на изображении
         """
+        from PIL import Image
+
         pil_image = Image.fromarray(np.uint8(image_matrix)).convert('RGB')
         output = self.model(pil_image)
         return output
@@ -0,0 +1,214 @@
+"""
+Хранилище событий дыхания анализатора. События хранятся по столбцам в
+заранее выделенном структурированном массиве NumPy ограниченного размера и
+периодически дописываются на диск частями в формате npz.
+"""
+import glob
+import logging
+import os
+import shutil
+from datetime import datetime as dt
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from devirta_pics.config import (EVENTS_CAPACITY, EVENTS_DIR,
+                                 EVENTS_FLUSH_EVERY)
+from devirta_pics.utils.tools import load_rsc
+
+logger = logging.getLogger(__name__)
+
+BREATH_TYPES = ('stomach', 'chest', 'mix')
+EVENT_DTYPE = np.dtype([
+    ('wall', 'f8'),  # Время регистрации события (timestamp)
+    ('t1', 'f8'), ('t2', 'f8'),  # Время верхних точек всплесков A и B
+    ('delta_a', 'f4'), ('delta_b', 'f4'),
+    # Значения экстремумов: максимум и два минимума для A и B
+    ('a_max', 'f4'), ('a_min1', 'f4'), ('a_min2', 'f4'),
+    ('b_max', 'f4'), ('b_min1', 'f4'), ('b_min2', 'f4'),
+    ('type', 'u1'),  # Индекс типа дыхания в BREATH_TYPES
+    # Счетчики типов дыхания после события
+    ('stomach', 'u4'), ('chest', 'u4'), ('mix', 'u4'),
+])
+
+
+class EventStore:
+    """
+    Индексы событий сквозные: с 0 для первого события сессии. В памяти
+    лежат события с индекса `first`, более ранние - в файлах на диске. Если
+    каталог не задан или записать не удалось, то вытесненные из памяти
+    события теряются и в выгрузку не попадают. Потерянные диапазоны
+    индексов запоминаются, поэтому выгрузка идет без пропусков и повторов,
+    даже если события терялись посреди сессии.
+    """
+
+    def __init__(self, name: str, capacity=EVENTS_CAPACITY,
+                 flush_every=EVENTS_FLUSH_EVERY, directory=EVENTS_DIR):
+        """
+        :param name: Имя подкаталога с файлами событий.
+        :param flush_every: Записывать на диск каждые N событий, 0 - только
+                            при вытеснении и закрытии.
+        :param directory: Каталог для файлов событий, None - не записывать.
+        """
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self.path = None
+        if directory is not None:
+            if not os.path.isabs(directory):
+                directory = load_rsc(directory)
+            self.path = os.path.join(directory, name)
+
+        self._data = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.first = 0  # Индекс первого события в памяти
+        self.total = 0  # Количество событий за сессию
+        self.flushed = 0  # Количество событий, записанных на диск
+        self.lost = 0  # Количество вытесненных и не записанных событий
+        # Диапазоны индексов [start, stop) потерянных событий по возрастанию
+        self.gaps: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return self.total - self.lost
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def append(self, data: dict, wall: Optional[dt] = None) -> None:
+        """
+        Добавляет событие из лога анализатора.
+        """
+        if self.total - self.first >= self.capacity:
+            self._evict()
+
+        (a_max, a_min), (b_max, b_min) = data['peaks_val']
+        counters = data['breath_counters']
+        self._data[self.total - self.first] = (
+            (wall or dt.now()).timestamp(), *data['times'], *data['deltas'],
+            a_max, *a_min, b_max, *b_min,
+            BREATH_TYPES.index(data['type_breathing']),
+            *(counters[tp] for tp in BREATH_TYPES))
+        self.total += 1
+
+        if self.flush_every and self.total - self.flushed >= self.flush_every:
+            self.flush()
+
+    def _evict(self) -> None:
+        # Оставляем в памяти последнюю 1/4 событий, остальные сбрасываем
+        self.flush()
+        keep = self.capacity // 4
+        size = self.total - self.first
+        if self.flushed < self.total - keep:
+            # Записать не удалось
+            self._lose(max(self.flushed, self.first), self.total - keep)
+        self._data[:keep] = self._data[size - keep:size]
+        self.first = self.total - keep
+
+    def _lose(self, start: int, stop: int) -> None:
+        self.lost += stop - start
+        if self.gaps and self.gaps[-1][1] == start:
+            self.gaps[-1] = (self.gaps[-1][0], stop)
+        else:
+            self.gaps.append((start, stop))
+
+    def flush(self) -> None:
+        """
+        Дописывает на диск события, которые еще не записаны.
+        """
+        if self.path is None or self.flushed >= self.total:
+            return
+        start = max(self.flushed, self.first)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            np.savez(os.path.join(self.path, f'events-{start:08d}.npz'),
+                     events=self.array(start, self.total))
+        except OSError as e:
+            logger.error(f'EVENTS: failed to flush to {self.path}: {e}')
+            return
+        self.flushed = self.total
+
+    def close(self) -> None:
+        self.flush()
+
+    def discard(self) -> None:
+        """
+        Удаляет части, записанные на диск, когда события сохранены в базу
+        сессий или больше не нужны для выгрузки. После этого события
+        сохраняются только в памяти.
+        """
+        if self.path is None:
+            return
+        path, self.path = self.path, None
+        shutil.rmtree(path, ignore_errors=True)
+
+    def array(self, start=0, stop=None) -> np.ndarray:
+        """
+        События с индексами [start, stop) из памяти и с диска.
+        """
+        stop = self.total if stop is None else min(stop, self.total)
+        parts = []
+        if start < self.first and self.path is not None:
+            parts.extend(self._load(start, min(stop, self.first)))
+        if stop > self.first:
+            parts.append(self._data[max(start, self.first) - self.first:
+                                    stop - self.first])
+        if not parts:
+            return np.zeros(0, dtype=EVENT_DTYPE)
+        return np.concatenate(parts)
+
+    def _load(self, start: int, stop: int) -> List[np.ndarray]:
+        parts = []
+        for file in sorted(glob.glob(os.path.join(self.path,
+                                                  'events-*.npz'))):
+            first = int(os.path.basename(file)[7:-4])
+            if first >= stop:
+                break
+            try:
+                with np.load(file) as f:
+                    events = f['events']
+            except OSError as e:
+                # Части удалили во время чтения
+                logger.error(f'EVENTS: failed to load {file}: {e}')
+                continue
+            if first + len(events) > start:
+                parts.append(events[max(start - first, 0):stop - first])
+        return parts
+
+    def rows(self, offset: int, limit: int) -> List[dict]:
+        """
+        События в формате логов анализатора для выгрузки.
+        :param offset: Индекс без учета потерянных событий.
+        """
+        # Потерянных событий нет ни в памяти, ни на диске, поэтому array
+        # пропускает их внутри диапазона
+        start, stop = self._index(offset), self._index(offset + limit)
+        return [self.to_dict(e) for e in self.array(start, stop)]
+
+    def _index(self, offset: int) -> int:
+        """
+        Сквозной индекс события по индексу без учета потерянных.
+        """
+        for start, stop in self.gaps:
+            if offset < start:
+                break
+            offset += stop - start
+        return offset
+
+    @classmethod
+    def to_dict(cls, event) -> dict:
+        return {
+            'time': dt.fromtimestamp(event['wall']).isoformat(),
+            'times': [float(event['t1']), float(event['t2'])],
+            'deltas': [round(float(event['delta_a']), 4),
+                       round(float(event['delta_b']), 4)],
+            'peaks_val': [
+                [round(float(event[f'{p}_max']), 4),
+                 [round(float(event[f'{p}_min1']), 4),
+                  round(float(event[f'{p}_min2']), 4)]]
+                for p in ('a', 'b')],
+            'type_breathing': BREATH_TYPES[event['type']],
+            'breath_counters': cls.counters(event),
+        }
+
+    @classmethod
+    def counters(cls, event) -> Dict[str, int]:
+        return {tp: int(event[tp]) for tp in BREATH_TYPES}
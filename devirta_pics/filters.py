@@ -0,0 +1,201 @@
+"""
+Причинные фильтры для сглаживания длин отрезков A и B. Каждый новый сэмпл
+обрабатывается за время, не зависящее от длины истории, а значения
+сглаженной кривой зависят только от прошлых сэмплов, поэтому последние
+точки окна анализа не искажаются.
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+import numpy as np
+
+# Фильтры, доступные в настройках анализатора. box - сглаживание всего окна
+# анализа свёрткой на каждом шаге (не причинное)
+FILTERS: Dict[str, str] = {
+    'box': 'Окно по всему графику (свёртка)',
+    'moving_average': 'Скользящее среднее',
+    'ema': 'Экспоненциальное (IIR)',
+    'savgol': 'Савицкого-Голея',
+}
+
+
+class CausalFilter(ABC):
+    def __init__(self, size: int, lines=2):
+        """
+        :param size: Размер окна фильтра в сэмплах.
+        :param lines: Количество сглаживаемых кривых.
+        """
+        self.size = max(int(size), 1)
+        self.lines = lines
+
+    @abstractmethod
+    def update(self, x: np.ndarray) -> np.ndarray:
+        """
+        Обрабатывает один сэмпл всех кривых.
+        :return: Сглаженные значения.
+        """
+
+    @property
+    @abstractmethod
+    def delay(self) -> float:
+        """
+        Задержка сглаженной кривой относительно исходной на частотах дыхания
+        (в сэмплах).
+        """
+
+
+class MovingAverageFilter(CausalFilter):
+    """
+    Скользящее среднее по разности кумулятивных сумм: сумма окна
+    обновляется добавлением нового сэмпла и вычитанием выпавшего.
+    """
+
+    def __init__(self, size: int, lines=2):
+        super().__init__(size, lines)
+        self._ring = np.zeros((self.size, lines))
+        self._sum = np.zeros(lines)
+        self._i = 0
+        self._count = 0
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        self._sum += x - self._ring[self._i]
+        self._ring[self._i] = x
+        self._i = (self._i + 1) % self.size
+        if self._i == 0:
+            # Пересчитываем сумму, чтобы не накапливалась ошибка округления
+            self._sum = self._ring.sum(axis=0)
+        self._count = min(self._count + 1, self.size)
+        return self._sum / self._count
+
+    @property
+    def delay(self) -> float:
+        return (self.size - 1) / 2
+
+
+class EmaFilter(CausalFilter):
+    """
+    Экспоненциальное сглаживание (IIR фильтр первого порядка). Коэффициент
+    подобран так, чтобы задержка совпадала со скользящим средним того же
+    размера.
+    """
+
+    def __init__(self, size: int, lines=2):
+        super().__init__(size, lines)
+        self.alpha = 2 / (self.size + 1)
+        self._y: Optional[np.ndarray] = None
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        if self._y is None:
+            self._y = np.array(x, dtype=float)
+        else:
+            self._y += self.alpha * (x - self._y)
+        return self._y.copy()
+
+    @property
+    def delay(self) -> float:
+        return (1 - self.alpha) / self.alpha
+
+
+class SavgolFilter(CausalFilter):
+    """
+    Фильтр Савицкого-Голея для последней точки окна: значение полинома,
+    построенного методом наименьших квадратов по последним `size` сэмплам.
+    Коэффициенты вычисляются один раз, на сэмпл приходится одно скалярное
+    произведение длины окна.
+    """
+
+    def __init__(self, size: int, lines=2, order=2):
+        super().__init__(max(size, order + 2), lines)
+        self.order = order
+        # Строка псевдообратной матрицы Вандермонда для свободного члена -
+        # значения полинома в точке t = 0 (последний сэмпл)
+        vander = np.vander(np.arange(-self.size + 1, 1), order + 1,
+                           increasing=True)
+        self._coef = np.linalg.pinv(vander)[0]
+        # Окно хранится дважды подряд, чтобы срез последних сэмплов всегда
+        # был непрерывным
+        self._buf = np.zeros((2 * self.size, lines))
+        self._i = 0
+        self._count = 0
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        self._buf[self._i] = self._buf[self._i + self.size] = x
+        self._i = (self._i + 1) % self.size
+        self._count += 1
+        if self._count < self.size:
+            # Пока окно не заполнено - среднее по имеющимся сэмплам
+            window = self._buf[self._i + self.size - self._count:
+                               self._i + self.size]
+            return window.mean(axis=0)
+        return self._coef @ self._buf[self._i:self._i + self.size]
+
+    @property
+    def delay(self) -> float:
+        # Полином в последней точке окна не запаздывает, пока кривая на
+        # окне близка к параболе
+        return 0.0
+
+
+CAUSAL_FILTERS = {
+    'moving_average': MovingAverageFilter,
+    'ema': EmaFilter,
+    'savgol': SavgolFilter,
+}
+
+
+class FilterStage:
+    """
+    Сглаживание окна анализа причинным фильтром. Через фильтр проходят
+    только новые сэмплы окна (по времени), сглаженные значения хранятся для
+    последних `capacity` сэмплов.
+    """
+
+    def __init__(self, name: str, size: int, capacity: int, lines=2):
+        self.filter = CAUSAL_FILTERS[name](size, lines)
+        self.capacity = max(int(capacity), 1)
+        self._buf = np.zeros((2 * self.capacity, lines))
+        self._i = 0
+        self._count = 0
+        self._last_time = -np.inf
+        self._last: Optional[np.ndarray] = None  # Последний ненулевой сэмпл
+
+    @property
+    def delay(self) -> int:
+        """
+        Задержка фильтра в целых сэмплах: на столько сэмплов экстремумы
+        сглаженной кривой отстают от экстремумов исходной.
+        """
+        return int(round(self.filter.delay))
+
+    def feed(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: Окно анализа: время и значения кривых по столбцам.
+        :return: Сглаженные значения для всех строк окна.
+        """
+        new = data[data[:, 0] > self._last_time]
+        for row in new[:, 1:]:
+            # Нулевые сэмплы (пустая первая строка и кадры без маркеров) не
+            # попадают в фильтр, иначе кривая начинается с подъема от нуля.
+            # Как в RespirationEstimator.add, вместо них повторяем последний
+            # сэмпл, а до первого ненулевого фильтр не запускается
+            if row.any():
+                self._last = row.copy()
+            y = row if self._last is None else self.filter.update(self._last)
+            self._buf[self._i] = self._buf[self._i + self.capacity] = y
+            self._i = (self._i + 1) % self.capacity
+        if len(new):
+            self._last_time = new[-1, 0]
+            self._count = min(self._count + len(new), self.capacity)
+        size = min(len(data), self._count)
+        end = self._i + self.capacity
+        return self._buf[end - size:end]
+
+
+def create_stage(name: str, size: int,
+                 capacity: int) -> Optional[FilterStage]:
+    """
+    :return: None для сглаживания свёрткой по всему окну (box).
+    """
+    if name not in CAUSAL_FILTERS:
+        return None
+    return FilterStage(name, size, capacity)
@@ -0,0 +1,107 @@
+"""
+Агрегатор результатов нескольких станций DevirtaPics.
+
+Станции задаются JSON файлом:
+    [{"name": "room-1", "addr": "10.0.0.11:8080", "token": "123456"}, ...]
+
+Команды из стандартного ввода (по одной JSON команде в строке) рассылаются
+всем станциям, ответы выводятся в JSON.
+
+Пример:
+    python -m devirta_pics.fleet stations.json --subscribe 5
+    {"type": "mode", "mode": "rehab"}
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import sys
+import threading
+
+from devirta_pics.fleet.fleet import Fleet
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)s %(name)s %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def read_stdin(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+    # Чтение блокирующее, поэтому в отдельном потоке
+    for line in sys.stdin:
+        loop.call_soon_threadsafe(queue.put_nowait, line)
+    loop.call_soon_threadsafe(queue.put_nowait, None)
+
+
+async def handle_commands(fleet: Fleet, queue: asyncio.Queue):
+    while (line := await queue.get()) is not None:
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            print(json.dumps({'error': 'Invalid JSON.'}), flush=True)
+            continue
+        print(json.dumps(await fleet.broadcast(data), ensure_ascii=False),
+              flush=True)
+
+
+async def report(fleet: Fleet, interval: float, snapshot_path=None):
+    while True:
+        await asyncio.sleep(interval)
+        stations = fleet.index.stations
+        online = sum(st['connected'] for st in stations.values())
+        logger.info(f'FLEET: {online}/{len(stations)} stations online, '
+                    f'{len(fleet.index.sessions)} sessions')
+        if snapshot_path:
+            with open(snapshot_path, 'w', encoding='utf-8') as f:
+                json.dump(fleet.index.snapshot(), f, ensure_ascii=False,
+                          indent=2)
+
+
+async def run(args):
+    loop = asyncio.get_event_loop()
+    fleet = Fleet(Fleet.load_stations(args.stations),
+                  subscribe_rate=args.subscribe,
+                  collect_data=not args.no_collect)
+    fleet.start()
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+
+    queue = asyncio.Queue()
+    threading.Thread(target=read_stdin, args=(loop, queue),
+                     daemon=True).start()
+    tasks = [asyncio.ensure_future(handle_commands(fleet, queue)),
+             asyncio.ensure_future(report(fleet, args.report_interval,
+                                          args.snapshot))]
+    await stop.wait()
+
+    for task in tasks:
+        task.cancel()
+    await fleet.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Агрегатор результатов нескольких станций DevirtaPics.')
+    parser.add_argument('stations', help='JSON файл со списком станций')
+    parser.add_argument('--subscribe', type=float, default=None,
+                        help='Подписаться на телеметрию с этой частотой')
+    parser.add_argument('--no-collect', action='store_true',
+                        help='Не выгружать данные сессий')
+    parser.add_argument('--report-interval', type=float, default=10)
+    parser.add_argument('--snapshot', default=None,
+                        help='Файл, в который периодически записывается '
+                             'состояние станций и сессий')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Агрегатор результатов нескольких станций DevirtaPics.
+
+К каждой станции держится постоянное подключение, которое восстанавливается
+при обрыве. Агрегатор рассылает команды сразу всем станциям, собирает
+результаты режимов и данные их сессий, а также последние значения
+телеметрии в общий индекс.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from devirta_pics.config import (FLEET_RECONNECT_MAX, FLEET_RECONNECT_MIN,
+                                 FLEET_SESSIONS_KEEP, FLEET_STATUS_INTERVAL,
+                                 NET_TIMEOUT)
+from devirta_pics.network.aioclient import AsyncNetClient
+from devirta_pics.sessions import EXPORT_STREAMS
+
+logger = logging.getLogger(__name__)
+
+
+class FleetIndex:
+    """
+    Общий индекс станций и их сессий.
+    """
+
+    def __init__(self, keep=FLEET_SESSIONS_KEEP):
+        self.keep = keep
+        self.stations: Dict[str, dict] = {}
+        # {(станция, id сессии): сессия}
+        self.sessions: Dict[Tuple[str, str], dict] = OrderedDict()
+
+    def station(self, name: str) -> dict:
+        if name not in self.stations:
+            self.stations[name] = {'connected': False, 'last_seen': None,
+                                   'status': None, 'telemetry': {},
+                                   'dropped': 0, 'reconnects': 0,
+                                   'error': None}
+        return self.stations[name]
+
+    def seen(self, name: str) -> None:
+        self.station(name)['last_seen'] = time.time()
+
+    def session(self, name: str, session_id: str) -> dict:
+        key = (name, session_id)
+        if key not in self.sessions:
+            self.sessions[key] = {'station': name, 'session': session_id,
+                                  'code': None, 'result': None,
+                                  'series': [], 'events': [],
+                                  'complete': False}
+            while len(self.sessions) > self.keep:
+                self.sessions.popitem(last=False)
+        return self.sessions[key]
+
+    def add_result(self, name: str, message: dict) -> Optional[dict]:
+        """
+        Добавляет результат режима (коды 201 и 204).
+        :return: Сессия, если станция сообщила ее id.
+        """
+        if not (session_id := message.get('session')):
+            return None
+        session = self.session(name, session_id)
+        session['code'], session['result'] = message.get('code'), \
+            message.get('data')
+        return session
+
+    def add_telemetry(self, name: str, data: dict) -> None:
+        station = self.station(name)
+        # Храним только последний сэмпл каждого потока
+        for sample in data.get('samples', []):
+            station['telemetry'][sample.get('stream')] = sample
+        station['dropped'] += data.get('dropped', 0)
+
+    def by_station(self, name: str) -> List[dict]:
+        return [s for (st, _), s in self.sessions.items() if st == name]
+
+    def by_session(self, session_id: str) -> List[dict]:
+        return [s for (_, sid), s in self.sessions.items()
+                if sid == session_id]
+
+    def snapshot(self) -> dict:
+        """
+        Краткое состояние: станции и сессии без данных.
+        """
+        sessions = [{k: v for k, v in s.items() if k not in EXPORT_STREAMS}
+                    for s in self.sessions.values()]
+        for short, full in zip(sessions, self.sessions.values()):
+            short.update({k: len(full[k]) for k in EXPORT_STREAMS})
+        return {'stations': self.stations, 'sessions': sessions}
+
+
+class Station:
+    """
+    Подключение к одной станции с автоматическим переподключением.
+    """
+
+    def __init__(self, fleet: 'Fleet', name: str, addr: str, token: str,
+                 encoding: Optional[str] = None):
+        self.fleet = fleet
+        self.name = name
+        host, port = addr.rsplit(':', 1)
+        self.host, self.port = host, int(port)
+        self.token = token
+        self.encoding = encoding
+
+        self.client: Optional[AsyncNetClient] = None
+        self.connected = asyncio.Event()
+        self._exports: Dict[str, asyncio.Task] = {}
+
+    @property
+    def info(self) -> dict:
+        return self.fleet.index.station(self.name)
+
+    async def run(self) -> None:
+        delay = FLEET_RECONNECT_MIN
+        while not self.fleet.closed:
+            self.client = AsyncNetClient(self.host, self.port,
+                                         on_message=self._on_message)
+            try:
+                response = await self.client.connect(self.token,
+                                                     self.encoding)
+                if response.get('code') == 200:
+                    delay = FLEET_RECONNECT_MIN
+                    await self._serve()
+                else:
+                    self.info['error'] = response.get('msg') or \
+                        'Connection closed.'
+                    logger.warning(f'FLEET: {self.name}: auth failed: '
+                                   f'{self.info["error"]}')
+            except (OSError, asyncio.TimeoutError) as e:
+                self.info['error'] = str(e) or e.__class__.__name__
+                logger.debug(f'FLEET: {self.name}: {self.info["error"]}')
+            finally:
+                self.connected.clear()
+                self.info['connected'] = False
+                await self.client.close()
+
+            if self.fleet.closed:
+                break
+            self.info['reconnects'] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, FLEET_RECONNECT_MAX)
+
+    async def _serve(self) -> None:
+        logger.info(f'FLEET: {self.name}: connected')
+        self.info.update(connected=True, error=None)
+        self.fleet.index.seen(self.name)
+        self.connected.set()
+
+        if self.fleet.subscribe_rate:
+            await self.client.request({'type': 'subscribe',
+                                       'rate': self.fleet.subscribe_rate})
+        poll = asyncio.ensure_future(self._poll_status())
+        try:
+            await self.client.wait_closed()
+        finally:
+            poll.cancel()
+        logger.info(f'FLEET: {self.name}: disconnected')
+
+    async def _poll_status(self) -> None:
+        while self.client.connected:
+            try:
+                response = await self.client.request({'type': 'status'})
+                self.info['status'] = response.get('data')
+                self.fleet.index.seen(self.name)
+            except (ConnectionError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(self.fleet.status_interval)
+
+    def _on_message(self, message: dict) -> None:
+        self.fleet.index.seen(self.name)
+        if message.get('msg') == 'Telemetry.':
+            self.fleet.index.add_telemetry(self.name,
+                                           message.get('data') or {})
+        elif message.get('code') in (201, 204):
+            session = self.fleet.index.add_result(self.name, message)
+            logger.info(f'FLEET: {self.name}: result {message}')
+            if session is not None and self.fleet.collect_data:
+                self.collect(session['session'])
+
+    def collect(self, session_id: str) -> asyncio.Task:
+        """
+        Запускает выгрузку данных сессии в индекс.
+        """
+        if (task := self._exports.get(session_id)) is None or task.done():
+            task = self._exports[session_id] = asyncio.ensure_future(
+                self._export(session_id))
+        return task
+
+    async def _export(self, session_id: str) -> None:
+        session = self.fleet.index.session(self.name, session_id)
+        for stream in EXPORT_STREAMS:
+            # Выгружаем с места, на котором остановились, если соединение
+            # прерывалось
+            while not self.fleet.closed:
+                await self.connected.wait()
+                try:
+                    async for response in self.client.stream(
+                            {'type': 'export', 'session': session_id,
+                             'stream': stream,
+                             'offset': len(session[stream])},
+                            done=lambda r: r.get('code') != 200 or
+                            r['data']['done']):
+                        if response.get('code') != 200:
+                            logger.warning(f'FLEET: {self.name}: export '
+                                           f'{session_id}: {response}')
+                            return
+                        session[stream].extend(response['data']['rows'])
+                    break
+                except (ConnectionError, asyncio.TimeoutError):
+                    # Ждем переподключения
+                    await asyncio.sleep(FLEET_RECONNECT_MIN)
+        session['complete'] = True
+
+
+class Fleet:
+    def __init__(self, stations: List[dict], subscribe_rate=None,
+                 status_interval=FLEET_STATUS_INTERVAL, collect_data=True):
+        """
+        :param stations: Станции: {'name', 'addr' (host:port), 'token',
+                         'encoding' (необязательно)}.
+        :param subscribe_rate: Частота телеметрии, None - не подписываться.
+        :param collect_data: Выгружать данные сессий после результатов.
+        """
+        self.index = FleetIndex()
+        self.subscribe_rate = subscribe_rate
+        self.status_interval = status_interval
+        self.collect_data = collect_data
+        self.closed = False
+
+        self.stations: Dict[str, Station] = OrderedDict()
+        for st in stations:
+            name = st.get('name') or st['addr']
+            self.stations[name] = Station(self, name, st['addr'], st['token'],
+                                          st.get('encoding'))
+            self.index.station(name)
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def load_stations(cls, path: str) -> List[dict]:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def start(self) -> None:
+        self._tasks = [asyncio.ensure_future(st.run())
+                       for st in self.stations.values()]
+
+    async def broadcast(self, data: dict, timeout=NET_TIMEOUT) -> dict:
+        """
+        Отправляет команду всем подключенным станциям одновременно.
+        :return: {станция: ответ}. При ошибке ответ - {'error': текст}.
+        """
+        async def send(st: Station):
+            if st.client is None or not st.client.connected:
+                return {'error': 'Not connected.'}
+            try:
+                response = await st.client.request(data, timeout)
+            except (ConnectionError, asyncio.TimeoutError) as e:
+                return {'error': str(e) or e.__class__.__name__}
+            # Результат прерванного режима приходит в ответ на команду stop
+            if response.get('code') in (201, 204):
+                st._on_message(response)
+            return response
+
+        names = list(self.stations)
+        responses = await asyncio.gather(
+            *(send(self.stations[n]) for n in names))
+        return dict(zip(names, responses))
+
+    async def close(self) -> None:
+        self.closed = True
+        tasks = [*self._tasks, *(t for st in self.stations.values()
+                                 for t in st._exports.values())]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for st in self.stations.values():
+            if st.client is not None:
+                await st.client.close()
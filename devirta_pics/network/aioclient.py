@@ -0,0 +1,162 @@
+import asyncio
+import itertools
+import logging
+from typing import AsyncIterator, Callable, Dict, Optional, Union
+
+from devirta_pics.config import NET_RECV_SIZE, NET_TIMEOUT
+from devirta_pics.network.codec import DEFAULT_CODEC, get_codec
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncNetClient:
+    """
+    Клиент TCP API на asyncio без Qt. Каждому запросу присваивается id, по
+    которому ответ сопоставляется с запросом, поэтому запросы можно
+    отправлять, не дожидаясь ответов на предыдущие. Сообщения без ожидающего
+    их запроса (телеметрия, результаты режимов, отключение сервера)
+    передаются в `on_message`.
+    """
+
+    def __init__(self, host: str, port: int,
+                 on_message: Optional[Callable[[dict], None]] = None):
+        self.host, self.port = host, port
+        self.on_message = on_message
+        self.codec = DEFAULT_CODEC
+
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._decoder = self.codec.decoder()
+        self._ids = itertools.count(1)
+        # Ожидающие ответа запросы: future для одного ответа или очередь
+        # для команд с несколькими ответами (export)
+        self._pending: Dict[int, Union[asyncio.Future, asyncio.Queue]] = {}
+        self._read_task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing() \
+            and (self._read_task is None or not self._read_task.done())
+
+    async def wait_closed(self) -> None:
+        """
+        Ожидает, пока сервер не закроет соединение.
+        """
+        if self._read_task is not None:
+            await asyncio.shield(self._read_task)
+
+    async def connect(self, token: str, encoding: Optional[str] = None,
+                      timeout=NET_TIMEOUT) -> dict:
+        """
+        Подключается и проходит авторизацию.
+        :return: Ответ сервера на авторизацию.
+        """
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout)
+        auth = {'type': 'auth', 'token': token, 'id': next(self._ids)}
+        if encoding:
+            auth['encoding'] = encoding
+        self._write(auth)
+
+        response = await asyncio.wait_for(self._read_message(), timeout)
+        if response.get('code') != 200:
+            await self.close()
+            return response
+        # Дальше сообщения передаются в согласованной кодировке
+        if response.get('encoding'):
+            self.codec = get_codec(response['encoding'])
+            self._decoder = self.codec.decoder()
+        self._read_task = asyncio.ensure_future(self._read_loop())
+        return response
+
+    def _write(self, data: dict) -> None:
+        self.writer.write(self.codec.encode(data))
+
+    async def _read_message(self) -> dict:
+        while True:
+            if not (data := await self.reader.read(NET_RECV_SIZE)):
+                return {}
+            if messages := self._decoder.feed(data):
+                return messages[0] or {}
+
+    async def _read_loop(self):
+        try:
+            while data := await self.reader.read(NET_RECV_SIZE):
+                for message in self._decoder.feed(data):
+                    if message is not None:
+                        self._dispatch(message)
+        except ConnectionError:
+            pass
+        finally:
+            # Сервер закрыл соединение, ответов на запросы уже не будет
+            for waiter in self._pending.values():
+                if isinstance(waiter, asyncio.Queue):
+                    waiter.put_nowait(None)
+                elif not waiter.done():
+                    waiter.set_exception(
+                        ConnectionError('Connection closed by server.'))
+            self._pending.clear()
+
+    def _dispatch(self, message: dict) -> None:
+        waiter = self._pending.get(message.get('id'))
+        if isinstance(waiter, asyncio.Queue):
+            waiter.put_nowait(message)
+        elif waiter is not None and not waiter.done():
+            del self._pending[message['id']]
+            waiter.set_result(message)
+        elif self.on_message is not None:
+            self.on_message(message)
+
+    async def request(self, data: dict, timeout=NET_TIMEOUT) -> dict:
+        """
+        Отправляет команду и ожидает первый ответ на нее.
+        """
+        if not self.connected:
+            raise ConnectionError('Not connected.')
+        req_id = next(self._ids)
+        future = self._pending[req_id] = \
+            asyncio.get_event_loop().create_future()
+        self._write({**data, 'id': req_id})
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(req_id, None)
+
+    async def stream(self, data: dict, done: Callable[[dict], bool],
+                     timeout=NET_TIMEOUT) -> AsyncIterator[dict]:
+        """
+        Отправляет команду и возвращает ответы на нее, пока `done` не
+        вернет True для очередного ответа.
+        """
+        if not self.connected:
+            raise ConnectionError('Not connected.')
+        req_id = next(self._ids)
+        queue = self._pending[req_id] = asyncio.Queue()
+        self._write({**data, 'id': req_id})
+        try:
+            while True:
+                message = await asyncio.wait_for(queue.get(), timeout)
+                if message is None:
+                    raise ConnectionError('Connection closed by server.')
+                yield message
+                if done(message):
+                    return
+        finally:
+            self._pending.pop(req_id, None)
+
+    async def close(self) -> None:
+        if self.writer is None:
+            return
+        if self.connected:
+            try:
+                self._write({'type': 'close', 'id': next(self._ids)})
+                await self.writer.drain()
+            except ConnectionError:
+                pass
+        if not self.writer.is_closing():
+            self.writer.close()
+        if self._read_task is not None:
+            try:
+                await asyncio.wait_for(self._read_task, NET_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
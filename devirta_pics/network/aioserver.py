@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+import logging
+import threading
+from collections import deque
+from typing import Optional, Set, Union
+
+from devirta_pics.config import NET_RECV_SIZE
+from devirta_pics.network.codec import DEFAULT_CODEC, get_codec
+from devirta_pics.network.server import CommandServer
+from devirta_pics.network.telemetry import (TELEMETRY, Subscription,
+                                            telemetry_response)
+
+logger = logging.getLogger(__name__)
+
+# Время ожидания отправки прощальных сообщений при остановке сервера
+SHUTDOWN_TIMEOUT = 2.0
+# Если клиент не успевает забирать данные и в буфере отправки накопилось
+# больше этого объема, то телеметрия ему не отправляется, пока буфер не
+# освободится. Сэмплы при этом копятся в ограниченной очереди подписки.
+TELEMETRY_WRITE_LIMIT = 64 * 1024
+
+
+class ClientSession:
+    """
+    Состояние одного подключенного клиента.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.id = next(self._ids)
+        self.reader, self.writer = reader, writer
+        self.addr = writer.get_extra_info('peername')
+        self.authorized = False
+
+        self.subscription: Optional[Subscription] = None
+        self._push_task: Optional[asyncio.Task] = None
+
+        self.codec = DEFAULT_CODEC
+        self._decoder = self.codec.decoder()
+        self._inbox = deque()
+
+    def set_codec(self, codec) -> None:
+        self.codec, self._decoder = codec, codec.decoder()
+
+    async def read(self) -> Union[dict, None]:
+        """
+        :return: Следующее сообщение клиента, None - если сообщение не
+                 удалось разобрать, пустой словарь - если клиент отключился.
+        """
+        while not self._inbox:
+            if not (data := await self.reader.read(NET_RECV_SIZE)):
+                return {}
+            logger.debug(f'NET: New data received from {self.addr}: {data}')
+            self._inbox.extend(self._decoder.feed(data))
+        return self._inbox.popleft()
+
+    def send(self, data: dict) -> None:
+        if self.writer.is_closing():
+            return
+        logger.debug(f'NET: New data sent to {self.addr}: {data}')
+        self.writer.write(self.codec.encode(data))
+
+    def subscribe(self, rate=None, streams=None) -> Subscription:
+        self.unsubscribe()
+        self.subscription = TELEMETRY.subscribe(rate, streams)
+        self._push_task = asyncio.ensure_future(self._push())
+        return self.subscription
+
+    def unsubscribe(self) -> bool:
+        if self.subscription is None:
+            return False
+        TELEMETRY.unsubscribe(self.subscription)
+        self._push_task.cancel()
+        self.subscription = self._push_task = None
+        return True
+
+    async def _push(self):
+        sub = self.subscription
+        while not self.writer.is_closing():
+            await asyncio.sleep(sub.period)
+            # Медленному клиенту не добавляем данные в буфер отправки
+            if self.writer.transport.get_write_buffer_size() > \
+                    TELEMETRY_WRITE_LIMIT:
+                continue
+            if response := telemetry_response(sub):
+                self.send(response)
+
+    def close(self) -> None:
+        self.unsubscribe()
+        if not self.writer.is_closing():
+            self.writer.close()
+
+
+class AsyncNetServer(CommandServer):
+    """
+    Сервер на asyncio, обслуживающий одновременно множество клиентов с тем же
+    протоколом авторизации и команд, что и NetServer. Цикл событий работает в
+    отдельном потоке, команды передаются менеджеру Qt через его сигналы.
+    """
+
+    def __init__(self, manager, *args, **kwargs):
+        self.sessions: Set[ClientSession] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        super().__init__(manager, *args, **kwargs)
+
+    def _run(self):
+        self.listening.wait()
+        if self._closed:
+            return
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        except OSError as e:
+            logger.error(e)
+        finally:
+            self._loop.close()
+            self._closed = True
+
+    async def _serve(self):
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle_client,
+                                            sock=self.socket)
+        await self._stop.wait()
+
+        # Сообщаем клиентам об отключении сервера
+        for session in list(self.sessions):
+            session.send({'code': 521, 'msg': 'Server is Down'})
+            session.close()
+        server.close()
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=SHUTDOWN_TIMEOUT)
+        await server.wait_closed()
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter):
+        session = ClientSession(reader, writer)
+        self._tasks.add(task := asyncio.current_task())
+        logger.info(f'NET: Connected by {session.addr}')
+        try:
+            # Аунтифицируем клиента
+            response = self.check_auth_data(data := await session.read())
+            session.send(self.reply(response, data))
+            if response.get('encoding'):
+                session.set_codec(get_codec(response['encoding']))
+            if response['code'] == 200:
+                session.authorized = True
+                self.sessions.add(session)
+                data = await self._serve_session(session)
+            if not self._closed:
+                session.send(self.reply(
+                    {'code': 200, 'msg': 'Disconnected successfully.'}, data))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._tasks.discard(task)
+            self.sessions.discard(session)
+            session.close()
+            logger.info(f'NET: Disconnected by {session.addr}')
+
+    async def _serve_session(self, session: ClientSession) -> Optional[dict]:
+        """
+        :return: Команда close, если клиент отключился по ней.
+        """
+        while not self._closed:
+            if (data := await session.read()) is None:
+                continue
+            # Если данные - это пустой словарь, то передача закончилась
+            elif not data:
+                break
+            # Валидируем команды от клиента
+            if (err := self.check_comm_data(data)) is not None:
+                session.send(self.reply(err, data))
+            elif data['type'] == 'close':
+                return data
+            elif handler := self.handlers.get(data['type']):
+                await handler(data, session)
+            elif (err := self.command_response(data, session)) is not None:
+                session.send(err)
+            await session.writer.drain()
+        return None
+
+    def command_handlers(self) -> dict:
+        return {
+            'status': self._status,
+            'stats': self._stats,
+            'subscribe': self._subscribe,
+            'unsubscribe': self._unsubscribe,
+            'export': self._export,
+        }
+
+    async def _status(self, data: dict, session: ClientSession):
+        session.send(self.reply(self.status_response(), data))
+
+    async def _stats(self, data: dict, session: ClientSession):
+        session.send(self.reply(self.stats_response(data), data))
+
+    async def _subscribe(self, data: dict, session: ClientSession):
+        sub = session.subscribe(data.get('rate'), data.get('streams'))
+        session.send(self.reply(self.subscribe_response(sub), data))
+
+    async def _unsubscribe(self, data: dict, session: ClientSession):
+        session.send(self.reply(
+            self.unsubscribe_response(session.unsubscribe()), data))
+
+    async def _export(self, data: dict, session: ClientSession):
+        # Отправляем части по мере освобождения буфера, не мешая остальным
+        # клиентам
+        for response in self.export_responses(data):
+            if self._closed or session.writer.is_closing():
+                break
+            session.send(response)
+            await session.writer.drain()
+
+    def _send(self, data: dict, session: Optional[ClientSession]) -> None:
+        # Ответ получает клиент, отправивший команду, а если он уже
+        # отключился, то все подключенные клиенты
+        if session in self.sessions:
+            session.send(data)
+        else:
+            for session in self.sessions:
+                session.send(data)
+
+    def send_data(self, data: dict,
+                  session: Optional[ClientSession] = None) -> None:
+        # Может вызываться из потока Qt, поэтому передаем в цикл событий
+        if self._loop is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._send, data, session)
+            except RuntimeError:
+                pass
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._loop is not None and self._stop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stop.set)
+            except RuntimeError:
+                pass
+            # Даем время отправить клиентам сообщение об отключении
+            if self._thread is not None and \
+                    self._thread is not threading.current_thread():
+                self._thread.join(SHUTDOWN_TIMEOUT)
+        else:
+            self.socket.close()
+        self._close_thread()
+
+    def have_conn(self) -> bool:
+        return bool(self.sessions)
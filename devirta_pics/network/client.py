@@ -1,7 +1,9 @@
 import json
 import socket
-from typing import Union
+from typing import Optional, Union
 
+from devirta_pics.config import NET_TIMEOUT
+from devirta_pics.network.codec import get_codec
 from devirta_pics.network.network import Network
 
 
@@ -11,7 +13,7 @@ class NetClient(Network):
         self.req = req  # Информация при подключении к серверу
         self.addr = addr.split(':')
         super().__init__(name=self.__class__.__name__)
-        self.socket.settimeout(2.0)  # Таймаут проверки, что сокет еще открыт
+        self.socket.settimeout(NET_TIMEOUT)  # Таймаут подключения и отправки
 
     def _run(self):
         try:
@@ -22,22 +24,30 @@ class NetClient(Network):
         # Отправляем данные для регистрации
         self.send_data(json.loads(self.req if self.req else '{}'))
         # Если не прошли регистрацию, то закрываем соединение.
-        if data := self.read_data():
+        if data := self.read_data(NET_TIMEOUT):
             self.manager.receivedDataSignal.emit(data)
             if data.get('code') != 200:
                 self.close()
+            # Сервер подтвердил кодировку, согласованную при авторизации
+            elif data.get('encoding'):
+                self.set_codec(self.socket, get_codec(data['encoding']))
 
         # Основной цикл для отправки команд
         while not self._closed and self.have_conn():
-            if data := self.read_data():
-                self.manager.receivedDataSignal.emit(data)
-                if data.get('code') == '521':
-                    break
+            if (data := self.read_data()) is None:
+                continue
+            # Сервер закрыл соединение
+            elif not data:
+                break
+            self.manager.receivedDataSignal.emit(data)
+            if data.get('code') == 521:
+                break
         if self.alive():
             self.close()
 
-    def read_data(self, *args) -> Union[dict, None]:
-        return super().read_data(self.socket)
+    def read_data(self, timeout: Optional[float] = None,
+                  *args) -> Union[dict, None]:
+        return super().read_data(self.socket, timeout)
 
     def send_data(self, data: dict, *args) -> None:
         super().send_data(self.socket, data)
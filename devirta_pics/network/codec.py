@@ -0,0 +1,99 @@
+"""
+Кодировки сообщений TCP API. По умолчанию используется JSON, компактная
+бинарная кодировка msgpack согласуется при авторизации (поле `encoding`)
+и доступна, если установлен пакет msgpack.
+"""
+import struct
+from typing import Dict, List, Optional
+
+from devirta_pics.config import NET_MAX_MESSAGE_SIZE
+from devirta_pics.network.framing import JsonStreamDecoder, encode_message
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Заголовок бинарного сообщения: длина тела (4 байта, big-endian)
+_HEADER = struct.Struct('>I')
+
+
+class JsonCodec:
+    name = 'json'
+
+    @staticmethod
+    def encode(data: dict) -> bytes:
+        return encode_message(data)
+
+    @staticmethod
+    def decoder() -> JsonStreamDecoder:
+        return JsonStreamDecoder()
+
+
+class LengthPrefixedDecoder:
+    """
+    Инкрементальный декодер сообщений с префиксом длины.
+    """
+
+    def __init__(self, loads, max_size=NET_MAX_MESSAGE_SIZE):
+        self.loads = loads
+        self.max_size = max_size
+        self._buf = bytearray()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def feed(self, data: bytes) -> List[Optional[dict]]:
+        self._buf += data
+        messages = []
+        while len(self._buf) >= _HEADER.size:
+            size, = _HEADER.unpack_from(self._buf)
+            if size > self.max_size:
+                # Поток рассинхронизирован, дальнейшие данные не разобрать
+                self._buf.clear()
+                messages.append(None)
+                break
+            if len(self._buf) < _HEADER.size + size:
+                break
+            raw = bytes(self._buf[_HEADER.size:_HEADER.size + size])
+            del self._buf[:_HEADER.size + size]
+            try:
+                messages.append(self.loads(raw))
+            except (ValueError, TypeError):
+                messages.append(None)
+        return messages
+
+
+class MsgpackCodec:
+    name = 'msgpack'
+
+    @staticmethod
+    def encode(data: dict) -> bytes:
+        payload = msgpack.packb(data, use_bin_type=True)
+        return _HEADER.pack(len(payload)) + payload
+
+    @staticmethod
+    def _loads(raw: bytes):
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+    @classmethod
+    def decoder(cls) -> LengthPrefixedDecoder:
+        return LengthPrefixedDecoder(cls._loads)
+
+
+# Кодировки, которые клиент может запросить
+ENCODINGS = ('json', 'msgpack')
+
+CODECS: Dict[str, type] = {'json': JsonCodec}
+if msgpack is not None:
+    CODECS['msgpack'] = MsgpackCodec
+
+DEFAULT_CODEC = JsonCodec
+
+
+def get_codec(name: Optional[str]) -> type:
+    """
+    Возвращает кодировку по имени. Если она недоступна, то JSON.
+    """
+    return CODECS.get(name, DEFAULT_CODEC)
@@ -0,0 +1,121 @@
+import json
+import re
+from typing import List, Optional
+
+from devirta_pics.config import NET_MAX_MESSAGE_SIZE
+
+# Символы, меняющие вложенность вне строк и состояние внутри строк
+_TOKENS = re.compile(rb'[{}\[\]"]')
+_STR_TOKENS = re.compile(rb'["\\]')
+_NOT_SPACE = re.compile(rb'\S')
+_RESYNC = re.compile(rb'[\n{\[]')
+
+
+def encode_message(data: dict) -> bytes:
+    """
+    Кодирует сообщение. Сообщения разделяются переводом строки.
+    """
+    return json.dumps(data).encode() + b'\n'
+
+
+class JsonStreamDecoder:
+    """
+    Инкрементальный декодер потока JSON сообщений.
+
+    Данные могут приходить частями или несколькими сообщениями за одно
+    чтение. Границы сообщений определяются по балансу скобок, поэтому
+    поддерживаются как сообщения, разделенные переводом строки, так и
+    сообщения без разделителя от старых клиентов.
+    """
+
+    def __init__(self, max_size=NET_MAX_MESSAGE_SIZE):
+        self.max_size = max_size
+        self._buf = bytearray()
+        self._reset_scan()
+
+    def _reset_scan(self):
+        self._pos = 0  # Позиция, до которой буфер уже просмотрен
+        self._depth = 0
+        self._in_str = False
+
+    @property
+    def pending(self) -> int:
+        # Количество байт незавершенного сообщения
+        return len(self._buf)
+
+    def feed(self, data: bytes) -> List[Optional[dict]]:
+        """
+        Добавляет данные в буфер.
+        :return: Список полностью полученных сообщений. Сообщения, которые
+                 не удалось разобрать, возвращаются как None.
+        """
+        self._buf += data
+        messages = []
+        while True:
+            if self._pos == 0:
+                # Пропускаем пробелы и разделители между сообщениями
+                if not (m := _NOT_SPACE.search(self._buf)):
+                    self._buf.clear()
+                    break
+                del self._buf[:m.start()]
+
+                # Сообщение должно начинаться с объекта или массива. Иначе
+                # отбрасываем данные до следующей строки или скобки.
+                if self._buf[0] not in b'{[':
+                    m = _RESYNC.search(self._buf, 1)
+                    del self._buf[:m.start() if m else len(self._buf)]
+                    messages.append(None)
+                    continue
+
+            if (end := self._scan()) < 0:
+                if len(self._buf) > self.max_size:
+                    self._buf.clear()
+                    self._reset_scan()
+                    messages.append(None)
+                break
+
+            raw = bytes(self._buf[:end])
+            del self._buf[:end]
+            try:
+                messages.append(json.loads(raw))
+            except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+                messages.append(None)
+        return messages
+
+    def _scan(self) -> int:
+        """
+        Продолжает просмотр буфера с последней позиции.
+        :return: Индекс конца первого полного сообщения или -1.
+        """
+        buf, pos = self._buf, self._pos
+        while True:
+            if self._in_str:
+                if not (m := _STR_TOKENS.search(buf, pos)):
+                    pos = len(buf)
+                    break
+                if m.group() == b'\\':
+                    # Экранированный символ пропускаем. Если он еще не
+                    # получен, то вернемся к этому месту позже.
+                    if m.end() >= len(buf):
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                    continue
+                self._in_str, pos = False, m.end()
+                continue
+
+            if not (m := _TOKENS.search(buf, pos)):
+                pos = len(buf)
+                break
+            token, pos = m.group(), m.end()
+            if token == b'"':
+                self._in_str = True
+            elif token in (b'{', b'['):
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth <= 0:
+                    self._reset_scan()
+                    return pos
+        self._pos = pos
+        return -1
@@ -1,9 +1,14 @@
-import json
 import logging
+import selectors
 import socket
 import threading
+import weakref
 from abc import ABC
-from typing import Union
+from collections import deque
+from typing import Optional, Union
+
+from devirta_pics.config import NET_RECV_SIZE
+from devirta_pics.network.codec import DEFAULT_CODEC
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +18,17 @@ class Network(ABC):
         self.name = name
         self._closed = False
         self._thread = None
+        # Кодировка, декодер и очередь уже полученных сообщений для каждого
+        # сокета
+        self._streams = weakref.WeakKeyDictionary()
+
+        # Поток сети ожидает данные через селектор. Чтобы разбудить его
+        # (например, при закрытии), пишем байт в пару сокетов.
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
 
         # Подготавливает сокет с TCP ipv4 соединения
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -21,29 +37,101 @@ class Network(ABC):
     def _open_thread(self):
         logger.info(f'{self.name} STARTED')
         if self._thread is None or not self._thread.is_alive():
-            self._thread = threading.Thread(target=self._run, name=self.name)
+            self._thread = threading.Thread(target=self._main, name=self.name)
             self._thread.start()
 
     def _close_thread(self):
         self._closed = True
         self._thread = None  # При отключении потока убираем ссылку на его
+        self.wakeup()
         logger.info(f'{self.name} STOPPED')
 
+    def _main(self):
+        try:
+            self._run()
+        finally:
+            self._selector.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
     def _run(self):
         pass
 
-    def read_data(self, sock: socket.socket) -> Union[dict, None]:
+    def wakeup(self) -> None:
+        """
+        Прерывает ожидание данных в потоке сети. Можно вызывать из любого
+        потока.
+        """
+        try:
+            self._wakeup_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            # Буфер уже заполнен (поток и так проснется) или поток завершен
+            pass
+
+    def _wait(self, sock: socket.socket,
+              timeout: Optional[float] = None) -> bool:
+        """
+        Ожидает, пока на сокете появятся данные.
+        :return: True - если их можно читать, False - если истек таймаут или
+                 поток разбудили.
+        """
+        if self._closed or sock.fileno() == -1:
+            return False
+        self._selector.register(sock, selectors.EVENT_READ)
+        try:
+            events = self._selector.select(timeout)
+        finally:
+            self._selector.unregister(sock)
+
+        ready = False
+        for key, _ in events:
+            if key.fileobj is self._wakeup_r:
+                try:
+                    while self._wakeup_r.recv(4096):
+                        pass
+                except (BlockingIOError, OSError):
+                    pass
+                return False
+            ready = True
+        return ready
+
+    def _stream(self, sock: socket.socket) -> list:
+        if (stream := self._streams.get(sock)) is None:
+            stream = self._streams[sock] = [DEFAULT_CODEC,
+                                            DEFAULT_CODEC.decoder(), deque()]
+        return stream
+
+    def set_codec(self, sock: socket.socket, codec) -> None:
+        """
+        Переключает кодировку соединения (после согласования при авторизации).
+        """
+        stream = self._stream(sock)
+        stream[0], stream[1] = codec, codec.decoder()
+
+    def read_data(self, sock: socket.socket,
+                  timeout: Optional[float] = None) -> Union[dict, None]:
+        """
+        Ожидает следующее сообщение.
+        :param timeout: Сколько ждать данные, None - пока поток не разбудят.
+        :return: Сообщение, None - если его не удалось получить или
+                 разобрать, пустой словарь - если соединение закрыто.
+        """
         if self.have_conn():
+            _, decoder, inbox = self._stream(sock)
+            # Сообщения, пришедшие вместе с предыдущим, отдаем без чтения
+            if inbox:
+                return inbox.popleft()
             try:
-                # Читаем инфу из буфера
-                if data := sock.recv(1024):
+                # Читаем из буфера, пока не получим сообщение целиком
+                while self._wait(sock, timeout):
+                    # Если буфер пустой, то возвращаем пустой словарь
+                    if not (data := sock.recv(NET_RECV_SIZE)):
+                        return {}
                     logger.debug(f'NET: New data received: {data}')
-                    try:
-                        return json.loads(data)
-                    except (json.decoder.JSONDecodeError, UnicodeDecodeError):
-                        return None
-                # Если буфер пустой, то возвращаем пустой словарь
-                return {}
+                    if messages := decoder.feed(data):
+                        inbox.extend(messages[1:])
+                        return messages[0]
+                return None
             except (ConnectionAbortedError, ConnectionResetError):
                 # При обрыве соединения, закрываем сокет
                 sock.close()
@@ -54,9 +142,10 @@ class Network(ABC):
     def send_data(self, sock: socket.socket, data: dict):
         if self.have_conn():
             logger.debug(f'NET: New data sent: {data}')
-            sock.sendall(json.dumps(data).encode())
+            sock.sendall(self._stream(sock)[0].encode(data))
 
     def close(self):
+        # Поток сети просыпается и сразу завершает работу
         self._close_thread()
         if self.socket is not None:
             self.socket.close()
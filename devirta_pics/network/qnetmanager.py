@@ -1,7 +1,15 @@
+import sys
+import time
+from collections import deque
+from typing import Optional, Tuple
+
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from devirta_pics.config import NET_COMMAND_QUEUE, NET_SERVER
+from devirta_pics.network.aioserver import AsyncNetServer
 from devirta_pics.network.client import NetClient
 from devirta_pics.network.server import NetServer
+from devirta_pics.network.telemetry import TELEMETRY
 
 
 class QNetManagerBase(QObject):
@@ -26,12 +34,28 @@ class QNetManagerBase(QObject):
 
 
 class QNetServerManager(QNetManagerBase):
+    """
+    Команды клиентов выполняются по очереди в потоке Qt. Ответы на команду
+    получают ее id и отправляются клиенту, который ее прислал. Результаты
+    режима (201/204) отправляются с id команды, запустившей режим, а если
+    режим прерван командой stop, то с id команды stop.
+    """
     runCommSignal = pyqtSignal(dict)
+    _commQueued = pyqtSignal()
 
     def __init__(self, use_static=False):
-        super().__init__(NetServer(self, use_static=use_static))
+        super().__init__(NET_SERVER(self, use_static=use_static))
         self.ready = False
 
+        # Очередь команд: (команда, клиент)
+        self.commands = deque()
+        # Контекст ответов: (команда, клиент) выполняемой команды и команды,
+        # запустившей текущий режим
+        self._cmd_ctx: Optional[Tuple[dict, object]] = None
+        self._mode_ctx: Optional[Tuple[dict, object]] = None
+        self._mode_started = None
+        self._commQueued.connect(self._run_queued)
+
     @property
     def addr(self):
         return ':'.join(map(str, self.net.addr))
@@ -40,13 +64,62 @@ class QNetServerManager(QNetManagerBase):
     def auth_token(self):
         return self.net.auth_token
 
-    def run_comm(self, data: dict):
-        self.runCommSignal.emit(data)
+    def run_comm(self, data: dict, client=None) -> bool:
+        """
+        Ставит команду в очередь. Вызывается из потока сервера.
+        :return: False, если очередь переполнена.
+        """
+        if len(self.commands) >= NET_COMMAND_QUEUE:
+            return False
+        self.commands.append((data, client))
+        self._commQueued.emit()
+        return True
+
+    def _run_queued(self):
+        if not self.commands:
+            return
+        self._cmd_ctx = self.commands.popleft()
+        data = self._cmd_ctx[0]
+        try:
+            self.runCommSignal.emit(data)
+        finally:
+            self._cmd_ctx = None
+
+    def status(self) -> dict:
+        """
+        Состояние приложения для команды status. Вызывается из потока
+        сервера, поэтому только читает поля менеджера.
+        """
+        # Поля могут смениться в потоке Qt, поэтому читаем каждое один раз
+        mode_ctx, started = self._mode_ctx, self._mode_started
+        mode = mode_ctx[0].get('mode') if mode_ctx else None
+        elapsed = None
+        if started is not None:
+            elapsed = round(time.perf_counter() - started, 3)
+        return {'ready': self.ready, 'mode': mode, 'elapsed': elapsed,
+                'queued': len(self.commands),
+                'respiration': TELEMETRY.last['respiration']}
 
     def send_data(self, code, msg, **kwargs):
-        super().send_data(data={'code': code, 'msg': msg, **kwargs})
+        data = {'code': code, 'msg': msg, **kwargs}
+        request, client = self._cmd_ctx or self._mode_ctx or (None, None)
+        self.net.send_data(self.net.reply(data, request), client)
+
+        # Отслеживаем режим, чтобы знать, кому отправлять его результаты
+        if self._cmd_ctx is not None and code == 200 and \
+                self._cmd_ctx[0].get('type') == 'mode':
+            self._mode_ctx = self._cmd_ctx
+            self._mode_started = time.perf_counter()
+        elif code in (201, 204):
+            self._mode_ctx = self._mode_started = None
 
 
 class QNetClientManager(QNetManagerBase):
     def __init__(self, addr, req):
         super().__init__(NetClient(self, addr, req))
+
+
+try:
+    NET_SERVER = globals()[NET_SERVER]
+except KeyError:
+    sys.exit('Invalid type of network server. Check config.py.')
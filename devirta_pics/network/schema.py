@@ -1,13 +1,26 @@
-from typing import Optional
+from typing import List, Optional, Union
 
-from pydantic import BaseModel, Field, PositiveInt, root_validator, validator
+from pydantic import (BaseModel, Field, NonNegativeInt, PositiveFloat,
+                      PositiveInt, StrictBool, StrictInt, StrictStr,
+                      root_validator, validator)
 
-AVAILABLE_TYPES = ['auth', 'mode', 'close', 'stop']
+from devirta_pics.config import EXPORT_MAX_CHUNK, TELEMETRY_MAX_RATE
+from devirta_pics.network.codec import ENCODINGS
+from devirta_pics.network.telemetry import STREAMS
+from devirta_pics.sessions import EXPORT_STREAMS
+
+AVAILABLE_TYPES = ['auth', 'mode', 'close', 'stop', 'stats', 'subscribe',
+                   'unsubscribe', 'status', 'export']
 AVAILABLE_MODES = ['test', 'rehab']
+# Команды, которые не запускают режимы
+NO_MODE_TYPES = ['stop', 'close', 'stats', 'subscribe', 'unsubscribe',
+                 'status', 'export']
 
 
 class BaseReq(BaseModel):
     type: str
+    # Идентификатор запроса, возвращается в ответах на него
+    id: Optional[Union[StrictInt, StrictStr]]
 
     @validator('type')
     def available_type(cls, v):
@@ -19,16 +32,61 @@ class BaseReq(BaseModel):
 class AuthReq(BaseReq):
     type: str
     token: str
+    encoding: Optional[str]
+
+    @validator('encoding')
+    def available_encoding(cls, v):
+        if v is not None and v not in ENCODINGS:
+            raise ValueError(f'Available encodings: {", ".join(ENCODINGS)}.')
+        return v
 
 
 class CommandsReq(BaseReq):
     type: str
     mode: Optional[str]
     time: Optional[PositiveInt]
+    patient: Optional[StrictStr]  # Пациент, для базы данных сессий
+    # Пациенты остальных людей в кадре слева направо
+    patients: Optional[List[StrictStr]]
+    rate: Optional[PositiveFloat]
+    streams: Optional[List[str]]
+    # Выгрузка данных сессии
+    session: Optional[StrictStr]
+    stream: Optional[str]
+    offset: Optional[NonNegativeInt]
+    limit: Optional[PositiveInt]
+    # Переключение замеров этапов и профилировщика (stats)
+    stages: Optional[StrictBool]
+    profile: Optional[StrictBool]
+
+    @validator('rate')
+    def available_rate(cls, v):
+        if v is not None and v > TELEMETRY_MAX_RATE:
+            raise ValueError(f'Max rate is {TELEMETRY_MAX_RATE}.')
+        return v
+
+    @validator('streams')
+    def available_streams(cls, v):
+        if v is not None and (not v or any(s not in STREAMS for s in v)):
+            raise ValueError(f'Available streams: {", ".join(STREAMS)}.')
+        return v
+
+    @validator('stream')
+    def available_export_stream(cls, v):
+        if v is not None and v not in EXPORT_STREAMS:
+            raise ValueError(
+                f'Available streams: {", ".join(EXPORT_STREAMS)}.')
+        return v
+
+    @validator('limit')
+    def available_limit(cls, v):
+        if v is not None and v > EXPORT_MAX_CHUNK:
+            raise ValueError(f'Max limit is {EXPORT_MAX_CHUNK}.')
+        return v
 
     @root_validator
     def available_mode(cls, values):
-        if values.get('type') in ['stop', 'close']:
+        if values.get('type') in NO_MODE_TYPES:
             return values
         mode, time = values.get('mode'), values.get('time')
         if mode not in AVAILABLE_MODES:
@@ -39,3 +97,101 @@ class CommandsReq(BaseReq):
             if not isinstance(time, int):
                 raise ValueError('Invalid time.')
         return values
+
+
+# --- Быстрая проверка ---
+# Частые корректные сообщения проверяются по таблице полей без создания
+# моделей pydantic. Проверки строже моделей (например, без приведения
+# типов), поэтому все, что они пропускают, принимают и модели. Остальные
+# сообщения проверяются моделями, и ответы с ошибками не меняются.
+
+def _is_str(v) -> bool:
+    return type(v) is str
+
+
+def _is_id(v) -> bool:
+    return type(v) is int or type(v) is str
+
+
+def _is_bool(v) -> bool:
+    return type(v) is bool
+
+
+def _is_positive_int(v) -> bool:
+    return type(v) is int and v > 0
+
+
+def _one_of(values):
+    values = frozenset(values)
+    return lambda v: type(v) is str and v in values
+
+
+def _is_rate(v) -> bool:
+    return (type(v) is int or type(v) is float) and \
+        0 < v <= TELEMETRY_MAX_RATE
+
+
+def _is_streams(v) -> bool:
+    return type(v) is list and len(v) > 0 and \
+        all(type(s) is str and s in STREAMS for s in v)
+
+
+# (поле, обязательное, проверка значения)
+_AUTH_FIELDS = (
+    ('type', True, _one_of(AVAILABLE_TYPES)),
+    ('token', True, _is_str),
+    ('id', False, _is_id),
+    ('encoding', False, _one_of(ENCODINGS)),
+)
+_COMMAND_FIELDS = (
+    ('type', True, _one_of(AVAILABLE_TYPES)),
+    ('id', False, _is_id),
+    ('mode', False, _is_str),
+    ('time', False, _is_positive_int),
+    ('patient', False, _is_str),
+    ('patients', False, lambda v: type(v) is list and all(map(_is_str, v))),
+    ('rate', False, _is_rate),
+    ('streams', False, _is_streams),
+    ('session', False, _is_str),
+    ('stream', False, _one_of(EXPORT_STREAMS)),
+    ('offset', False, lambda v: type(v) is int and v >= 0),
+    ('limit', False, lambda v: _is_positive_int(v) and v <= EXPORT_MAX_CHUNK),
+    ('stages', False, _is_bool),
+    ('profile', False, _is_bool),
+)
+_NO_MODE_TYPES = frozenset(NO_MODE_TYPES)
+
+
+def _check_fields(fields, data) -> bool:
+    if type(data) is not dict:
+        return False
+    for name, required, check in fields:
+        if (v := data.get(name)) is None:
+            if required:
+                return False
+        elif not check(v):
+            return False
+    return True
+
+
+def fast_valid_auth(data) -> bool:
+    """
+    True, если запрос авторизации точно корректен. False - если его нужно
+    проверить моделью AuthReq.
+    """
+    return _check_fields(_AUTH_FIELDS, data)
+
+
+def fast_valid_command(data) -> bool:
+    """
+    True, если команда точно корректна. False - если ее нужно проверить
+    моделью CommandsReq.
+    """
+    if not _check_fields(_COMMAND_FIELDS, data):
+        return False
+    if data['type'] in _NO_MODE_TYPES:
+        return True
+    # Повторяет проверку available_mode
+    if (mode := data.get('mode')) not in AVAILABLE_MODES:
+        return False
+    return mode != 'test' or data.get('time') is not None
@@ -2,24 +2,43 @@ import logging
 import random
 import socket
 import string
-import time
-from typing import Mapping, Optional, Union
+import threading
+from abc import abstractmethod
+from typing import Iterator, Mapping, Optional, Union
 
 from pydantic import ValidationError
 
-from devirta_pics.config import HOST, PORT, STATIC_AUTH_TOKEN, STATIC_PORT
+from devirta_pics.config import (EXPORT_CHUNK, HOST, NET_TIMEOUT, PORT,
+                                 STATIC_AUTH_TOKEN, STATIC_PORT,
+                                 TELEMETRY_QUEUE)
+from devirta_pics.network.codec import get_codec
 from devirta_pics.network.network import Network
-from devirta_pics.network.schema import AuthReq, CommandsReq
+from devirta_pics.network.schema import (AuthReq, CommandsReq,
+                                         fast_valid_auth, fast_valid_command)
+from devirta_pics.network.telemetry import (TELEMETRY, Subscription,
+                                            telemetry_response)
+from devirta_pics.sessions import SERIES_COLUMNS, SessionStore
+from devirta_pics.utils.metrics import METRICS
 
 logger = logging.getLogger(__name__)
 
 
-class NetServer(Network):
+class CommandServer(Network):
+    """
+    Общая часть серверов: авторизация, проверка команд и ответы на команды,
+    которые сервер выполняет сам. Чтение и отправка сообщений - в
+    наследниках: NetServer работает с одним сокетом в своем потоке,
+    AsyncNetServer - с сессиями клиентов в цикле событий asyncio.
+    """
+
     def __init__(self, manager, host=HOST, port=PORT, use_static=False):
         self.manager = manager
 
-        self.conn: Optional[socket.socket] = None
-        self.s_data = self.received_data = None
+        # Устанавливается, когда сокет начал (или не смог) слушать порт
+        self.listening = threading.Event()
+        # Команды, которые выполняет сам сервер: {тип: обработчик}.
+        # Остальные ставятся в очередь менеджера.
+        self.handlers = self.command_handlers()
 
         # Используется статичный токен
         if not use_static:
@@ -34,6 +53,8 @@ class NetServer(Network):
         except socket.error as e:
             logger.error(e)
             self.close()
+        finally:
+            self.listening.set()
 
     @property
     def addr(self):
@@ -46,20 +67,168 @@ class NetServer(Network):
         symbols = list(string.ascii_uppercase + string.digits)
         return ''.join(random.sample(symbols, 6))
 
+    @abstractmethod
+    def command_handlers(self) -> dict:
+        pass
+
+    def check_auth_data(self, data: Union[dict, None]) -> dict:
+        """
+        Проверяет запрос авторизации.
+        :return: Ответ, который нужно отправить клиенту.
+        """
+        # Модель проверяет только сообщения, не прошедшие быструю проверку
+        if not fast_valid_auth(data):
+            try:
+                if not isinstance(data, Mapping):
+                    raise ValueError()
+                AuthReq(**(data if data is not None else {}))
+            except (ValidationError, ValueError) as e:
+                err = 'Invalid command.'
+                if isinstance(e, ValidationError):
+                    err = e.json()
+                logger.debug(f'NET: authentication failed: {data} |')
+                return {'code': 400, 'msg': err}
+
+        if data.get('token') != self.auth_token:
+            logger.debug(f'NET: authentication failed: {data} |')
+            return {'code': 404, 'msg': 'Your auth-token not found.'}
+
+        logger.debug(f'NET: authentication was successful: {data} |')
+        response = {'code': 200, 'msg': 'Authorization is successful.'}
+        # Кодировка, которая будет использоваться после авторизации. Если
+        # запрошенная недоступна, то остается JSON.
+        if data.get('encoding'):
+            response['encoding'] = get_codec(data['encoding']).name
+        return response
+
+    def check_comm_data(self, data: dict) -> Optional[dict]:
+        """
+        Проверяет команду клиента.
+        :return: Ответ с ошибкой или None, если команда корректна.
+        """
+        if fast_valid_command(data):
+            return None
+        try:
+            if not isinstance(data, Mapping):
+                raise ValueError()
+            CommandsReq(**(data if data is not None else {}))
+        except (ValidationError, ValueError) as e:
+            err = 'Invalid command.'
+            if isinstance(e, ValidationError):
+                err = e.json()
+            logger.debug(f'NET: Invalid command: {data} |')
+            return {'code': 400, 'msg': err}
+
+        logger.debug(f'NET: command validation was successful: {data} |')
+        return None
+
+    @staticmethod
+    def reply(response: dict, request) -> dict:
+        """
+        Добавляет к ответу id запроса, если клиент его указал.
+        """
+        if isinstance(request, Mapping) and \
+                isinstance(req_id := request.get('id'), (int, str)):
+            return {**response, 'id': req_id}
+        return response
+
+    def command_response(self, data: dict, client=None) -> Optional[dict]:
+        """
+        Ставит команду в очередь менеджера.
+        :return: Ответ с ошибкой или None, если команда принята.
+        """
+        if not self.manager.ready:
+            return self.reply({'code': 425,
+                               'msg': 'The application is not ready yet.'},
+                              data)
+        if not self.manager.run_comm(data, client):
+            return self.reply({'code': 429,
+                               'msg': 'Too many queued commands.'}, data)
+        logger.debug(f'NET: command queued: {data} |')
+        return None
+
+    def status_response(self) -> dict:
+        # Состояние приложения отдается сразу, в том числе до готовности
+        # приложения и при заполненной очереди команд
+        return {'code': 200, 'msg': 'Status.', 'data': self.manager.status()}
+
+    @classmethod
+    def stats_response(cls, data: Optional[dict] = None) -> dict:
+        # Метрики не зависят от готовности приложения. Замеры этапов и
+        # профилировщик переключаются до снятия метрик
+        if data is not None:
+            METRICS.configure(data.get('stages'), data.get('profile'))
+        return {'code': 200, 'msg': 'Statistics.', 'data': METRICS.snapshot()}
+
+    @classmethod
+    def export_responses(cls, data: dict) -> Iterator[dict]:
+        """
+        Ответы на команду export: данные сессии частями, начиная с `offset`.
+        Если выгрузка прервалась, то ее можно продолжить с offset + длина
+        последней полученной части.
+        """
+        if (session := SessionStore().get(data.get('session'))) is None:
+            yield cls.reply({'code': 404, 'msg': 'Session not found.'}, data)
+            return
+        stream = data.get('stream') or 'series'
+        offset = data.get('offset') or 0
+        limit = data.get('limit') or EXPORT_CHUNK
+        total = session.total(stream)
+        while True:
+            rows = session.rows(stream, offset, limit)
+            done = offset + len(rows) >= total
+            chunk = {'session': session.id, 'mode': session.mode,
+                     'stream': stream, 'offset': offset, 'total': total,
+                     'done': done, 'rows': rows}
+            if stream == 'series':
+                chunk['columns'] = SERIES_COLUMNS
+            yield cls.reply({'code': 200, 'msg': 'Export.', 'data': chunk},
+                            data)
+            if done:
+                return
+            offset += len(rows)
+
+    @classmethod
+    def subscribe_response(cls, sub: Subscription) -> dict:
+        return {'code': 200, 'msg': 'Subscribed.',
+                'data': {'rate': sub.rate, 'streams': sorted(sub.streams),
+                         'queue': TELEMETRY_QUEUE}}
+
+    @classmethod
+    def unsubscribe_response(cls, unsubscribed: bool) -> dict:
+        if unsubscribed:
+            return {'code': 200, 'msg': 'Unsubscribed.'}
+        return {'code': 404, 'msg': 'Not found active subscription'}
+
+
+class NetServer(CommandServer):
+    """
+    Сервер, обслуживающий одного клиента за раз в потоке сети.
+    """
+
+    def __init__(self, manager, *args, **kwargs):
+        self.conn: Optional[socket.socket] = None
+        self.s_data = self.received_data = None
+        self.subscription: Optional[Subscription] = None
+        super().__init__(manager, *args, **kwargs)
+
     def _run(self):
+        # Если еще не успели заупстить сокет, то ожидаем
+        self.listening.wait()
         while not self._closed:
-            # Если еще не успели заупстить сокет, то ожидаем
-            if not self.socket:
-                time.sleep(2)
+            # Ждем подключения, пока сервер не закроют
+            if not self._wait(self.socket):
                 continue
             try:
                 self.conn, addr = self.socket.accept()
-                self.conn.settimeout(2.0)
+                self.conn.settimeout(NET_TIMEOUT)
                 logger.info(f'NET: Connected by {addr}')
                 with self.conn:
                     # Аунтифицируем клиента
-                    if self.valid_auth_data(self.read_data(self.conn)):
+                    data = None
+                    if self.valid_auth_data(self.read_data(NET_TIMEOUT)):
                         while not self._closed and self.have_conn():
+                            self.push_telemetry()
                             if (data := self.read_data()) is None:
                                 continue
                             # Если данные - это пустой словарь,
@@ -68,14 +237,17 @@ class NetServer(Network):
                                 break
                             # Валидируем команды от клиента
                             if self.valid_comm_data(data):
-                                if data.get('type') == 'close':
+                                if data['type'] == 'close':
                                     break
-                                self.run_commands(data)
+                                self.handlers.get(data['type'],
+                                                  self.run_commands)(data)
+                    self.unsubscribe()
                     if self._closed:
                         self.send_data({'code': 521, 'msg': 'Server is Down'})
                     else:
-                        self.send_data({'code': 200,
-                                        'msg': 'Disconnected successfully.'})
+                        self.send_data(self.reply(
+                            {'code': 200, 'msg': 'Disconnected successfully.'},
+                            data))
                 logger.info(f'NET: Disconnected by {addr}')
             except ConnectionResetError as e:
                 logger.error(e)
@@ -83,57 +255,76 @@ class NetServer(Network):
             except OSError:
                 pass
 
-    def read_data(self, *args) -> Union[dict, None]:
-        return super().read_data(self.conn)
+    def command_handlers(self) -> dict:
+        return {
+            'status': self.send_status,
+            'stats': self.send_stats,
+            'subscribe': self.manage_subscription,
+            'unsubscribe': self.manage_subscription,
+            'export': self.send_export,
+        }
+
+    def read_data(self, timeout: Optional[float] = None,
+                  *args) -> Union[dict, None]:
+        # При подписке просыпаемся, чтобы отправить телеметрию
+        if timeout is None and self.subscription is not None:
+            timeout = self.subscription.period
+        return super().read_data(self.conn, timeout)
 
     def send_data(self, data: dict, *args) -> None:
         return super().send_data(self.conn, data)
 
     def valid_auth_data(self, data: Union[dict, None]) -> bool:
-        try:
-            if not isinstance(data, Mapping):
-                raise ValueError()
-            AuthReq(**(data if data is not None else {}))
-        except (ValidationError, ValueError) as e:
-            err = 'Invalid command.'
-            if isinstance(e, ValidationError):
-                err = e.json()
-            self.send_data({'code': 400, 'msg': err})
-            logger.debug(f'NET: authentication failed: {data} |')
-            return False
-
-        if data.get('token') != self.auth_token:
-            self.send_data({'code': 404, 'msg': 'Your auth-token not found.'})
-            logger.debug(f'NET: authentication failed: {data} |')
-            return False
-
-        self.send_data({'code': 200, 'msg': 'Authorization is successful.'})
-        logger.debug(f'NET: authentication was successful: {data} |')
-        return True
+        self.send_data(self.reply(response := self.check_auth_data(data),
+                                  data))
+        if response.get('encoding'):
+            self.set_codec(self.conn, get_codec(response['encoding']))
+        return response['code'] == 200
 
     def valid_comm_data(self, data: dict) -> bool:
-        try:
-            if not isinstance(data, Mapping):
-                raise ValueError()
-            CommandsReq(**(data if data is not None else {}))
-        except ValidationError as e:
-            err = 'Invalid command.'
-            if isinstance(e, ValidationError):
-                err = e.json()
-            self.send_data({'code': 400, 'msg': err})
-            logger.debug(f'NET: Invalid command: {data} |')
+        if (err := self.check_comm_data(data)) is not None:
+            self.send_data(self.reply(err, data))
             return False
-
-        logger.debug(f'NET: command validation was successful: {data} |')
         return True
 
     def run_commands(self, data: dict) -> None:
-        if self.manager.ready:
-            logger.debug(f'NET: starting command: {data} |')
-            self.manager.run_comm(data)
+        if (err := self.command_response(data)) is not None:
+            self.send_data(err)
+
+    def send_status(self, data: dict) -> None:
+        self.send_data(self.reply(self.status_response(), data))
+
+    def send_stats(self, data: dict = None) -> None:
+        self.send_data(self.reply(self.stats_response(data), data))
+
+    def send_export(self, data: dict) -> None:
+        for response in self.export_responses(data):
+            if self._closed or not self.have_conn():
+                break
+            self.send_data(response)
+
+    def manage_subscription(self, data: dict) -> None:
+        if data.get('type') == 'subscribe':
+            self.unsubscribe()
+            self.subscription = TELEMETRY.subscribe(data.get('rate'),
+                                                    data.get('streams'))
+            self.send_data(self.reply(
+                self.subscribe_response(self.subscription), data))
         else:
-            self.send_data({'code': 425,
-                            'msg': 'The application is not ready yet.'})
+            self.send_data(self.reply(
+                self.unsubscribe_response(self.unsubscribe()), data))
+
+    def unsubscribe(self) -> bool:
+        if self.subscription is None:
+            return False
+        TELEMETRY.unsubscribe(self.subscription)
+        self.subscription = None
+        return True
+
+    def push_telemetry(self) -> None:
+        if self.subscription is not None and \
+                (response := telemetry_response(self.subscription)):
+            self.send_data(response)
 
     def have_conn(self) -> bool:
         return self.conn and self.conn.fileno() != -1
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import deque
+from typing import Iterable, List, Optional, Set
+
+from devirta_pics.config import TELEMETRY_QUEUE, TELEMETRY_RATE
+
+# Потоки телеметрии: координаты маркеров первого человека и всех людей в
+# кадре, длины отрезков, события дыхания и оценка частоты дыхания
+STREAMS = ('positions', 'subjects', 'lines', 'breath', 'respiration')
+# Потоки, значения которых прореживаются до частоты подписки. События
+# дыхания передаются все.
+SAMPLED_STREAMS = ('positions', 'subjects', 'lines')
+# Потоки, последнее значение которых хранится и без подписок (для status)
+KEPT_STREAMS = ('respiration',)
+
+
+class Subscription:
+    """
+    Подписка клиента на телеметрию. Хранит ограниченную очередь сэмплов:
+    при переполнении отбрасываются самые старые, поэтому медленный клиент
+    не тормозит детектор и анализатор.
+    """
+
+    def __init__(self, rate=TELEMETRY_RATE, streams: Iterable[str] = STREAMS,
+                 maxlen=TELEMETRY_QUEUE):
+        self.rate = rate
+        self.period = 1 / rate
+        self.streams = set(streams)
+        self.queue = deque(maxlen=maxlen)
+        self.dropped = 0  # Количество отброшенных сэмплов
+
+        self._last = {}  # Время последнего сэмпла каждого потока
+
+    def offer(self, stream: str, sample: dict, now: float) -> None:
+        if stream not in self.streams:
+            return
+        if stream in SAMPLED_STREAMS:
+            if now - self._last.get(stream, 0) < self.period:
+                return
+            self._last[stream] = now
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(sample)
+
+    def drain(self) -> List[dict]:
+        samples = []
+        try:
+            while True:
+                samples.append(self.queue.popleft())
+        except IndexError:
+            return samples
+
+
+class TelemetryHub:
+    """
+    Раздает сэмплы телеметрии всем подпискам. Пока подписок нет, публикация
+    ничего не стоит.
+    """
+
+    def __init__(self):
+        self._subs: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self.last = dict.fromkeys(KEPT_STREAMS)
+
+    def subscribe(self, rate: Optional[float] = None,
+                  streams: Optional[Iterable[str]] = None) -> Subscription:
+        sub = Subscription(rate or TELEMETRY_RATE, streams or STREAMS)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Optional[Subscription]) -> None:
+        with self._lock:
+            self._subs.discard(sub)
+
+    def publish(self, stream: str, value) -> None:
+        if stream in self.last:
+            self.last[stream] = value
+        if not self._subs:
+            return
+        now = time.time()
+        sample = {'stream': stream, 't': round(now, 3), 'value': value}
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            sub.offer(stream, sample, now)
+
+
+def telemetry_response(sub: Subscription) -> Optional[dict]:
+    """
+    Собирает накопленные сэмплы подписки в сообщение клиенту.
+    """
+    if not (samples := sub.drain()):
+        return None
+    dropped, sub.dropped = sub.dropped, 0
+    return {'code': 200, 'msg': 'Telemetry.',
+            'data': {'samples': samples, 'dropped': dropped}}
+
+
+TELEMETRY = TelemetryHub()
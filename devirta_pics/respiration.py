@@ -0,0 +1,103 @@
+"""
+Оценка частоты дыхания по спектру длин отрезков A и B методом Уэлча.
+
+Сэмплы копятся в кольцевом буфере, и каждые `step` секунд по последнему
+сегменту считается один спектр (БПФ окна Ханна). Оценка - среднее спектров
+последних сегментов, поэтому стоимость обновления не зависит от длины
+сессии.
+"""
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from devirta_pics.config import (RR_BAND, RR_NFFT, RR_PEAK_WIDTH, RR_SEGMENT,
+                                 RR_STEP, RR_WINDOW)
+
+
+class RespirationEstimator:
+    def __init__(self, fs: float, window=RR_WINDOW, segment=RR_SEGMENT,
+                 step=RR_STEP, band=RR_BAND, nfft=RR_NFFT, lines=2):
+        """
+        :param fs: Частота сэмплов (Гц).
+        :param window: Окно оценки (с).
+        :param segment: Длина сегмента (с).
+        :param step: Период обновления оценки (с), шаг между сегментами.
+        :param band: Диапазон частоты дыхания (вдохов в минуту).
+        """
+        self.fs = fs
+        self.seg = max(int(round(segment * fs)), 8)
+        self.step = max(int(round(step * fs)), 1)
+        self.segments = max(int((window - segment) / step) + 1, 1)
+        self.nfft = max(nfft, self.seg)
+
+        self._taper = np.hanning(self.seg)[:, None]
+        freqs = np.fft.rfftfreq(self.nfft, 1 / fs) * 60
+        self._band = (freqs >= band[0]) & (freqs <= band[1])
+        self.freqs = freqs[self._band]  # Частоты спектра (в минуту)
+        self._bin = freqs[1] - freqs[0]
+
+        # Сегмент хранится дважды подряд, чтобы срез был непрерывным
+        self._buf = np.zeros((2 * self.seg, lines))
+        self._i = 0
+        self._count = 0
+        self._since = 0  # Сэмплов с последнего обновления
+        self._last: Optional[np.ndarray] = None
+        self._spectra = deque(maxlen=self.segments)
+
+        self.rate: Optional[float] = None  # Вдохов в минуту
+        self.quality = 0.0  # Доля мощности спектра около пика, от 0 до 1
+
+    def add(self, sample) -> bool:
+        """
+        Добавляет сэмпл длин отрезков.
+        :return: True, если оценка обновилась.
+        """
+        x = np.asarray(sample, dtype=float)
+        if not x.any():
+            # Маркеры не найдены - повторяем последний сэмпл, чтобы провал
+            # не давал ложную мощность в спектре
+            if self._last is None:
+                return False
+            x = self._last
+        self._last = x
+
+        self._buf[self._i] = self._buf[self._i + self.seg] = x
+        self._i = (self._i + 1) % self.seg
+        self._count += 1
+        self._since += 1
+        if self._count < self.seg or self._since < self.step:
+            return False
+        self._since = 0
+
+        segment = self._buf[self._i:self._i + self.seg]
+        segment = (segment - segment.mean(axis=0)) * self._taper
+        spectrum = np.fft.rfft(segment, self.nfft, axis=0)[self._band]
+        self._spectra.append(np.abs(spectrum) ** 2)
+        self._estimate()
+        return True
+
+    def _estimate(self) -> None:
+        psd = np.mean(self._spectra, axis=0)
+        total = psd.sum(axis=0)
+        if not (valid := total > 0).any() or not len(psd):
+            self.rate, self.quality = None, 0.0
+            return
+        # Спектры кривых нормируются, чтобы обе имели одинаковый вес
+        psd = (psd[:, valid] / total[valid]).mean(axis=1)
+
+        k = int(psd.argmax())
+        rate = self.freqs[k]
+        if 0 < k < len(psd) - 1:
+            # Уточняем положение пика параболой по соседним частотам
+            a, b, c = psd[k - 1:k + 2]
+            if (denom := a - 2 * b + c) != 0:
+                rate += 0.5 * (a - c) / denom * self._bin
+        self.rate = float(rate)
+        self.quality = float(
+            psd[np.abs(self.freqs - rate) <= RR_PEAK_WIDTH].sum())
+
+    def result(self) -> dict:
+        return {'rate': round(self.rate, 1) if self.rate is not None
+                else None,
+                'quality': round(self.quality, 3)}
@@ -0,0 +1,37 @@
+import argparse
+import logging
+import signal
+import sys
+
+from PyQt5.QtCore import QCoreApplication, QTimer
+
+from devirta_pics.service.service import HeadlessService
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)s %(name)s %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='DevirtaPics без графического интерфейса.')
+    parser.add_argument('--static', action='store_true',
+                        help='Использовать статичные адрес и токен.')
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    service = HeadlessService(use_static=args.static)
+    app.aboutToQuit.connect(service.close)
+
+    # Ctrl+C завершает цикл событий Qt. Таймер периодически возвращает
+    # управление интерпретатору, чтобы тот успел обработать сигнал.
+    signal.signal(signal.SIGINT, lambda *args: app.quit())
+    signal.signal(signal.SIGTERM, lambda *args: app.quit())
+    timer = QTimer()
+    timer.timeout.connect(lambda: None)
+    timer.start(500)
+
+    sys.exit(app.exec())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from PyQt5.QtCore import QObject, QTimer
+
+from devirta_pics.analyser import Analyser, create_subject_analysers
+from devirta_pics.detector import DETECTOR
+from devirta_pics.network.qnetmanager import QNetServerManager
+from devirta_pics.sessions import SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class HeadlessModeBase(QObject):
+    """
+    Режим без окна: только анализатор, управляемый по сети.
+    """
+    name = None
+
+    def __init__(self, service, patient=None, patients=None):
+        super().__init__()
+        self.service = service
+        self.analyser = Analyser(mode=self.name, patient=patient)
+        # Остальные люди в кадре
+        self.subject_analysers = create_subject_analysers(self.name,
+                                                          patients)
+        self.active = True
+
+    def send_data(self, **kwargs):
+        # Результаты режима отправляются с id сохраненной сессии
+        self.service.net_man.send_data(session=self.analyser.session_id,
+                                       **kwargs)
+
+    def subjects_data(self) -> dict:
+        # Итоги остальных людей в кадре
+        if not self.subject_analysers:
+            return {}
+        return {'subjects': [a.summary() for a in self.subject_analysers]}
+
+    def stop(self) -> None:
+        """
+        Принудительная остановка режима (команда stop).
+        """
+        self.finish()
+
+    def finish(self) -> None:
+        self.active = False
+        self.analyser.stop()
+        for analyser in self.subject_analysers:
+            analyser.stop()
+
+
+class HeadlessTestingMode(HeadlessModeBase):
+    name = 'test'
+
+    def __init__(self, service, ttime_min=2, patient=None, patients=None):
+        super().__init__(service, patient, patients)
+        self.ttime = timedelta(minutes=ttime_min)
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.finish_testing)
+        self.timer.start(int(self.ttime.total_seconds() * 1000))
+
+    def finish_testing(self) -> None:
+        self.finish()
+        if not (tp_breath := self.analyser.dominant_breath()):
+            self.send_data(code=204, msg='Mode completed unsuccessfully.',
+                           data=self.subjects_data() or None)
+        else:
+            self.send_data(code=201, msg='The mode is completed.',
+                           data={'type_breath': tp_breath,
+                                 **self.subjects_data()})
+
+    def stop(self) -> None:
+        self.timer.stop()
+        super().stop()
+        self.send_data(code=204, msg='Mode interrupted.', data=None)
+
+
+class HeadlessRehabMode(HeadlessModeBase):
+    name = 'rehab'
+
+    def stop(self) -> None:
+        super().stop()
+        br_counter = self.analyser.breath_counters
+        if not any(br_counter.values()):
+            self.send_data(code=204, msg='Mode completed unsuccessfully.',
+                           data=self.subjects_data() or None)
+        else:
+            self.send_data(code=201, msg='The mode is completed.',
+                           data={'breath_counter': br_counter,
+                                 **self.subjects_data()})
+
+
+class HeadlessService(QObject):
+    """
+    Запускает камеру, детектор и TCP сервер без графического интерфейса.
+    Режимы тестирования и реабилитации запускаются только командами по сети.
+    """
+
+    def __init__(self, use_static=False):
+        super().__init__()
+        self.active_mode: Optional[HeadlessModeBase] = None
+
+        # Детектор будет один благодаря паттерну Singleton
+        DETECTOR()  # Запускаем детектор.
+
+        self.net_man = QNetServerManager(use_static=use_static)
+        if not self.net_man.alive():
+            raise RuntimeError('Failed to start server.')
+        self.net_man.runCommSignal.connect(self.run_net_commands)
+        self.net_man.ready = True
+
+        logger.info(f'SERVICE: address {self.net_man.addr}, '
+                    f'token {self.net_man.auth_token}')
+
+    def mode_is_active(self) -> bool:
+        return self.active_mode is not None and self.active_mode.active
+
+    def run_net_commands(self, data: dict) -> None:
+        tp, mode = data.get('type'), data.get('mode')
+        if tp == 'stop':
+            if self.mode_is_active():
+                self.active_mode.stop()
+                self.active_mode = None
+            else:
+                self.net_man.send_data(code=404, msg='Not found active mode')
+            return
+        # Если один из режимов уже запущен
+        if self.mode_is_active():
+            self.net_man.send_data(code=425, msg='Failed to start mode')
+            return
+
+        self.net_man.send_data(code=200, msg=f'Starting {mode} command...')
+        if mode == 'test':
+            self.active_mode = HeadlessTestingMode(
+                self, int(data.get('time', 2)), data.get('patient'),
+                data.get('patients'))
+        elif mode == 'rehab':
+            self.active_mode = HeadlessRehabMode(self, data.get('patient'),
+                                                 data.get('patients'))
+
+    def close(self) -> None:
+        if self.mode_is_active():
+            self.active_mode.stop()
+        DETECTOR().stop()
+        self.net_man.close()
+        SessionStore.close()
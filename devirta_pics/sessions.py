@@ -0,0 +1,124 @@
+"""
+Данные завершенных сессий (режимов): временной ряд длин отрезков и события
+дыхания. Хранятся в памяти, пока их не вытеснят новые сессии, и выгружаются
+по сети командой export. События сессий также сохраняются в базу данных
+(devirta_pics.database) для просмотра истории.
+"""
+import itertools
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime as dt
+from typing import Dict, List, Optional
+
+from devirta_pics.config import DB_PATH, SESSIONS_KEEP
+from devirta_pics.database import SessionDB
+from devirta_pics.events import EventStore
+from devirta_pics.utils.singleton import Singleton
+
+logger = logging.getLogger(__name__)
+
+# Потоки данных сессии: временной ряд и события дыхания
+EXPORT_STREAMS = ('series', 'events')
+SERIES_COLUMNS = ('time', 'a', 'b')
+
+
+class Session:
+    def __init__(self, session_id: str, mode: Optional[str], series,
+                 events: EventStore, started: dt, finished: dt,
+                 patient: Optional[str] = None, subject=0):
+        self.id = session_id
+        self.mode = mode
+        self.patient = patient
+        self.subject = subject  # Номер человека в кадре слева направо
+        self.series = series  # Массив (N, 3): время, отрезок A, отрезок B
+        self.events = events
+        self.started, self.finished = started, finished
+        # База, в которую записана сессия. После записи события выгружаются
+        # из нее, а части событий на диске удаляются.
+        self.db: Optional[SessionDB] = None
+
+    def stored(self, db: SessionDB) -> None:
+        """
+        Вызывается потоком записи базы после сохранения сессии.
+        """
+        self.db = db
+        self.events.discard()
+
+    def total(self, stream: str) -> int:
+        return len(self.series if stream == 'series' else self.events)
+
+    def rows(self, stream: str, offset: int, limit: int) -> list:
+        if stream == 'series':
+            return self.series[offset:offset + limit].round(4).tolist()
+        if self.db is not None:
+            return self.db.events(self.id, offset, limit)
+        return self.events.rows(offset, limit)
+
+    def info(self) -> dict:
+        return {'session': self.id, 'mode': self.mode,
+                'patient': self.patient, 'subject': self.subject,
+                'started': self.started.isoformat(),
+                'finished': self.finished.isoformat(),
+                'series': self.total('series'),
+                'events': self.total('events')}
+
+
+class SessionStore(metaclass=Singleton):
+    def __init__(self, keep=SESSIONS_KEEP, db_path=DB_PATH):
+        self.keep = keep
+        self._sessions: Dict[str, Session] = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.db = None
+        if db_path is not None:
+            try:
+                self.db = SessionDB(db_path)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f'SESSIONS: database is not available: {e}')
+
+    def add(self, mode: Optional[str], series, events: EventStore,
+            started: dt, patient: Optional[str] = None, subject=0) -> str:
+        """
+        Сохраняет данные сессии.
+        :return: id сессии.
+        """
+        finished = dt.now()
+        session_id = f'{finished:%Y%m%d-%H%M%S}-{next(self._ids)}'
+        session = Session(session_id, mode, series, events, started,
+                          finished, patient, subject)
+        with self._lock:
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.keep:
+                _, old = self._sessions.popitem(last=False)
+                # С базой части событий удаляются после записи в нее
+                if self.db is None:
+                    old.events.discard()
+        if self.db is not None:
+            self.db.add(session, patient)
+        return session_id
+
+    def get(self, session_id: Optional[str] = None) -> Optional[Session]:
+        """
+        Возвращает сессию по id, а если id не указан, то последнюю.
+        """
+        with self._lock:
+            if session_id is None:
+                return next(reversed(self._sessions.values()), None)
+            return self._sessions.get(session_id)
+
+    def sessions(self) -> List[dict]:
+        with self._lock:
+            return [s.info() for s in self._sessions.values()]
+
+    @classmethod
+    def close(cls) -> None:
+        """
+        Дожидается записи сессий в базу. Если хранилище еще не создано, то
+        ничего не делает: база не открывается только ради закрытия.
+        """
+        store = Singleton._instances.get(cls)
+        if store is not None and store.db is not None:
+            store.db.close()
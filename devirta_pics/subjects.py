@@ -0,0 +1,41 @@
+"""
+Разделение маркеров, найденных детектором на одном кадре, между людьми.
+Маркеры одного человека расположены на туловище друг под другом, а люди
+стоят или сидят рядом, поэтому маркеры сортируются по X и делятся на группы
+по самым большим промежуткам между соседями.
+"""
+from typing import List
+
+import numpy as np
+
+from devirta_pics.config import OBJECT_COUNT, SUBJECT_COUNT, SUBJECT_MIN_GAP
+
+
+def group_markers(centers: np.ndarray, subjects=SUBJECT_COUNT,
+                  markers=OBJECT_COUNT,
+                  min_gap=SUBJECT_MIN_GAP) -> List[np.ndarray]:
+    """
+    :param centers: Массив (N, 2) центров найденных маркеров по убыванию
+        уверенности детектора.
+    :param subjects: Количество людей в кадре.
+    :param markers: Количество маркеров у одного человека.
+    :param min_gap: Минимальный промежуток по X между людьми (пикс). По
+        меньшим промежуткам группы не делятся, поэтому маркеры одного
+        человека не разделяются, если остальных нет в кадре.
+    :return: Для каждого человека слева направо - индексы его маркеров в
+        centers, отсортированные по Y. Если людей найдено меньше, последние
+        группы пустые.
+    """
+    groups = []
+    if len(centers):
+        order = np.argsort(centers[:, 0], kind='stable')
+        gaps = np.diff(centers[order, 0])
+        # Делим по самым большим промежуткам, но не больше чем на subjects
+        cuts = np.argsort(gaps, kind='stable')[::-1][:subjects - 1]
+        cuts = np.sort(cuts[gaps[cuts] > min_gap]) + 1
+        for idx in np.split(order, cuts):
+            # Лишние маркеры группы - с наименьшей уверенностью
+            idx = np.sort(idx)[:markers]
+            groups.append(idx[np.argsort(centers[idx, 1], kind='stable')])
+    empty = np.empty(0, dtype=int)
+    return groups + [empty] * (subjects - len(groups))
@@ -0,0 +1,117 @@
+"""
+Сопоставление маркеров между кадрами. Каждый маркер каждого человека - трек
+со своим номером. Найденные на кадре маркеры назначаются трекам венгерским
+алгоритмом по расстоянию до предсказанного положения (последнее положение
+плюс сглаженная скорость), поэтому номера маркеров не меняются, когда они
+оказываются на одной высоте, а люди сохраняют свои номера при движении.
+"""
+import numpy as np
+
+from devirta_pics.config import (OBJECT_COUNT, SUBJECT_COUNT,
+                                 TRACK_MAX_DISTANCE, TRACK_MAX_MISSED,
+                                 TRACK_VELOCITY_ALPHA)
+from devirta_pics.subjects import group_markers
+
+
+class MarkerTracker:
+    def __init__(self, subjects=SUBJECT_COUNT, markers=OBJECT_COUNT,
+                 max_distance=TRACK_MAX_DISTANCE, max_missed=TRACK_MAX_MISSED,
+                 alpha=TRACK_VELOCITY_ALPHA):
+        """
+        :param subjects: Количество людей в кадре.
+        :param markers: Количество маркеров у одного человека.
+        :param max_distance: Максимальное расстояние от предсказанного
+            положения до маркера (пикс), дальше маркер треку не назначается.
+        :param max_missed: Количество кадров подряд без маркера, после
+            которого трек теряется.
+        :param alpha: Коэффициент сглаживания скорости.
+        """
+        # scipy загружается только при создании трекера, как и torch в
+        # детекторе
+        from scipy.optimize import linear_sum_assignment
+        self._assign = linear_sum_assignment
+
+        self.subjects, self.markers = subjects, markers
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.alpha = alpha
+
+        # Трек номер subject * markers + k - k-й сверху маркер человека
+        count = subjects * markers
+        self.pos = np.zeros((count, 2))  # Последние положения (пикс)
+        self.vel = np.zeros((count, 2))  # Скорости (пикс за кадр)
+        self.missed = np.zeros(count, dtype=int)
+        self.alive = np.zeros(count, dtype=bool)
+
+    def update(self, centers: np.ndarray) -> np.ndarray:
+        """
+        Назначает маркеры кадра трекам и обновляет их положения.
+        :param centers: Массив (N, 2) центров найденных маркеров по убыванию
+            уверенности детектора.
+        :return: Для каждого трека индекс маркера в centers или -1, если
+            маркер трека на кадре не найден.
+        """
+        if not self.alive.any():
+            return self._start(centers)
+
+        match = np.full(len(self.pos), -1)
+        free = np.ones(len(centers), dtype=bool)
+        if len(centers):
+            # Живые треки - по расстоянию до предсказанного положения
+            tracks = self.alive.nonzero()[0]
+            self._match(tracks, self.pos[tracks] + self.vel[tracks],
+                        centers, match, free, self.max_distance)
+            # Потерянные треки подбирают оставшиеся маркеры рядом с
+            # последним положением
+            tracks = (~self.alive).nonzero()[0]
+            if len(tracks) and free.any():
+                self._match(tracks, self.pos[tracks], centers, match, free,
+                            np.inf)
+
+        found = match >= 0
+        shift = centers[match[found]] - self.pos[found]
+        self.vel[found] = np.where(
+            self.alive[found, None],
+            self.alpha * shift + (1 - self.alpha) * self.vel[found], 0)
+        self.pos[found] = centers[match[found]]
+        self.missed[found] = 0
+        self.alive[found] = True
+
+        # Треки без маркера продолжают движение до потери
+        lost = ~found & self.alive
+        self.pos[lost] += self.vel[lost]
+        self.missed[lost] += 1
+        dead = lost & (self.missed > self.max_missed)
+        self.alive[dead] = False
+        self.vel[dead] = 0
+        return match
+
+    def _match(self, tracks: np.ndarray, points: np.ndarray,
+               centers: np.ndarray, match: np.ndarray, free: np.ndarray,
+               max_distance: float) -> None:
+        candidates = free.nonzero()[0]
+        cost = np.linalg.norm(
+            points[:, None, :] - centers[None, candidates, :], axis=2)
+        rows, cols = self._assign(cost)
+        near = cost[rows, cols] <= max_distance
+        match[tracks[rows[near]]] = candidates[cols[near]]
+        free[candidates[cols[near]]] = False
+
+    def _start(self, centers: np.ndarray) -> np.ndarray:
+        """
+        Пока треков нет, маркеры делятся между людьми по положению и
+        сортируются по Y. Треки создаются, когда найдены все маркеры всех
+        людей.
+        """
+        match = np.full(len(self.pos), -1)
+        groups = group_markers(centers, self.subjects, self.markers)
+        for subject, idx in enumerate(groups):
+            start = subject * self.markers
+            match[start:start + len(idx)] = idx
+        found = match >= 0
+        self.pos[found] = centers[match[found]]
+        if found.all():
+            self.alive[:] = True
+            self.vel[:] = 0
+            self.missed[:] = 0
+        return match
@@ -1,7 +1,10 @@
-from matplotlib.colors import cnames, to_rgb
+from functools import lru_cache
 
 
 class Color:
     @classmethod
+    @lru_cache(maxsize=None)
     def c(cls, cname):
+        # matplotlib импортируется только при первом обращении к цвету
+        from matplotlib.colors import cnames, to_rgb
         return tuple(map(lambda x: int(x * 255), to_rgb(cnames[cname])))
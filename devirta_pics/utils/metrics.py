@@ -0,0 +1,353 @@
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Optional
+
+from devirta_pics.config import (METRICS_BUCKETS_MS, METRICS_LOG_INTERVAL,
+                                 METRICS_STAGES, METRICS_WINDOW,
+                                 PROFILER_INTERVAL_MS, PROFILER_TOP)
+
+logger = logging.getLogger(__name__)
+
+
+class RollingHistogram:
+    """
+    Хранит последние значения измерений (в мс) и считает по ним перцентили
+    и распределение по корзинам.
+    """
+
+    def __init__(self, size=METRICS_WINDOW, buckets=METRICS_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._values = deque(maxlen=size)
+        self._total = 0  # Количество измерений за все время
+        self._lock = threading.Lock()
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._values.append(value)
+            self._total += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            values, total = sorted(self._values), self._total
+        if not values:
+            return {'count': 0, 'total': total}
+
+        def percentile(p):
+            return values[min(len(values) - 1, int(len(values) * p))]
+
+        hist, i = [], 0
+        for bound in self.buckets:
+            count = 0
+            while i < len(values) and values[i] <= bound:
+                count, i = count + 1, i + 1
+            hist.append(count)
+        hist.append(len(values) - i)  # Значения больше последней границы
+
+        return {
+            'count': len(values),
+            'total': total,
+            'min': round(values[0], 3),
+            'max': round(values[-1], 3),
+            'mean': round(sum(values) / len(values), 3),
+            'p50': round(percentile(0.5), 3),
+            'p90': round(percentile(0.9), 3),
+            'p99': round(percentile(0.99), 3),
+            'buckets': dict(zip([*map(str, self.buckets), 'inf'], hist)),
+        }
+
+
+class RateCounter:
+    """
+    Считает частоту событий (в секунду) за последние `period` секунд.
+    """
+
+    def __init__(self, period=5.0):
+        self.period = period
+        self._stamps = deque()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def tick(self, n=1) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._stamps.append((now, n))
+            self._total += n
+            self._trim(now)
+
+    def _trim(self, now):
+        while self._stamps and now - self._stamps[0][0] > self.period:
+            self._stamps.popleft()
+
+    def summary(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            count = sum(n for _, n in self._stamps)
+            total = self._total
+        return {'rate': round(count / self.period, 2), 'total': total}
+
+
+class StageTimer:
+    """
+    Замер времени этапа конвейера: контекстный менеджер и декоратор. Пока
+    замеры этапов выключены, стоит одну проверку флага.
+    """
+    __slots__ = ('metrics', 'name', '_start')
+
+    def __init__(self, metrics: 'Metrics', name: str):
+        self.metrics = metrics
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        if self.metrics.stages:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            self.metrics.observe_stage(
+                self.name, (time.perf_counter() - self._start) * 1000)
+
+    def __call__(self, func):
+        metrics, name = self.metrics, self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.stages:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe_stage(
+                    name, (time.perf_counter() - start) * 1000)
+        return wrapper
+
+
+class SamplingProfiler:
+    """
+    Статистический профилировщик: поток периодически снимает стеки всех
+    потоков и считает, в каких функциях они находятся. Стоимость не зависит
+    от количества вызовов функций, поэтому его можно включать на работающей
+    станции.
+    """
+
+    def __init__(self, interval_ms=PROFILER_INTERVAL_MS, top=PROFILER_TOP):
+        self.interval = interval_ms / 1000
+        self.top = top
+
+        self._own = Counter()  # (поток, функция) на вершине стека
+        self._total = Counter()  # (поток, функция) где-либо в стеке
+        self._samples = Counter()  # Количество стеков каждого потока
+        self._names = {}  # Кэш названий функций по объектам кода
+        self._lock = threading.Lock()
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.started = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        with self._lock:
+            self._own.clear()
+            self._total.clear()
+            self._samples.clear()
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='SamplingProfiler')
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+
+    def _function(self, code) -> str:
+        if (name := self._names.get(code)) is None:
+            name = self._names[code] = \
+                f'{code.co_name} ({os.path.basename(code.co_filename)}:' \
+                f'{code.co_firstlineno})'
+        return name
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            threads = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    thread = threads.get(ident, str(ident))
+                    self._samples[thread] += 1
+                    self._own[thread, self._function(frame.f_code)] += 1
+                    # Рекурсивные функции считаются один раз на стек
+                    seen = set()
+                    while frame is not None:
+                        if (code := frame.f_code) not in seen:
+                            seen.add(code)
+                            self._total[thread, self._function(code)] += 1
+                        frame = frame.f_back
+
+    def summary(self) -> dict:
+        """
+        Функции, в которых потоки провели больше всего времени: own - доля
+        стеков потока, где функция на вершине, total - где она в стеке.
+        """
+        with self._lock:
+            samples = dict(self._samples)
+            top = self._own.most_common(self.top)
+            total = {key: self._total[key] for key, _ in top}
+        return {
+            'running': self.running,
+            'interval_ms': round(self.interval * 1000, 3),
+            'duration': round(time.time() - self.started, 1)
+            if self.started else 0,
+            'samples': samples,
+            'top': [{'thread': thread, 'function': function,
+                     'own': round(own / samples[thread], 3),
+                     'total': round(total[thread, function] /
+                                    samples[thread], 3)}
+                    for (thread, function), own in top],
+        }
+
+
+class Metrics:
+    """
+    Реестр метрик конвейера захвата: частоты, счетчики и гистограммы
+    задержек. Доступен из кода (snapshot), периодически пишется в лог и
+    отдается TCP-сервером по команде `stats`.
+
+    Время этапов (захват, трекинг, анализ, отрисовка) пишется, только если
+    замеры включены (stages), через METRICS.timed. Профилировщик стеков
+    включается отдельно.
+    """
+
+    def __init__(self, log_interval=METRICS_LOG_INTERVAL,
+                 stages=METRICS_STAGES):
+        self.log_interval = log_interval
+        self.stages = stages
+
+        self._hists: Dict[str, RollingHistogram] = {}
+        self._stages: Dict[str, RollingHistogram] = {}
+        self._rates: Dict[str, RateCounter] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.profiler = SamplingProfiler()
+
+        self._reporter: Optional[threading.Thread] = None
+        self.started = time.time()
+
+    def observe(self, name: str, value_ms: float) -> None:
+        if (hist := self._hists.get(name)) is None:
+            with self._lock:
+                hist = self._hists.setdefault(name, RollingHistogram())
+        hist.add(value_ms)
+
+    def observe_stage(self, name: str, value_ms: float) -> None:
+        if (hist := self._stages.get(name)) is None:
+            with self._lock:
+                hist = self._stages.setdefault(name, RollingHistogram())
+        hist.add(value_ms)
+
+    def timed(self, name: str) -> StageTimer:
+        """
+        Замер времени этапа:
+            with METRICS.timed('capture'): ...
+            @METRICS.timed('analyse')
+        """
+        return StageTimer(self, name)
+
+    def configure(self, stages: Optional[bool] = None,
+                  profile: Optional[bool] = None) -> None:
+        """
+        Включает или выключает замеры этапов и профилировщик (None - не
+        менять).
+        """
+        if stages is not None:
+            self.stages = stages
+        if profile is True:
+            self.profiler.start()
+        elif profile is False:
+            self.profiler.stop()
+
+    def tick(self, name: str, n=1) -> None:
+        if (rate := self._rates.get(name)) is None:
+            with self._lock:
+                rate = self._rates.setdefault(name, RateCounter())
+        rate.tick(n)
+
+    def incr(self, name: str, n=1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def histogram(self, name: str) -> dict:
+        hist = self._hists.get(name)
+        return hist.summary() if hist else {'count': 0, 'total': 0}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hists, rates = dict(self._hists), dict(self._rates)
+            stages = dict(self._stages)
+            counters = dict(self._counters)
+        snap = {
+            'uptime': round(time.time() - self.started, 1),
+            'rates': {k: v.summary() for k, v in rates.items()},
+            'counters': counters,
+            'latency_ms': {k: v.summary() for k, v in hists.items()},
+            'stages': self.stages,
+            'stages_ms': {k: v.summary() for k, v in stages.items()},
+        }
+        if self.profiler.started is not None:
+            snap['profile'] = self.profiler.summary()
+        return snap
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists.clear()
+            self._stages.clear()
+            self._rates.clear()
+            self._counters.clear()
+        self.started = time.time()
+
+    def start_reporting(self) -> None:
+        """
+        Запускает поток, который периодически пишет метрики в лог.
+        """
+        if self.log_interval <= 0 or \
+                (self._reporter is not None and self._reporter.is_alive()):
+            return
+        self._reporter = threading.Thread(target=self._report, daemon=True,
+                                          name='MetricsReporter')
+        self._reporter.start()
+
+    def _report(self) -> None:
+        while True:
+            time.sleep(self.log_interval)
+            snap = self.snapshot()
+            rates = ', '.join(f'{k}={v["rate"]}/s'
+                              for k, v in snap['rates'].items())
+            lat = ', '.join(f'{k}: p50={v["p50"]} p99={v["p99"]}ms'
+                            for k, v in {**snap['latency_ms'],
+                                         **snap['stages_ms']}.items()
+                            if v['count'])
+            logger.info(f'METRICS: {rates} | {snap["counters"]} | {lat}')
+            if (profile := snap.get('profile')) and profile['running']:
+                top = ', '.join(f'{f["function"]} [{f["thread"]}] '
+                                f'{f["own"]:.0%}'
+                                for f in profile['top'][:3])
+                logger.info(f'METRICS: profile: {top}')
+
+
+METRICS = Metrics()
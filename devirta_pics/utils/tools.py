@@ -1,11 +1,20 @@
+import importlib
 import json
 import logging
 import os
 import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
 from pkg_resources import resource_filename
 
+from devirta_pics.utils.singleton import Singleton
+
 logger = logging.getLogger(__name__)
 
+_morph = None
+_morph_lock = threading.Lock()
+
 
 def abspath(rel_path: str) -> str:
     try:
@@ -20,38 +29,130 @@ def load_rsc(path):
     return resource_filename('devirta_pics', path)
 
 
+def get_morph():
+    """
+    Возвращает общий экземпляр MorphAnalyzer. Словари pymorphy2 загружаются
+    один раз за время работы приложения.
+    """
+    global _morph
+    with _morph_lock:
+        if _morph is None:
+            from pymorphy2 import MorphAnalyzer
+            _morph = MorphAnalyzer()
+    return _morph
+
+
+def preload(modules: Iterable[str],
+            callback: Optional[Callable] = None) -> threading.Thread:
+    """
+    Импортирует тяжелые модули в фоновом потоке, пока пользователь находится
+    на стартовом экране. Повторный импорт из основного потока дождется
+    окончания загрузки модуля благодаря блокировке импорта.
+    """
+    def run():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                logger.warning(f'Failed to preload {name}: {e}')
+        if callback is not None:
+            callback()
+
+    thread = threading.Thread(target=run, name='Preload', daemon=True)
+    thread.start()
+    return thread
+
+
 ANALYSER_SETTINGS_PATH = 'data/settings/analyser_settings.json'
 GRAPH_SETTINGS_PATH = 'data/settings/graph_settings.json'
+SETTINGS_PATHS = {'analyser': ANALYSER_SETTINGS_PATH,
+                  'graph': GRAPH_SETTINGS_PATH}
 
 
-class FileManager:
-    @classmethod
-    def load_analyser_settings(cls) -> dict:
+class SettingsService(metaclass=Singleton):
+    """
+    Настройки из JSON файлов с кешем в памяти. Файл перечитывается, только
+    если изменилось время его изменения. Подписчики получают имя изменившихся
+    настроек при сохранении через сервис и при изменении файла извне, которое
+    обнаруживает `check`.
+    """
+
+    def __init__(self):
+        # {имя: (время изменения файла, настройки)}
+        self._cache: Dict[str, Tuple[Optional[int], dict]] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self.paths = {name: load_rsc(path)
+                      for name, path in SETTINGS_PATHS.items()}
+
+    def _mtime(self, name: str) -> Optional[int]:
         try:
-            with open(load_rsc(ANALYSER_SETTINGS_PATH), encoding='utf-8') as f:
-                data = json.load(f)
-            with open(load_rsc(GRAPH_SETTINGS_PATH), encoding='utf-8') as f:
-                data.update(json.load(f))
-            return data
+            return os.stat(self.paths[name]).st_mtime_ns
         except FileNotFoundError:
-            logger.info('Can`t found analyser settings file.')
-            return {}
+            return None
 
-    @classmethod
-    def load_graph_settings(cls) -> dict:
+    def _read(self, name: str) -> dict:
         try:
-            with open(load_rsc(GRAPH_SETTINGS_PATH), encoding='utf-8') as f:
+            with open(self.paths[name], encoding='utf-8') as f:
                 return json.load(f)
         except FileNotFoundError:
-            logger.info('Can`t found graph settings file.')
-            return {}
+            logger.info(f'Can`t found {name} settings file.')
+        except ValueError as e:
+            logger.error(f'Invalid {name} settings file: {e}')
+        return {}
+
+    def get(self, name: str) -> dict:
+        mtime = self._mtime(name)
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is None or cached[0] != mtime:
+                cached = self._cache[name] = (mtime, self._read(name))
+        return dict(cached[1])
+
+    def save(self, name: str, data: dict) -> None:
+        with open(self.paths[name], 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        with self._lock:
+            self._cache[name] = (self._mtime(name), dict(data))
+        self._notify(name)
+
+    def check(self) -> None:
+        """
+        Проверяет, не изменились ли загруженные файлы настроек.
+        """
+        for name in SETTINGS_PATHS:
+            with self._lock:
+                cached = self._cache.get(name)
+            if cached is not None and cached[0] != self._mtime(name):
+                self.get(name)
+                self._notify(name)
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, name: str) -> None:
+        for callback in list(self._listeners):
+            callback(name)
+
+
+class FileManager:
+    @classmethod
+    def load_analyser_settings(cls) -> dict:
+        settings = SettingsService()
+        return {**settings.get('analyser'), **settings.get('graph')}
+
+    @classmethod
+    def load_graph_settings(cls) -> dict:
+        return SettingsService().get('graph')
 
     @classmethod
     def save_analyser_settings(cls, data: dict) -> None:
-        with open(load_rsc(ANALYSER_SETTINGS_PATH), 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+        SettingsService().save('analyser', data)
 
     @classmethod
     def save_graph_settings(cls, data: dict) -> None:
-        with open(load_rsc(GRAPH_SETTINGS_PATH), 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+        SettingsService().save('graph', data)
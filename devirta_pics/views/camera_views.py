@@ -1,14 +1,20 @@
+import threading
 import time
 from threading import Thread
 
 import cv2
-from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QImage
 from PyQt5.QtWidgets import QLabel
 
+from devirta_pics.utils.metrics import METRICS
+
 
 class WindowCamera(QObject):
     changePixmap = pyqtSignal(QImage)
+    # Внутренний сигнал о появлении нового кадра. Испускается только если
+    # предыдущий кадр уже забран потоком интерфейса.
+    _frameReady = pyqtSignal()
 
     def __init__(self, label: QLabel, img_src):
         super().__init__(parent=None)
@@ -18,22 +24,51 @@ class WindowCamera(QObject):
         # Источник картинки
         self.img_src = img_src
 
+        # Последний подготовленный кадр, ожидающий отрисовки. Хранится вместе
+        # с буфером numpy, на который ссылается QImage.
+        self._pending = None
+        self._lock = threading.Lock()
+        self._frameReady.connect(self._deliver_frame)
+
+    @METRICS.timed('frame_convert')
     def to_qt_format(self, img):
-        # Переводим в формат для qt
-        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_img.shape
-        bytes_per_line = ch * w
-        convert_to_qt_format = QImage(rgb_img.data, w, h, bytes_per_line,
-                                      QImage.Format_RGB888)
         try:
-            # Мастшабируем в соответствии с размерами экрана
-            p = convert_to_qt_format.scaled(
-                self.label.width(), self.label.height(),
-                Qt.KeepAspectRatio)
+            # Размеры лэйбла читаем один раз, чтобы не зависеть от ресайза
+            # окна во время подготовки кадра
+            lw, lh = self.label.width(), self.label.height()
+        except RuntimeError:
+            # Лэйбл уже удален вместе с окном
+            return
+        if lw <= 0 or lh <= 0:
+            return
+
+        # Масштабируем в соответствии с размерами экрана с сохранением
+        # пропорций. Стоимость ограничена размерами лэйбла.
+        h, w = img.shape[:2]
+        scale = min(lw / w, lh / h)
+        size = max(1, int(w * scale)), max(1, int(h * scale))
+        if size != (w, h):
+            img = cv2.resize(img, size, interpolation=cv2.INTER_LINEAR)
+
+        # QImage строится прямо на BGR буфере без конвертации и копирования
+        h, w = img.shape[:2]
+        qt_img = QImage(img.data, w, h, img.strides[0], QImage.Format_BGR888)
+
+        with self._lock:
+            # Оставляем только самый новый кадр. Если поток интерфейса еще не
+            # забрал предыдущий, то сигнал повторно не отправляем.
+            has_pending = self._pending is not None
+            self._pending = (img, qt_img)
+        if not has_pending:
+            self._frameReady.emit()
+
+    @pyqtSlot()
+    def _deliver_frame(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
             # Вызываем событие об обновлении картинки
-            self.changePixmap.emit(p)
-        except Exception:
-            pass
+            self.changePixmap.emit(pending[1])
 
 
 class CallbackCam(WindowCamera):
@@ -80,4 +115,3 @@ class LoopCam(WindowCamera, Thread):
             if time.time() - self.one_second_timer >= 1:
                 self.one_second_timer = time.time()
                 self.fps_count = 0
-
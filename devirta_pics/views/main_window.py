@@ -1,20 +1,25 @@
 from enum import Enum
-from typing import Optional
-from PyQt5 import QtGui, uic
+from typing import TYPE_CHECKING, Optional
+from PyQt5 import QtGui
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QMainWindow
 
-from devirta_pics.camera.camera import Camera
-from devirta_pics.detector import DETECTOR
 from devirta_pics.network.qnetmanager import QNetServerManager
-from devirta_pics.utils.tools import load_rsc
-from devirta_pics.views.mode_windows import (ModeWindowBase, RehabModeOffline,
-                                             RehabModeOnline,
-                                             TestingModeOffline,
-                                             TestingModeOnline)
-from devirta_pics.views.settings_windows import (AnalyserSettingsWindow,
-                                                 CheckCamWindow,
-                                                 GraphSettingsWindow)
+from devirta_pics.sessions import SessionStore
+from devirta_pics.utils.tools import get_morph, preload
+from devirta_pics.views.ui_loader import load_ui
+
+if TYPE_CHECKING:
+    from devirta_pics.views.mode_windows import ModeWindowBase
+
+# Тяжелые модули (torch, cv2, pyqtgraph, pymorphy2) не импортируются при
+# старте, а загружаются в фоне, пока открыт стартовый экран.
+PRELOAD_MODULES = (
+    'devirta_pics.views.mode_windows',
+    'devirta_pics.views.settings_windows',
+    'pyqtgraph',
+    'torch',
+)
 
 
 class AppModes(Enum):
@@ -36,15 +41,16 @@ class MainWindow(QMainWindow):
         self.net_state_timer = None
 
         # Inner widgets windows
-        self.active_mode_w: Optional[ModeWindowBase] = None
+        self.active_mode_w: Optional['ModeWindowBase'] = None
         self.cam_check_w = self.graph_sw = self.analyser_sw = None
 
         self.load_started_w()
+        preload(PRELOAD_MODULES, callback=get_morph)
 
     def load_started_w(self):
         self.menuBar().hide()
         self.statusBar().hide()
-        uic.loadUi(load_rsc('data/ui/started_w.ui'), self)
+        load_ui('started_w', self)
         self.next_btn.clicked.connect(self.load_main_w)
         self.connect_btn.clicked.connect(self.connect2server)
 
@@ -54,8 +60,11 @@ class MainWindow(QMainWindow):
             self.net_man.ready = True
 
     def load_main_w(self):
+        from devirta_pics.camera.camera import Camera
+        from devirta_pics.detector import DETECTOR
+
         self.mode = self.tabWidget.currentIndex()
-        uic.loadUi(load_rsc('data/ui/mn_w.ui'), self)
+        load_ui('mn_w', self)
 
         self.activate_mode()
 
@@ -73,30 +82,40 @@ class MainWindow(QMainWindow):
         DETECTOR()  # Запускаем детектор.
 
     def open_analyser_sw(self) -> None:
+        from devirta_pics.views.settings_windows import AnalyserSettingsWindow
         self.analyser_sw = AnalyserSettingsWindow()
         self.analyser_sw.show()
 
     def open_graph_sw(self) -> None:
+        from devirta_pics.views.settings_windows import GraphSettingsWindow
         self.graph_sw = GraphSettingsWindow()
         self.graph_sw.show()
 
     def open_check_cam_w(self) -> None:
+        from devirta_pics.views.settings_windows import CheckCamWindow
         self.cam_check_w = CheckCamWindow()
         self.cam_check_w.show()
 
     def start_test_mode(self, **kwargs) -> None:
+        from devirta_pics.views.mode_windows import (TestingModeOffline,
+                                                     TestingModeOnline)
         if self.mode == AppModes.OFFLINE.value:
             self.active_mode_w = TestingModeOffline(
                 self, self.testing_time.time().minute())
         else:
-            self.active_mode_w = TestingModeOnline(self, kwargs.get('time', 2))
+            self.active_mode_w = TestingModeOnline(
+                self, kwargs.get('time', 2), kwargs.get('patient'),
+                kwargs.get('patients'))
         self.active_mode_w.show()
 
-    def start_rehab_mode(self) -> None:
+    def start_rehab_mode(self, **kwargs) -> None:
+        from devirta_pics.views.mode_windows import (RehabModeOffline,
+                                                     RehabModeOnline)
         if self.mode == AppModes.OFFLINE.value:
             self.active_mode_w = RehabModeOffline(self)
         else:
-            self.active_mode_w = RehabModeOnline(self)
+            self.active_mode_w = RehabModeOnline(self, kwargs.get('patient'),
+                                                 kwargs.get('patients'))
         self.active_mode_w.show()
 
     def connect2server(self):
@@ -172,13 +191,18 @@ class MainWindow(QMainWindow):
 
             self.net_man.send_data(code=200, msg=f'Starting {mode} command...')
             if mode == 'test':
-                self.start_test_mode(time=int(data.get('time', 2)))
+                self.start_test_mode(time=int(data.get('time', 2)),
+                                     patient=data.get('patient'),
+                                     patients=data.get('patients'))
             elif mode == 'rehab':
-                self.start_rehab_mode()
+                self.start_rehab_mode(patient=data.get('patient'),
+                                      patients=data.get('patients'))
 
     def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
         if self.mode is not None:
+            from devirta_pics.detector import DETECTOR
             DETECTOR().stop()
         if self.net_man:
             self.net_man.close()
+        SessionStore.close()
         super().closeEvent(a0)
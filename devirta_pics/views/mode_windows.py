@@ -1,26 +1,35 @@
 from datetime import timedelta
 
-from pymorphy2 import MorphAnalyzer
-from PyQt5 import QtGui, uic
+from PyQt5 import QtGui
 from PyQt5.QtCore import QTimer, pyqtSlot
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import QMainWindow, QMessageBox
 
-from devirta_pics.analyser import Analyser
+from devirta_pics.analyser import Analyser, create_subject_analysers
 from devirta_pics.config import LANG, LOCALIZATION
 from devirta_pics.detector import DETECTOR
-from devirta_pics.utils.tools import load_rsc
+from devirta_pics.utils.metrics import METRICS
+from devirta_pics.utils.tools import get_morph
 from devirta_pics.views.camera_views import CallbackCam
+from devirta_pics.views.ui_loader import load_ui
+from devirta_pics.views.view_models import ModeViewModel
 
 
 class ModeWindowBase(QMainWindow):
-    def __init__(self, parent):
+    name = None
+
+    def __init__(self, parent, patient=None, patients=None):
         super().__init__(parent=parent)
-        uic.loadUi(load_rsc('data/ui/mode_w.ui'), self)
+        load_ui('mode_w', self)
 
         self.detector = DETECTOR()
         self.cam = CallbackCam(self.mn_video_box, self.detector)
-        self.analyser = Analyser(self.graphicsView)
+        self.analyser = Analyser(self.graphicsView, mode=self.name,
+                                 patient=patient)
+        # Остальные люди в кадре анализируются без отображения
+        self.subject_analysers = create_subject_analysers(self.name,
+                                                          patients)
+        self.view_model = ModeViewModel(self.detector, parent=self)
         self.init_ui()
 
     def init_ui(self):
@@ -29,18 +38,52 @@ class ModeWindowBase(QMainWindow):
 
         self.progressBar.hide()
         self.finish_btn.hide()
+        self.br_logs.setModel(self.view_model.logs)
+        self.view_model.logs.rowsInserted.connect(self.scroll_logs)
+
         self.cam.changePixmap.connect(self.set_image)
+        self.view_model.coordsChanged.connect(self.set_coord_in_label)
         self.analyser.logsUpdatedSignal.connect(self.update_logs)
+        self.analyser.respirationUpdatedSignal.connect(
+            self.show_respiration)
 
     @pyqtSlot(QImage)
+    @METRICS.timed('render')
     def set_image(self, image: QImage) -> None:
-        self.set_coord_in_label(self.detector.positions)
         self.mn_video_box.setPixmap(QPixmap.fromImage(image))
 
     @pyqtSlot(dict)
     def update_logs(self, data: dict) -> None:
-        self.br_logs.appendPlainText(f'{data}')
+        # Логи попадают в окно пачкой при следующем обновлении интерфейса
+        self.view_model.add_log(data)
+
+    @pyqtSlot(dict)
+    def show_respiration(self, data: dict) -> None:
+        if data['rate'] is None:
+            self.statusbar.clearMessage()
+            return
+        self.statusbar.showMessage(
+            f'Частота дыхания: {data["rate"]:.1f} в минуту, '
+            f'качество сигнала: {data["quality"]:.0%}')
+
+    def stop_analysers(self) -> None:
+        self.analyser.stop()
+        for analyser in self.subject_analysers:
+            analyser.stop()
+
+    def subjects_data(self) -> dict:
+        # Итоги остальных людей в кадре для ответа по сети
+        if not self.subject_analysers:
+            return {}
+        return {'subjects': [a.summary() for a in self.subject_analysers]}
+
+    def scroll_logs(self) -> None:
+        # Прокручиваем вниз, только если пользователь не листает логи
+        bar = self.br_logs.verticalScrollBar()
+        if bar.value() >= bar.maximum() - 1:
+            self.br_logs.scrollToBottom()
 
+    @pyqtSlot(dict)
     def set_coord_in_label(self, positions) -> None:
         if len(positions) == 3:
             p1, p2, p3 = positions.values()
@@ -57,12 +100,15 @@ class ModeWindowBase(QMainWindow):
         for dockw in [self.logs_dockw, self.graph_dockw, self.coords_dockw]:
             if dockw.isFloating():
                 dockw.close()
-        self.analyser.stop()
+        self.view_model.stop()
+        self.stop_analysers()
         super().closeEvent(a0)
 
 
 class TestingModeWBase(ModeWindowBase):
-    def __init__(self, parent, ttime_min=2):
+    name = 'test'
+
+    def __init__(self, parent, ttime_min=2, patient=None, patients=None):
         self.ttime = timedelta(minutes=ttime_min)
         self.total_s = self.ttime.total_seconds()
 
@@ -72,7 +118,7 @@ class TestingModeWBase(ModeWindowBase):
         self.one_s_tm.timeout.connect(self.check_ttime)
         self.one_s_tm.start(1000)
 
-        super().__init__(parent)
+        super().__init__(parent, patient, patients)
 
     def init_ui(self):
         super().init_ui()
@@ -91,11 +137,8 @@ class TestingModeWBase(ModeWindowBase):
             self.finish_testing()
 
     def finish_testing(self):
-        self.analyser.stop()
-        if any(val := self.analyser.breath_counters.values()) and \
-                sum(val) != val[0]*len(val):
-            tp_br = sorted(self.analyser.breath_counters.keys(),
-                           key=lambda x: self.analyser.breath_counters[x])[0]
+        self.stop_analysers()
+        if tp_br := self.analyser.dominant_breath():
             self.parent().domin_bt_val.setText(
                 f'"{LOCALIZATION.get(LANG, "ru")[tp_br]}"')
             return tp_br
@@ -138,23 +181,29 @@ class TestingModeOnline(TestingModeWBase):
         tp_breath = super().finish_testing()
         if not tp_breath:
             self.parent().net_man.send_data(
-                code=204, msg='Mode completed unsuccessfully.', data=None)
+                code=204, msg='Mode completed unsuccessfully.',
+                data=self.subjects_data() or None,
+                session=self.analyser.session_id)
         else:
             self.parent().net_man.send_data(
                 code=201, msg='The mode is completed.',
-                data={'type_breath': tp_breath})
+                data={'type_breath': tp_breath, **self.subjects_data()},
+                session=self.analyser.session_id)
         self.close()
 
     def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
         super().closeEvent(a0)
         if self.ttime > self.end_time:
             self.parent().net_man.send_data(code=204, msg='Mode interrupted.',
-                                            data=None)
+                                            data=None,
+                                            session=self.analyser.session_id)
 
 
 class RehabModeWBase(ModeWindowBase):
-    def __init__(self, parent):
-        super().__init__(parent)
+    name = 'rehab'
+
+    def __init__(self, parent, patient=None, patients=None):
+        super().__init__(parent, patient, patients)
 
     def init_ui(self):
         super().init_ui()
@@ -162,9 +211,9 @@ class RehabModeWBase(ModeWindowBase):
         self.finish_btn.clicked.connect(self.finish_rehab)
 
     def finish_rehab(self):
-        self.analyser.stop()
+        self.stop_analysers()
         if any(self.analyser.breath_counters.values()):
-            comment = MorphAnalyzer().parse('раз')[1]
+            comment = get_morph().parse('раз')[1]
 
             stom_count = self.analyser.breath_counters['stomach']
             stom = comment.make_agree_with_number(stom_count).word
@@ -207,9 +256,12 @@ class RehabModeOnline(RehabModeWBase):
         br_counter = super().finish_rehab()
         if not br_counter:
             self.parent().net_man.send_data(
-                code=204, msg='Mode completed unsuccessfully.', data=None)
+                code=204, msg='Mode completed unsuccessfully.',
+                data=self.subjects_data() or None,
+                session=self.analyser.session_id)
         else:
             self.parent().net_man.send_data(
                 code=201, msg='The mode is completed.',
-                data={'breath_counter': br_counter})
+                data={'breath_counter': br_counter, **self.subjects_data()},
+                session=self.analyser.session_id)
         self.close()
@@ -1,20 +1,23 @@
-from PyQt5 import QtGui, uic
+from PyQt5 import QtGui
 from PyQt5.QtCore import pyqtSlot
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import QWidget
 
 from devirta_pics.camera.camera import Camera
-from devirta_pics.config import (A_DELTA_BOT, A_DELTA_TOP, A_SMOOTH_C,
-                                 A_TM_DELTA, G_MAX_CHUNKS, G_SAVE_FD,
-                                 G_SHOW_EXT, G_SHOW_SMOOTH, G_UPD_FREQ)
-from devirta_pics.utils.tools import FileManager, load_rsc
+from devirta_pics.config import (A_DELTA_BOT, A_DELTA_TOP, A_FILTER,
+                                 A_SMOOTH_C, A_TM_DELTA, G_MAX_CHUNKS,
+                                 G_SAVE_FD, G_SHOW_EXT, G_SHOW_SMOOTH,
+                                 G_UPD_FREQ)
+from devirta_pics.filters import FILTERS
+from devirta_pics.utils.tools import FileManager
 from devirta_pics.views.camera_views import LoopCam
+from devirta_pics.views.ui_loader import load_ui
 
 
 class GraphSettingsWindow(QWidget):
     def __init__(self):
         super().__init__()
-        uic.loadUi(load_rsc('data/ui/graph_sw.ui'), self)
+        load_ui('graph_sw', self)
         self.save_btn.clicked.connect(self.save_data)
         self.set_data(**FileManager.load_graph_settings())
 
@@ -50,7 +53,9 @@ class GraphSettingsWindow(QWidget):
 class AnalyserSettingsWindow(QWidget):
     def __init__(self):
         super().__init__()
-        uic.loadUi(load_rsc('data/ui/analyser_sw.ui'), self)
+        load_ui('analyser_sw', self)
+        for name, label in FILTERS.items():
+            self.filter.addItem(label, name)
         self.save_btn.clicked.connect(self.save_data)
         self.set_data(**FileManager.load_analyser_settings())
 
@@ -62,6 +67,7 @@ class AnalyserSettingsWindow(QWidget):
             'max_delta_bot': self.max_delta_bot.value(),
             'min_delta_top': self.min_delta_top.value(),
             'min_delta_bot': self.min_delta_bot.value(),
+            'filter': self.filter.currentData(),
         }
         FileManager.save_analyser_settings(data)
 
@@ -72,6 +78,7 @@ class AnalyserSettingsWindow(QWidget):
                        smooth_c
                        max_delta_top, max_delta_bot,
                        min_delta_top, min_delta_bot
+                       filter
         :return:
         """
         self.time_delta.setValue(kwargs.get('time_delta', A_TM_DELTA))
@@ -84,12 +91,14 @@ class AnalyserSettingsWindow(QWidget):
                                                A_DELTA_TOP[0])),
         self.min_delta_bot.setValue(kwargs.get('min_delta_bot',
                                                A_DELTA_BOT[0])),
+        self.filter.setCurrentIndex(
+            max(self.filter.findData(kwargs.get('filter', A_FILTER)), 0))
 
 
 class CheckCamWindow(QWidget):
     def __init__(self):
         super().__init__()
-        uic.loadUi(load_rsc('data/ui/camera_check.ui'), self)
+        load_ui('camera_check', self)
         self.reconnect_cam_btn.clicked.connect(Camera().restart)
 
         self.cam = LoopCam(self, self.video_box, Camera())
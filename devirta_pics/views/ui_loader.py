@@ -0,0 +1,141 @@
+"""
+Загрузка интерфейсов из заранее скомпилированных python-модулей вместо
+разбора .ui файлов при каждом открытии окна.
+
+Модули генерируются при сборке пакета (см. setup.py) в
+devirta_pics/views/compiled. Если модуля нет или .ui файл изменился, то
+интерфейс компилируется при первом обращении и кешируется в UI_CACHE_DIR.
+"""
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import re
+import sys
+from typing import Dict, Optional
+
+from PyQt5 import uic
+
+from devirta_pics.utils.tools import load_rsc
+
+logger = logging.getLogger(__name__)
+
+UI_DIR = 'data/ui'
+COMPILED_DIR = os.path.join(os.path.dirname(__file__), 'compiled')
+UI_CACHE_DIR = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or
+    os.path.join(os.path.expanduser('~'), '.cache'), 'devirta_pics', 'ui')
+
+# Загруженные классы интерфейсов: {имя ui файла: класс Ui_*}
+_ui_classes: Dict[str, Optional[type]] = {}
+
+_HEADER = '''# Сгенерировано devirta_pics.views.ui_loader из {name}.ui.
+# Не редактируйте этот файл, изменения будут потеряны.
+from devirta_pics.utils.tools import load_rsc as _load_rsc
+
+UI_HASH = {ui_hash!r}
+
+
+def _rsc(path):
+    return _load_rsc({ui_dir!r} + '/' + path)
+
+
+'''
+
+
+def ui_path(name: str) -> str:
+    return load_rsc(f'{UI_DIR}/{name}.ui')
+
+
+def ui_hash(name: str) -> str:
+    with open(ui_path(name), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def compile_ui(name: str, out_dir: str) -> str:
+    """
+    Компилирует .ui файл в python-модуль `<out_dir>/<name>_ui.py`.
+    :return: Путь к созданному модулю.
+    """
+    code = io.StringIO()
+    with open(ui_path(name), encoding='utf-8') as f:
+        uic.compileUi(f, code)
+    code = code.getvalue()
+
+    # Ресурсы .qrc не используются приложением, а uic.loadUi их игнорирует
+    code = re.sub(r'^import \w+_rc\n', '', code, flags=re.M)
+    # Пути к картинкам задаются относительно папки с .ui файлами
+    code = re.sub(r'QPixmap\("([^"]+)"\)', r'QPixmap(_rsc("\1"))', code)
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f'{name}_ui.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(_HEADER.format(name=name, ui_hash=ui_hash(name),
+                               ui_dir=UI_DIR))
+        f.write(code)
+    return path
+
+
+def compile_all(out_dir: str = COMPILED_DIR) -> None:
+    for filename in sorted(os.listdir(load_rsc(UI_DIR))):
+        if filename.endswith('.ui'):
+            compile_ui(filename[:-3], out_dir)
+
+
+def _import_file(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(
+        f'devirta_pics.views.compiled.{name}_ui', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _find_ui_class(module) -> type:
+    return next(v for k, v in vars(module).items()
+                if k.startswith('Ui_') and isinstance(v, type))
+
+
+def _load_ui_class(name: str) -> Optional[type]:
+    actual_hash = ui_hash(name)
+
+    # Сначала модули, собранные вместе с пакетом, затем кеш
+    for directory in (COMPILED_DIR, UI_CACHE_DIR):
+        path = os.path.join(directory, f'{name}_ui.py')
+        if not os.path.exists(path):
+            continue
+        try:
+            module = _import_file(name, path)
+            if getattr(module, 'UI_HASH', None) == actual_hash:
+                return _find_ui_class(module)
+        except Exception as e:
+            logger.warning(f'UI: broken compiled module {path}: {e}')
+
+    try:
+        return _find_ui_class(_import_file(name,
+                                           compile_ui(name, UI_CACHE_DIR)))
+    except Exception as e:
+        logger.warning(f'UI: can`t compile {name}.ui: {e}')
+        return None
+
+
+def load_ui(name: str, widget) -> None:
+    """
+    Создает интерфейс `name` (имя .ui файла без расширения) на виджете.
+    Как и uic.loadUi, дочерние виджеты становятся атрибутами `widget`.
+    """
+    if name not in _ui_classes:
+        _ui_classes[name] = _load_ui_class(name)
+
+    if (ui_class := _ui_classes[name]) is None:
+        uic.loadUi(ui_path(name), widget)
+        return
+
+    ui = ui_class()
+    ui.setupUi(widget)
+    for attr, value in vars(ui).items():
+        setattr(widget, attr, value)
+
+
+if __name__ == '__main__':
+    compile_all(sys.argv[1] if len(sys.argv) > 1 else COMPILED_DIR)
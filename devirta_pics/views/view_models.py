@@ -0,0 +1,88 @@
+from typing import Dict, List, Tuple
+
+from PyQt5.QtCore import (QAbstractListModel, QModelIndex, QObject, Qt,
+                          QTimer, pyqtSignal)
+
+from devirta_pics.config import UI_LOGS_CAPACITY, UI_REFRESH_MS
+from devirta_pics.utils.metrics import METRICS
+
+
+class LogsListModel(QAbstractListModel):
+    """
+    Модель списка логов с ограниченной емкостью. При переполнении удаляются
+    самые старые строки, поэтому память и стоимость отрисовки не растут.
+    """
+
+    def __init__(self, capacity=UI_LOGS_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._rows: List[str] = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._rows[index.row()]
+        return None
+
+    def extend(self, rows: List[str]) -> None:
+        """
+        Добавляет пачку строк одной операцией вставки.
+        """
+        if not (rows := rows[-self.capacity:]):
+            return
+
+        # Сначала освобождаем место под новые строки
+        if (overflow := len(self._rows) + len(rows) - self.capacity) > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self._rows[:overflow]
+            self.endRemoveRows()
+
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._rows.clear()
+        self.endResetModel()
+
+
+class ModeViewModel(QObject):
+    """
+    Слой между данными детектора/анализатора и окном режима. Накапливает
+    изменения и передает их в интерфейс пачкой с фиксированной частотой.
+    """
+    coordsChanged = pyqtSignal(dict)
+
+    def __init__(self, detector, refresh_ms=UI_REFRESH_MS, parent=None):
+        super().__init__(parent)
+        self.detector = detector
+        self.logs = LogsListModel(parent=self)
+
+        self._pending_logs: List[str] = []
+        self._last_coords: Dict[int, Tuple[int, int]] = {}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def add_log(self, data: dict) -> None:
+        self._pending_logs.append(f'{data}')
+
+    @METRICS.timed('ui_refresh')
+    def refresh(self) -> None:
+        if (coords := dict(self.detector.positions)) != self._last_coords:
+            self._last_coords = coords
+            self.coordsChanged.emit(coords)
+
+        if self._pending_logs:
+            rows, self._pending_logs = self._pending_logs, []
+            self.logs.extend(rows)
+
+    def stop(self) -> None:
+        self.timer.stop()
+        # Показываем то, что успело накопиться
+        self.refresh()
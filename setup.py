@@ -3,6 +3,7 @@ from importlib.machinery import SourceFileLoader
 
 from pkg_resources import parse_requirements
 from setuptools import find_packages, setup
+from setuptools.command.build_py import build_py
 
 module_name = 'devirta_pics'
 
@@ -32,6 +33,23 @@ def load_requirements(fname: str) -> list:
     return requirements
 
 
+class BuildPyWithUi(build_py):
+    """
+    Дополнительно компилирует .ui файлы в python-модули, чтобы приложение
+    не разбирало XML при каждом открытии окна.
+    """
+
+    def run(self):
+        super().run()
+        try:
+            from devirta_pics.views.ui_loader import compile_all
+        except ImportError as e:
+            print(f'Skipping UI compilation: {e}')
+            return
+        compile_all(os.path.join(self.build_lib, module_name, 'views',
+                                 'compiled'))
+
+
 setup(
     name=module_name,
     version=module.__version__,
@@ -59,9 +77,12 @@ setup(
     # extras_require={'dev': load_requirements('requirements.dev.txt')},
     entry_points={
         'console_scripts': [
-            '{0}-app = {0}.__main__:main'.format(module_name)
+            '{0}-app = {0}.__main__:main'.format(module_name),
+            '{0}-service = {0}.service.__main__:main'.format(module_name),
+            '{0}-fleet = {0}.fleet.__main__:main'.format(module_name),
         ]
     },
-    include_package_data=True
+    include_package_data=True,
+    cmdclass={'build_py': BuildPyWithUi},
     # package_data={'': package_files(f'{module_name}/data')},
 )
@@ -0,0 +1,272 @@
+"""
+Нагрузочное тестирование TCP API без графического интерфейса.
+
+Открывает N одновременных подключений, каждое выполняет сценарий команд до
+окончания времени теста. В конце выводятся перцентили задержек по командам,
+пропускная способность, коды ответов и ошибки.
+
+Сценарии:
+    stats     - запросы метрик (обрабатываются потоком сервера);
+    status    - запросы состояния (проходят через очередь команд);
+    mode      - запуск режима rehab, запросы состояния, остановка;
+    subscribe - подписка на телеметрию до конца теста.
+
+Примеры:
+    python -m test_app.loadgen --stub --clients 50 --duration 10
+    python -m test_app.loadgen --addr localhost:8080 --token 123456 \\
+        --clients 20 --scenario stats,mode --encoding msgpack
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from devirta_pics.network.aioclient import AsyncNetClient
+from devirta_pics.network.aioserver import AsyncNetServer
+from devirta_pics.network.telemetry import TELEMETRY
+from devirta_pics.utils.metrics import RollingHistogram
+
+STUB_TELEMETRY_RATE = 25  # Частота публикации телеметрии заглушкой (Гц)
+
+
+class StubManager:
+    """
+    Менеджер команд без Qt и оборудования. Команды выполняются сразу в
+    потоке сервера, ответы такие же, как у приложения.
+    """
+
+    def __init__(self):
+        self.ready = True
+        self.net: Optional[AsyncNetServer] = None
+        self.mode = None
+        self.started = None
+        self._stop = threading.Event()
+
+    def run_comm(self, data: dict, client=None) -> bool:
+        if data.get('type') == 'stop':
+            if self.mode is None:
+                response = {'code': 404, 'msg': 'Not found active mode'}
+            else:
+                self.mode = self.started = None
+                response = {'code': 204, 'msg': 'Mode interrupted.',
+                            'data': None}
+        elif self.mode is not None:
+            response = {'code': 425, 'msg': 'Failed to start mode'}
+        else:
+            self.mode, self.started = data.get('mode'), time.perf_counter()
+            response = {'code': 200,
+                        'msg': f'Starting {self.mode} command...'}
+        self.net.send_data(self.net.reply(response, data), client)
+        return True
+
+    def status(self) -> dict:
+        elapsed = None
+        if (started := self.started) is not None:
+            elapsed = round(time.perf_counter() - started, 3)
+        return {'ready': True, 'mode': self.mode, 'elapsed': elapsed,
+                'queued': 0, 'respiration': None}
+
+    def publish_telemetry(self) -> None:
+        # Имитация детектора и графика
+        period, tick = 1 / STUB_TELEMETRY_RATE, 0
+        while not self._stop.wait(period):
+            tick += 1
+            TELEMETRY.publish('positions', [[100, 100 + tick % 10],
+                                            [110, 200], [120, 300]])
+            TELEMETRY.publish('lines', {'time': tick * period,
+                                        'a': 100.0 + tick % 10, 'b': 100.0})
+
+    def start(self) -> AsyncNetServer:
+        self.net = AsyncNetServer(self)
+        threading.Thread(target=self.publish_telemetry, daemon=True).start()
+        return self.net
+
+    def close(self) -> None:
+        self._stop.set()
+        self.net.close()
+
+
+class Report:
+    def __init__(self):
+        self.latency = defaultdict(lambda: RollingHistogram(size=None))
+        self.codes = Counter()
+        self.errors = Counter()
+        self.telemetry = Counter()
+
+    async def call(self, client: AsyncNetClient, name: str, data: dict,
+                   timeout: float) -> Optional[dict]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(data, timeout)
+        except asyncio.TimeoutError:
+            self.errors[f'{name}: timeout'] += 1
+            return None
+        except ConnectionError:
+            self.errors[f'{name}: connection'] += 1
+            return None
+        self.latency[name].add((time.perf_counter() - start) * 1000)
+        self.codes[f'{name} {response.get("code")}'] += 1
+        return response
+
+    def on_message(self, message: dict) -> None:
+        if message.get('msg') == 'Telemetry.':
+            data = message.get('data') or {}
+            self.telemetry['messages'] += 1
+            self.telemetry['samples'] += len(data.get('samples', []))
+            self.telemetry['dropped'] += data.get('dropped', 0)
+        else:
+            self.codes[f'unsolicited {message.get("code")}'] += 1
+
+    def summary(self, duration: float) -> dict:
+        latency = {k: v.summary() for k, v in sorted(self.latency.items())}
+        requests = sum(v['total'] for k, v in latency.items() if k != 'auth')
+        for v in latency.values():
+            v.pop('buckets', None)
+        return {
+            'duration': round(duration, 3),
+            'requests': requests,
+            'throughput': round(requests / duration, 1) if duration else 0,
+            'latency_ms': latency,
+            'codes': dict(sorted(self.codes.items())),
+            'errors': dict(sorted(self.errors.items())),
+            'telemetry': dict(self.telemetry),
+        }
+
+
+async def scenario_stats(client, report, args, deadline):
+    while time.monotonic() < deadline:
+        await report.call(client, 'stats', {'type': 'stats'}, args.timeout)
+
+
+async def scenario_status(client, report, args, deadline):
+    while time.monotonic() < deadline:
+        await report.call(client, 'status', {'type': 'status'}, args.timeout)
+
+
+async def scenario_mode(client, report, args, deadline):
+    while time.monotonic() < deadline:
+        await report.call(client, 'mode',
+                          {'type': 'mode', 'mode': 'rehab'}, args.timeout)
+        for _ in range(3):
+            await report.call(client, 'status', {'type': 'status'},
+                              args.timeout)
+        await report.call(client, 'stop', {'type': 'stop'}, args.timeout)
+
+
+async def scenario_subscribe(client, report, args, deadline):
+    await report.call(client, 'subscribe',
+                      {'type': 'subscribe', 'rate': args.rate}, args.timeout)
+    await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+    await report.call(client, 'unsubscribe', {'type': 'unsubscribe'},
+                      args.timeout)
+
+
+SCENARIOS = {
+    'stats': scenario_stats,
+    'status': scenario_status,
+    'mode': scenario_mode,
+    'subscribe': scenario_subscribe,
+}
+
+
+async def run_client(n: int, host: str, port: int, args, report: Report,
+                     deadline: float) -> None:
+    scenarios = args.scenario.split(',')
+    scenario = SCENARIOS[scenarios[n % len(scenarios)]]
+
+    client = AsyncNetClient(host, port, on_message=report.on_message)
+    start = time.perf_counter()
+    try:
+        response = await client.connect(args.token, args.encoding,
+                                        args.timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        report.errors[f'auth: {e.__class__.__name__}'] += 1
+        return
+    report.latency['auth'].add((time.perf_counter() - start) * 1000)
+    report.codes[f'auth {response.get("code")}'] += 1
+    if response.get('code') != 200:
+        return
+    try:
+        await scenario(client, report, args, deadline)
+    finally:
+        await client.close()
+
+
+async def run(host: str, port: int, args) -> dict:
+    report = Report()
+    start = time.monotonic()
+    deadline = start + args.duration
+    await asyncio.gather(*(run_client(n, host, port, args, report, deadline)
+                           for n in range(args.clients)))
+    return report.summary(time.monotonic() - start)
+
+
+def print_summary(summary: dict) -> None:
+    print(f'{summary["requests"]} requests in {summary["duration"]} s, '
+          f'{summary["throughput"]} req/s')
+    print(f'{"command":<12}{"count":>8}{"p50, ms":>10}{"p90, ms":>10}'
+          f'{"p99, ms":>10}{"max, ms":>10}')
+    for name, v in summary['latency_ms'].items():
+        if not v['count']:
+            continue
+        print(f'{name:<12}{v["count"]:>8}{v["p50"]:>10.2f}{v["p90"]:>10.2f}'
+              f'{v["p99"]:>10.2f}{v["max"]:>10.2f}')
+    print('codes:', summary['codes'])
+    if summary['errors']:
+        print('errors:', summary['errors'])
+    if summary['telemetry']:
+        print('telemetry:', summary['telemetry'])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Нагрузочное тестирование TCP API.')
+    parser.add_argument('--addr', default=None, help='host:port сервера')
+    parser.add_argument('--token', default=None)
+    parser.add_argument('--stub', action='store_true',
+                        help='Запустить локальный сервер с заглушкой '
+                             'приложения вместо подключения к --addr')
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--scenario', default='stats,status',
+                        help='Сценарии через запятую, распределяются по '
+                             f'клиентам по кругу: {", ".join(SCENARIOS)}')
+    parser.add_argument('--encoding', default=None,
+                        choices=('json', 'msgpack'))
+    parser.add_argument('--rate', type=float, default=10,
+                        help='Частота телеметрии для сценария subscribe')
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if unknown := set(args.scenario.split(',')) - set(SCENARIOS):
+        parser.error(f'unknown scenario: {", ".join(unknown)}')
+
+    stub = None
+    if args.stub:
+        stub = StubManager()
+        host, port = stub.start().addr
+        args.token = stub.net.auth_token
+    elif args.addr and args.token:
+        host, port = args.addr.rsplit(':', 1)
+        port = int(port)
+    else:
+        parser.error('either --stub or --addr and --token are required')
+
+    try:
+        summary = asyncio.run(run(host, port, args))
+    finally:
+        if stub is not None:
+            stub.close()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()